@@ -16,6 +16,9 @@ interface User {
   updated_at: string;
 }
 
+const USERS_PAGE_SIZE = 50;
+const USER_FIELDS = "id,username,email,role,first_name,last_name,is_blocked,is_active,created_at,updated_at";
+
 export default function AdminPage() {
   const { user, token, isLoading, isAuthenticated } = useAuth();
   const navigate = useNavigate();
@@ -23,6 +26,8 @@ export default function AdminPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [blockingUser, setBlockingUser] = useState<number | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null); // X-Next-Cursor sledeće stranice
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Redirect if not admin
   useEffect(() => {
@@ -32,26 +37,35 @@ export default function AdminPage() {
     }
   }, [user, navigate, isLoading, isAuthenticated]);
 
-  // Fetch all users
+  // Jedna stranica imenika (keyset po id-u) - sledeća se učitava na zahtev
+  const fetchUsersPage = async (cursor: string | null) => {
+    const params = new URLSearchParams({ fields: USER_FIELDS, limit: String(USERS_PAGE_SIZE) });
+    if (cursor) params.set("after_id", cursor);
+    const response = await fetch(`/api/stakeholders-service/users/all?${params}`, {
+      headers: {
+        "Authorization": `Bearer ${token}`
+      },
+      credentials: "include",
+    });
+
+    if (!response.ok) {
+      throw new Error("Greška pri učitavanju korisnika");
+    }
+
+    const page: User[] = await response.json();
+    return { page, cursor: response.headers.get("X-Next-Cursor") };
+  };
+
+  // Fetch first page of users
   useEffect(() => {
     if (isLoading || !isAuthenticated || user?.role.toLowerCase() !== "admin") return;
 
     const fetchUsers = async () => {
       try {
         setLoading(true);
-        const response = await fetch("/api/stakeholders-service/users/all", {
-          headers: {
-            "Authorization": `Bearer ${token}`
-          },
-          credentials: "include",
-        });
-        
-        if (!response.ok) {
-          throw new Error("Greška pri učitavanju korisnika");
-        }
-
-        const data = await response.json();
-        setUsers(data);
+        const { page, cursor } = await fetchUsersPage(null);
+        setUsers(page);
+        setNextCursor(cursor);
       } catch (error) {
         console.error("Greška:", error);
         setError("Greška pri učitavanju korisnika");
@@ -63,12 +77,28 @@ export default function AdminPage() {
     fetchUsers();
   }, [user, isLoading, isAuthenticated, token]);
 
+  const handleLoadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+
+    try {
+      setLoadingMore(true);
+      const { page, cursor } = await fetchUsersPage(nextCursor);
+      setUsers(prevUsers => [...prevUsers, ...page]);
+      setNextCursor(cursor);
+    } catch (error) {
+      console.error("Greška:", error);
+      alert("Greška pri učitavanju korisnika");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleBlockUser = async (userId: number) => {
     if (!user) return;
 
     try {
       setBlockingUser(userId);
-      const response = await fetch(`/api/stakeholders-service/users/block/${userId}?admin_user_id=${user.id}`, {
+      const response = await fetch(`/api/stakeholders-service/users/block/${userId}`, {
         method: "PUT",
         headers: {
           "Content-Type": "application/json",
@@ -142,7 +172,7 @@ export default function AdminPage() {
             <div className="bg-white dark:bg-gray-800 shadow-xl rounded-lg overflow-hidden">
               <div className="px-6 py-4 border-b border-gray-200 dark:border-gray-700">
                 <h2 className="text-xl font-semibold text-gray-900 dark:text-white">
-                  Svi korisnici ({users.length})
+                  Svi korisnici ({users.length}{nextCursor ? "+" : ""})
                 </h2>
               </div>
 
@@ -247,6 +277,18 @@ export default function AdminPage() {
                 </table>
               </div>
 
+              {nextCursor && (
+                <div className="px-6 py-4 border-t border-gray-200 dark:border-gray-700 text-center">
+                  <button
+                    onClick={handleLoadMore}
+                    disabled={loadingMore}
+                    className="bg-blue-600 hover:bg-blue-700 disabled:bg-blue-400 text-white px-4 py-2 rounded-md text-sm font-medium transition-colors"
+                  >
+                    {loadingMore ? "Učitavam..." : "Učitaj još korisnika"}
+                  </button>
+                </div>
+              )}
+
               {users.length === 0 && !loading && (
                 <div className="text-center py-12">
                   <p className="text-gray-500 dark:text-gray-400">Nema korisnika za prikaz</p>
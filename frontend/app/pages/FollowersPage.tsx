@@ -46,10 +46,12 @@ export default function FollowersPage() {
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState<"followers" | "following" | "recommendations" | "all">("followers");
   const [followingInProgress, setFollowingInProgress] = useState<number | null>(null);
-  const [displayedUsersCount, setDisplayedUsersCount] = useState(10); // Početni broj prikazanih korisnika
+  const [usersCursor, setUsersCursor] = useState<string | null>(null); // X-Next-Cursor sledeće stranice imenika
+  const [loadingMoreUsers, setLoadingMoreUsers] = useState(false);
 
   const API_URL = "/api/followers-service";
   const USERS_API_URL = "/api/stakeholders-service/users";
+  const USERS_PAGE_SIZE = 20;
 
   // Redirect if not authenticated
   useEffect(() => {
@@ -99,19 +101,47 @@ export default function FollowersPage() {
     }
   };
 
+  // Jedna stranica imenika (keyset po id-u); lista ne treba biografiju i moto
+  const fetchUsersPage = async (cursor: string | null) => {
+    const fields = "id,username,email,role,first_name,last_name,profile_image,is_blocked,created_at,updated_at";
+    const params = new URLSearchParams({ fields, limit: String(USERS_PAGE_SIZE) });
+    if (cursor) params.set("after_id", cursor);
+    const response = await fetch(`${USERS_API_URL}/all?${params}`, {
+      headers: {
+        "Authorization": `Bearer ${token}`
+      }
+    });
+    const data = await response.json();
+    // Ensure data is always an array
+    return {
+      users: Array.isArray(data) ? (data as AllUser[]) : [],
+      nextCursor: response.headers.get("X-Next-Cursor")
+    };
+  };
+
   const fetchAllUsers = async () => {
     try {
-      const response = await fetch(`${USERS_API_URL}/all`, {
-        headers: {
-          "Authorization": `Bearer ${token}`
-        }
-      });
-      const data = await response.json();
-      // Ensure data is always an array
-      setAllUsers(Array.isArray(data) ? data : []);
+      const page = await fetchUsersPage(null);
+      setAllUsers(page.users);
+      setUsersCursor(page.nextCursor);
     } catch (error) {
       console.error("Error fetching all users:", error);
       setAllUsers([]);
+      setUsersCursor(null);
+    }
+  };
+
+  const loadMoreUsers = async () => {
+    if (!usersCursor || loadingMoreUsers) return;
+    setLoadingMoreUsers(true);
+    try {
+      const page = await fetchUsersPage(usersCursor);
+      setAllUsers(prev => [...prev, ...page.users]);
+      setUsersCursor(page.nextCursor);
+    } catch (error) {
+      console.error("Error fetching more users:", error);
+    } finally {
+      setLoadingMoreUsers(false);
     }
   };
 
@@ -181,8 +211,7 @@ export default function FollowersPage() {
         fetchStats(uid),
         fetchFollowers(uid),
         fetchFollowing(uid),
-        fetchRecommendations(uid),
-        fetchAllUsers()
+        fetchRecommendations(uid)
       ]);
     } finally {
       setLoading(false);
@@ -193,6 +222,8 @@ export default function FollowersPage() {
   useEffect(() => {
     if (user?.id && !isLoading) {
       loadUserData(user.id.toString());
+      // Imenik se učitava samo pri otvaranju - osvežavanje posle praćenja ne vraća na prvu stranicu
+      fetchAllUsers();
     }
   }, [user?.id, isLoading]);
 
@@ -201,14 +232,9 @@ export default function FollowersPage() {
     return following.some(f => f.user_id === userId);
   };
 
-  // Filter out current user and admin users, then get paginated users
-  const filteredAllUsers = allUsers.filter(u => u.id !== user?.id && u.role.toLowerCase() !== 'admin');
-  const displayedUsers = filteredAllUsers.slice(0, displayedUsersCount);
-  const hasMoreUsers = displayedUsersCount < filteredAllUsers.length;
-
-  const loadMoreUsers = () => {
-    setDisplayedUsersCount(prev => Math.min(prev + 10, filteredAllUsers.length));
-  };
+  // Filter out current user and admin users; sledeće stranice se učitavaju na zahtev
+  const displayedUsers = allUsers.filter(u => u.id !== user?.id && u.role.toLowerCase() !== 'admin');
+  const hasMoreUsers = usersCursor !== null;
 
   if (isLoading || !user) {
       return (
@@ -488,10 +514,10 @@ export default function FollowersPage() {
                           👥 Svi korisnici u sistemu - možete zapratiti korisnike koje još ne pratite
                         </p>
                         <p className="text-xs text-orange-600 dark:text-orange-400 mt-1">
-                          Prikazano {displayedUsers.length} od {filteredAllUsers.length} korisnika
+                          Prikazano {displayedUsers.length} korisnika{hasMoreUsers ? " (ima još)" : ""}
                         </p>
                       </div>
-                      {displayedUsers.length > 0 ? (
+                      {displayedUsers.length > 0 || hasMoreUsers ? (
                         <>
                           {displayedUsers.map((usr) => (
                             <div key={usr.id} className="flex items-center justify-between p-4 bg-gray-50 dark:bg-gray-700 rounded-lg hover:bg-gray-100 dark:hover:bg-gray-600 transition-colors">
@@ -530,9 +556,10 @@ export default function FollowersPage() {
                             <div className="pt-4 text-center">
                               <button
                                 onClick={loadMoreUsers}
+                                disabled={loadingMoreUsers}
                                 className="btn btn-primary"
                               >
-                                Učitaj još ({filteredAllUsers.length - displayedUsersCount} preostalo)
+                                {loadingMoreUsers ? "Učitavam..." : "Učitaj još"}
                               </button>
                             </div>
                           )}
@@ -2,11 +2,20 @@
 Purchase API - REST endpoints za kupovinu tura
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+import asyncio
+import json
+import time
+
+from app.core.config import settings
+from app.core.database import get_db, get_async_db, read_db, SessionLocal, AsyncSessionLocal
+from app.core.purchase_tokens import purchase_token_signer
+from app.core.resilience import get_breaker, guarded_request
 from app.core.security import decode_access_token
 from app.schemas.purchase import (
     ShoppingCartResponse,
@@ -15,25 +24,68 @@ from app.schemas.purchase import (
     UpdateCartItemRequest,
     CheckoutRequest,
     CheckoutResponse,
+    CheckoutAcceptedResponse,
+    SagaEventResponse,
     TourPurchaseTokenResponse,
     SagaTransactionResponse,
     MessageResponse
 )
 from app.services.purchase_service import PurchaseService
+from app.services.async_purchase_service import AsyncPurchaseService
+from app.services.cart_statements import CartConflictError
+from app.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+    history_etag,
+    etag_matches
+)
+from app.services.idempotency import (
+    AsyncIdempotencyService,
+    IdempotencyService,
+    IdempotencyKeyMismatch,
+    SagaResponseBuilder,
+    AsyncSagaResponseBuilder,
+    request_fingerprint
+)
+from app.saga.orchestrator import new_transaction_id
+from app.saga.worker import checkout_workers
 from fastapi import Header
 from app.grpc.tours_client import ToursGRPCClient
 import logging
-from app.models.purchase import TourPurchaseToken, OrderStatus
-from sqlalchemy import and_
+from app.models.purchase import TourPurchaseToken, OrderStatus, IdempotencyKey, IdempotencyStatus, SagaTransaction
+from sqlalchemy import and_, select
 
 router = APIRouter()
 
-
-def get_current_user_id(authorization: str = Header(None)) -> int:
-    """
-    Dependency za dobijanje trenutnog korisnika iz JWT tokena
-    Frontend ima zaštitu - svi moraju biti ulogovani da pristupe Purchase stranici
-    """
+TERMINAL_SAGA_STATUSES = {OrderStatus.COMPLETED, OrderStatus.FAILED, OrderStatus.CANCELLED}
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Maksimalan broj SQL naredbi po endpoint-u (QUERY_BUDGET_MODE=log|strict)
+PURCHASE_QUERY_BUDGETS = {
+    ("GET", "/cart"): 3,
+    ("POST", "/cart/add"): 7,
+    ("DELETE", "/cart/items/{item_id}"): 6,
+    ("PUT", "/cart/items/{item_id}"): 6,
+    ("DELETE", "/cart/clear"): 7,
+    ("GET", "/tokens"): 2,
+    ("GET", "/tokens/keys"): 0,
+    ("GET", "/tokens/{token_id}"): 1,
+    # Aktivna tabela, pa arhiva kada strana nije popunjena (sa događajima)
+    ("GET", "/transactions"): 5,
+    ("GET", "/transactions/{transaction_id}"): None,
+    ("GET", "/transactions/{transaction_id}/events"): None,
+    # Checkout raste sa brojem stavki (token i događaji po stavci)
+    ("POST", "/checkout"): 40,
+    ("POST", "/checkout/async"): 8,
+}
+
+
+def get_token_payload(authorization: str = Header(None)) -> dict:
+    """Dependency za dekodiran JWT payload iz Authorization header-a"""
     if not authorization or not authorization.startswith("Bearer "):
         logging.warning("[AUTH] Missing/invalid Authorization header")
         raise HTTPException(
@@ -51,7 +103,14 @@ def get_current_user_id(authorization: str = Header(None)) -> int:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
+    return payload
+
 
+def get_current_user_id(payload: dict = Depends(get_token_payload)) -> int:
+    """
+    Dependency za dobijanje trenutnog korisnika iz JWT tokena
+    Frontend ima zaštitu - svi moraju biti ulogovani da pristupe Purchase stranici
+    """
     user_id_str = payload.get("sub")
     if not user_id_str:
         logging.warning(f"[AUTH] 'sub' missing in token payload: {payload}")
@@ -72,26 +131,82 @@ def get_current_user_id(authorization: str = Header(None)) -> int:
         )
 
 
+def require_admin(payload: dict = Depends(get_token_payload)) -> dict:
+    """Dependency za administratorske endpoint-e (role iz Stakeholders JWT-a)"""
+    if str(payload.get("role", "")).upper() != "ADMIN":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator role required"
+        )
+    return payload
+
+
+def require_guide(payload: dict = Depends(get_token_payload)) -> dict:
+    """Dependency za endpoint-e vodiča (role VODIC iz Stakeholders JWT-a)"""
+    if str(payload.get("role", "")).upper() != "VODIC":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Guide role required"
+        )
+    return payload
+
+
+def get_read_db(current_user_id: int = Depends(get_current_user_id)):
+    """
+    Dependency za read-only rute - sesija nad replikom, osim kada je
+    korisnik nedavno pisao ili replika zaostaje (vidi SessionRouter)
+    """
+    yield from read_db(current_user_id)
+
+
+def get_expected_cart_version(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    """
+    Dependency za optimistic concurrency na korpi
+    Klijent šalje verziju korpe koju je poslednju video: If-Match: "3"
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid If-Match header, expected cart version"
+        )
+
+
+def _cart_conflict(error: CartConflictError) -> HTTPException:
+    """409 odgovor kada je korpa izmenjena u drugom tabu/zahtevu"""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Cart was modified by another request, reload the cart and try again"
+    )
+
+
 # ========== Shopping Cart Endpoints ==========
 
 @router.get("/cart", response_model=ShoppingCartResponse)
 def get_cart(
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Dobij aktivnu korpu trenutnog korisnika
+    
+    Čitanje ne kreira korpu - korisnik bez korpe dobija praznu virtuelnu
+    korpu (id je null). Odgovor se služi iz keša snimaka korpe.
     """
     service = PurchaseService(db)
-    cart = service.get_cart(current_user_id)
-    return cart
+    return service.get_cart_snapshot(current_user_id)
 
 
 @router.post("/cart/add", response_model=ShoppingCartResponse, status_code=status.HTTP_201_CREATED)
 async def add_to_cart(
     request: AddToCartRequest,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    expected_version: Optional[int] = Depends(get_expected_cart_version),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Dodaj turu u korpu
@@ -99,12 +214,14 @@ async def add_to_cart(
     Pokušava da verifikuje turu preko gRPC. Ako gRPC nije dostupan,
     koristi HTTP poziv ka Tours servisu.
     """
-    service = PurchaseService(db)
+    service = AsyncPurchaseService(db)
     
     # Try to verify tour exists via gRPC
     tours_client = ToursGRPCClient()
-    exists, tour_data, error = tours_client.verify_tour_exists(request.tour_id)
-    tours_client.close()
+    try:
+        exists, tour_data, error = await run_in_threadpool(tours_client.verify_tour_exists, request.tour_id)
+    finally:
+        tours_client.close()
     
     tour_name = request.tour_name
     tour_price = request.tour_price
@@ -124,46 +241,51 @@ async def add_to_cart(
         # Fallback: Try HTTP request to Tours service
         logging.warning(f"gRPC verification failed for tour {request.tour_id}, trying HTTP")
         try:
-            import httpx
-            from app.core.config import settings
+            response = await guarded_request(
+                get_breaker("tours_http"),
+                "GET",
+                f"{settings.tours_service_url}/tours/{request.tour_id}",
+                timeout=settings.downstream_http_timeout_seconds
+            )
             
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    f"{settings.tours_service_url}/tours/{request.tour_id}"
-                )
+            if response.status_code == 200:
+                tour_json = response.json()
+                tour_info = tour_json.get("tour", {})
+                tour_name = tour_info.get("name", request.tour_name)
+                tour_price = tour_info.get("price", request.tour_price)
+                
+                # Check if published
+                tour_status = tour_info.get("status", "")
+                if tour_status not in ["published", "archived"]:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Tour is not available for purchase"
+                    )
+            else:
+                logging.warning(f"HTTP request failed for tour {request.tour_id}: {response.status_code}")
+                # Use request data as final fallback
+                tour_name = request.tour_name
+                tour_price = request.tour_price
                 
-                if response.status_code == 200:
-                    tour_json = response.json()
-                    tour_info = tour_json.get("tour", {})
-                    tour_name = tour_info.get("name", request.tour_name)
-                    tour_price = tour_info.get("price", request.tour_price)
-                    
-                    # Check if published
-                    tour_status = tour_info.get("status", "")
-                    if tour_status not in ["published", "archived"]:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Tour is not available for purchase"
-                        )
-                else:
-                    logging.warning(f"HTTP request failed for tour {request.tour_id}: {response.status_code}")
-                    # Use request data as final fallback
-                    tour_name = request.tour_name
-                    tour_price = request.tour_price
-                    
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Error fetching tour via HTTP: {e}")
             # Use request data as final fallback
             tour_name = request.tour_name
             tour_price = request.tour_price
     
-    cart, item = service.add_to_cart(
-        user_id=current_user_id,
-        tour_id=request.tour_id,
-        tour_name=tour_name,
-        tour_price=tour_price,
-        quantity=request.quantity
-    )
+    try:
+        cart, item = await service.add_to_cart(
+            user_id=current_user_id,
+            tour_id=request.tour_id,
+            tour_name=tour_name,
+            tour_price=tour_price,
+            quantity=request.quantity,
+            expected_version=expected_version
+        )
+    except CartConflictError as e:
+        raise _cart_conflict(e)
     
     return cart
 
@@ -172,13 +294,17 @@ async def add_to_cart(
 def remove_from_cart(
     item_id: int,
     current_user_id: int = Depends(get_current_user_id),
+    expected_version: Optional[int] = Depends(get_expected_cart_version),
     db: Session = Depends(get_db)
 ):
     """
     Ukloni stavku iz korpe
     """
     service = PurchaseService(db)
-    cart = service.remove_from_cart(current_user_id, item_id)
+    try:
+        cart = service.remove_from_cart(current_user_id, item_id, expected_version)
+    except CartConflictError as e:
+        raise _cart_conflict(e)
     
     if not cart:
         raise HTTPException(
@@ -194,13 +320,17 @@ def update_cart_item(
     item_id: int,
     request: UpdateCartItemRequest,
     current_user_id: int = Depends(get_current_user_id),
+    expected_version: Optional[int] = Depends(get_expected_cart_version),
     db: Session = Depends(get_db)
 ):
     """
     Ažuriraj količinu stavke u korpi
     """
     service = PurchaseService(db)
-    item = service.update_cart_item(current_user_id, item_id, request.quantity)
+    try:
+        item = service.update_cart_item(current_user_id, item_id, request.quantity, expected_version)
+    except CartConflictError as e:
+        raise _cart_conflict(e)
     
     if not item:
         raise HTTPException(
@@ -234,7 +364,8 @@ def clear_cart(
 async def checkout(
     request: CheckoutRequest,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Pokreni checkout proces sa SAGA pattern-om
@@ -250,17 +381,54 @@ async def checkout(
     
     **Napomena:** Ako checkout ne uspe, možete pokušati ponovo. Cart će biti resetovan u PENDING status.
     
+    **Idempotency-Key:** Ponovljen zahtev sa istim ključem ne pokreće novu SAGA
+    transakciju - čeka rezultat originalnog zahteva ili dobija zapamćen odgovor
+    (header `Idempotent-Replayed: true`).
+    
     **Vraća:**
     - `transaction_id`: ID SAGA transakcije
     - `tokens`: Lista purchase tokena (dokaz kupovine)
     - `total_price`: Ukupna cena
     - `status`: Status transakcije
     """
-    service = PurchaseService(db)
+    service = AsyncPurchaseService(db)
+    
+    if not idempotency_key:
+        return await _run_checkout(service, current_user_id, request.cart_id)
+    
+    idempotency = AsyncIdempotencyService(db)
+    record, is_new = await _claim_idempotency_key_async(
+        idempotency, current_user_id, idempotency_key, "checkout", request, _checkout_saga_response
+    )
+    
+    if not is_new:
+        return await _idempotent_replay(record, current_user_id, idempotency_key)
     
+    try:
+        response = await _run_checkout(service, current_user_id, request.cart_id, record.transaction_id)
+    except HTTPException as e:
+        await idempotency.complete(record, e.status_code, {"detail": e.detail})
+        raise
+    except BaseException:
+        # I prekinut zahtev (CancelledError) oslobađa ključ; shield da se
+        # brisanje završi i kada je task već otkazan
+        await asyncio.shield(idempotency.release(record))
+        raise
+    
+    await idempotency.complete(record, status.HTTP_200_OK, response.model_dump(mode="json"))
+    return response
+
+
+async def _run_checkout(
+    service: AsyncPurchaseService,
+    user_id: int,
+    cart_id: int,
+    transaction_id: Optional[str] = None
+) -> CheckoutResponse:
     success, tokens, transaction_id, error = await service.checkout(
-        current_user_id, 
-        request.cart_id
+        user_id, 
+        cart_id,
+        transaction_id
     )
     
     if not success:
@@ -276,6 +444,10 @@ async def checkout(
             detail=f"Checkout failed: {error_detail}"
         )
     
+    return _checkout_response(transaction_id, tokens)
+
+
+def _checkout_response(transaction_id: str, tokens: List[TourPurchaseToken]) -> CheckoutResponse:
     # Kalkulacija ukupne cene
     total_price = sum(token.purchase_price for token in tokens)
     
@@ -288,26 +460,243 @@ async def checkout(
     )
 
 
+@router.post("/checkout/async", response_model=CheckoutAcceptedResponse, status_code=status.HTTP_202_ACCEPTED)
+def checkout_async(
+    request: CheckoutRequest,
+    current_user_id: int = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Asinhroni checkout - SAGA se stavlja u red i odmah se vraća 202
+    
+    Napredak se prati preko:
+    - `GET /transactions/{transaction_id}?wait=25` (long-poll)
+    - `GET /transactions/{transaction_id}/events` (Server-Sent Events)
+    
+    Ponovljen zahtev sa istim `Idempotency-Key` dobija istu transakciju.
+    """
+    service = PurchaseService(db)
+    
+    if not idempotency_key:
+        return _enqueue_checkout(service, current_user_id, request.cart_id)
+    
+    idempotency = IdempotencyService(db)
+    record, is_new = _claim_idempotency_key(
+        idempotency, current_user_id, idempotency_key, "checkout/async", request, _checkout_async_saga_response
+    )
+    
+    if not is_new:
+        return _stored_response(record)
+    
+    try:
+        response = _enqueue_checkout(service, current_user_id, request.cart_id, record.transaction_id)
+    except HTTPException as e:
+        idempotency.complete(record, e.status_code, {"detail": e.detail})
+        raise
+    except Exception:
+        idempotency.release(record)
+        raise
+    
+    idempotency.complete(record, status.HTTP_202_ACCEPTED, response.model_dump(mode="json"))
+    return response
+
+
+def _enqueue_checkout(
+    service: PurchaseService,
+    user_id: int,
+    cart_id: int,
+    transaction_id: Optional[str] = None
+) -> CheckoutAcceptedResponse:
+    transaction_id, error = service.enqueue_checkout(user_id, cart_id, transaction_id)
+    
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Checkout failed: {error}"
+        )
+    
+    checkout_workers.notify()
+    
+    return _accepted_response(transaction_id)
+
+
+def _accepted_response(transaction_id: str) -> CheckoutAcceptedResponse:
+    return CheckoutAcceptedResponse(
+        transaction_id=transaction_id,
+        status="pending",
+        status_url=f"{settings.api_prefix}/transactions/{transaction_id}",
+        events_url=f"{settings.api_prefix}/transactions/{transaction_id}/events",
+        message="Checkout je prihvaćen i biće obrađen uskoro."
+    )
+
+
+def _claim_idempotency_key(
+    idempotency: IdempotencyService,
+    user_id: int,
+    key: str,
+    endpoint: str,
+    request: CheckoutRequest,
+    saga_response: SagaResponseBuilder
+) -> Tuple[IdempotencyKey, bool]:
+    _check_idempotency_key(key)
+    try:
+        return idempotency.claim(
+            user_id,
+            key,
+            request_fingerprint(endpoint, request.model_dump(mode="json")),
+            new_transaction_id(),
+            saga_response
+        )
+    except IdempotencyKeyMismatch as e:
+        raise _idempotency_key_mismatch(e)
+
+
+async def _claim_idempotency_key_async(
+    idempotency: AsyncIdempotencyService,
+    user_id: int,
+    key: str,
+    endpoint: str,
+    request: CheckoutRequest,
+    saga_response: AsyncSagaResponseBuilder
+) -> Tuple[IdempotencyKey, bool]:
+    _check_idempotency_key(key)
+    try:
+        return await idempotency.claim(
+            user_id,
+            key,
+            request_fingerprint(endpoint, request.model_dump(mode="json")),
+            new_transaction_id(),
+            saga_response
+        )
+    except IdempotencyKeyMismatch as e:
+        raise _idempotency_key_mismatch(e)
+
+
+def _check_idempotency_key(key: str):
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+        )
+
+
+def _idempotency_key_mismatch(error: IdempotencyKeyMismatch) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=str(error)
+    )
+
+
+async def _checkout_saga_response(db: AsyncSession, saga: SagaTransaction) -> Optional[Tuple[int, dict]]:
+    """Odgovor sinhronog checkout-a iz završene SAGA-e (zaglavljen Idempotency-Key)"""
+    if saga.status == OrderStatus.COMPLETED:
+        tokens = (await db.scalars(
+            select(TourPurchaseToken).where(
+                TourPurchaseToken.cart_id == saga.cart_id,
+                TourPurchaseToken.user_id == saga.user_id
+            )
+        )).all()
+        return status.HTTP_200_OK, _checkout_response(saga.transaction_id, tokens).model_dump(mode="json")
+    
+    if saga.status == OrderStatus.FAILED:
+        error_detail = saga.error_message or "Unknown error occurred"
+        return status.HTTP_400_BAD_REQUEST, {"detail": f"Checkout failed: {error_detail}"}
+    
+    return None
+
+
+def _checkout_async_saga_response(db: Session, saga: SagaTransaction) -> Optional[Tuple[int, dict]]:
+    """Asinhroni checkout je prihvaćen čim SAGA postoji u redu"""
+    return status.HTTP_202_ACCEPTED, _accepted_response(saga.transaction_id).model_dump(mode="json")
+
+
+async def _load_idempotency_record(user_id: int, key: str) -> Optional[IdempotencyKey]:
+    """Nova sesija po proveri - original se izvršava u drugom zahtevu"""
+    async with AsyncSessionLocal() as db:
+        return await AsyncIdempotencyService(db).get(user_id, key)
+
+
+async def _idempotent_replay(record: IdempotencyKey, user_id: int, key: str) -> JSONResponse:
+    """Sačekaj da se originalni zahtev završi i vrati njegov odgovor"""
+    deadline = time.monotonic() + settings.transaction_status_max_wait_seconds
+    
+    while (
+        record is not None
+        and record.status != IdempotencyStatus.COMPLETED
+        and time.monotonic() < deadline
+    ):
+        await asyncio.sleep(settings.transaction_status_poll_seconds)
+        record = await _load_idempotency_record(user_id, key)
+    
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The original request with this Idempotency-Key did not finish, retry the request"
+        )
+    
+    return _stored_response(record)
+
+
+def _stored_response(record: IdempotencyKey) -> JSONResponse:
+    if record.status != IdempotencyStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A request with this Idempotency-Key is still in progress (transaction {record.transaction_id})",
+            headers={"Retry-After": str(int(settings.transaction_status_poll_seconds) + 1)}
+        )
+    
+    return JSONResponse(
+        status_code=record.response_code,
+        content=json.loads(record.response_body),
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
 # ========== Purchase Tokens Endpoints ==========
 
 @router.get("/tokens", response_model=List[TourPurchaseTokenResponse])
 def get_my_tokens(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Broj tokena po strani"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor iz prethodne strane"),
+    if_none_match: Optional[str] = Header(None),
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
-    Dobij sve purchase tokene trenutnog korisnika (kupljene ture)
+    Dobij purchase tokene trenutnog korisnika (kupljene ture), najnoviji prvi
+    
+    Sledeća strana: `cursor` iz `X-Next-Cursor` headera (nema ga na poslednjoj strani).
+    Ako se istorija nije promenila, `If-None-Match` sa prethodnim `ETag` vraća 304.
     """
     service = PurchaseService(db)
-    tokens = service.get_user_tokens(current_user_id)
-    return tokens
+    after = _decode_cursor(cursor)
+    
+    etag = history_etag("tokens", current_user_id, cursor, limit, *service.get_user_tokens_version(current_user_id))
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    tokens = service.get_user_tokens(current_user_id, limit=limit + 1, after=after)
+    _set_page_headers(response, etag, tokens, limit, lambda t: (t.purchased_at, t.id))
+    return tokens[:limit]
+
+
+@router.get("/tokens/keys")
+def get_token_keys(response: Response):
+    """
+    Javni ključevi (JWKS) za lokalnu proveru potpisanih purchase tokena
+    Opoziv (kompenzovana kupovina) se i dalje proverava preko gRPC VerifyPurchase
+    """
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return purchase_token_signer.jwks()
 
 
 @router.get("/tokens/{token_id}", response_model=TourPurchaseTokenResponse)
 def get_token(
     token_id: int,
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Dobij specifičan purchase token
@@ -328,29 +717,113 @@ def get_token(
 
 @router.get("/transactions", response_model=List[SagaTransactionResponse])
 def get_my_transactions(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Broj transakcija po strani"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor iz prethodne strane"),
+    if_none_match: Optional[str] = Header(None),
     current_user_id: int = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
-    Dobij sve SAGA transakcije trenutnog korisnika
+    Dobij SAGA transakcije trenutnog korisnika, najnovije prve
     Korisno za debugging i praćenje statusa kupovina
+    
+    Paginacija i ETag kao za `GET /tokens`.
     """
     service = PurchaseService(db)
-    transactions = service.get_user_saga_transactions(current_user_id)
-    return transactions
+    after = _decode_cursor(cursor)
+    
+    etag = history_etag(
+        "transactions", current_user_id, cursor, limit,
+        *service.get_user_saga_transactions_version(current_user_id)
+    )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    transactions = service.get_user_saga_transactions(current_user_id, limit=limit + 1, after=after)
+    _set_page_headers(response, etag, transactions, limit, lambda t: (t.created_at, t.id))
+    return transactions[:limit]
+
+
+def _decode_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def _set_page_headers(response: Response, etag: str, rows: list, limit: int, position):
+    """ETag i X-Next-Cursor (rows sadrži jedan red više od limit ako postoji sledeća strana)"""
+    response.headers["ETag"] = etag
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(*position(rows[limit - 1]))
 
 
 @router.get("/transactions/{transaction_id}", response_model=SagaTransactionResponse)
-def get_transaction(
+async def get_transaction(
     transaction_id: str,
+    wait: int = Query(0, ge=0, le=settings.transaction_status_max_wait_seconds, description="Long-poll: čekaj promenu do N sekundi"),
+    after_event: int = Query(0, ge=0, description="ID poslednjeg događaja koji klijent već ima"),
     current_user_id: int = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """
     Dobij detalje specifične SAGA transakcije
+    
+    Sa `wait` > 0 zahtev čeka dok se ne pojavi događaj noviji od `after_event`
+    ili dok se transakcija ne završi.
     """
     service = PurchaseService(db)
-    transaction = service.get_saga_transaction(transaction_id)
+    deadline = time.monotonic() + wait
+    
+    while True:
+        transaction = await run_in_threadpool(service.get_saga_transaction, transaction_id, True)
+        
+        if not transaction:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transaction not found"
+            )
+        
+        # Proveri da li transakcija pripada korisniku
+        if transaction.user_id != current_user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        
+        latest_event_id = transaction.events[-1].id if transaction.events else 0
+        if (
+            transaction.status in TERMINAL_SAGA_STATUSES
+            or latest_event_id > after_event
+            or time.monotonic() >= deadline
+        ):
+            return transaction
+        
+        await asyncio.sleep(settings.transaction_status_poll_seconds)
+
+
+@router.get("/transactions/{transaction_id}/events")
+async def stream_transaction_events(
+    transaction_id: str,
+    last_event_id: Optional[str] = Header(None),
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-Sent Events tok koraka SAGA transakcije
+    
+    Svaki prelaz koraka se šalje kao `event: <started|completed|failed|compensated>`,
+    a na kraju `event: status` sa konačnim statusom. Klijent može nastaviti
+    tok slanjem `Last-Event-ID` zaglavlja.
+    """
+    service = PurchaseService(db)
+    transaction = await run_in_threadpool(service.get_saga_transaction, transaction_id)
     
     if not transaction:
         raise HTTPException(
@@ -358,11 +831,50 @@ def get_transaction(
             detail="Transaction not found"
         )
     
-    # Proveri da li transakcija pripada korisniku
     if transaction.user_id != current_user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied"
         )
     
-    return transaction
+    after_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    
+    return StreamingResponse(
+        _saga_event_stream(transaction.id, after_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _poll_saga_events(saga_id: int, after_event_id: int):
+    """Nova sesija po proveri - tok traje duže od jednog zahteva"""
+    db = SessionLocal()
+    try:
+        events, saga_status = PurchaseService(db).get_saga_events_since(saga_id, after_event_id)
+        return [SagaEventResponse.model_validate(e).model_dump(mode="json") for e in events], saga_status
+    finally:
+        db.close()
+
+
+async def _saga_event_stream(saga_id: int, after_event_id: int):
+    deadline = time.monotonic() + settings.transaction_status_max_wait_seconds
+    last_id = after_event_id
+    
+    # Klijent se ponovo povezuje posle isteka toka
+    yield f"retry: {int(settings.transaction_status_poll_seconds * 1000)}\n\n"
+    
+    while True:
+        events, saga_status = await run_in_threadpool(_poll_saga_events, saga_id, last_id)
+        
+        for event in events:
+            last_id = event["id"]
+            yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        
+        if saga_status in TERMINAL_SAGA_STATUSES:
+            yield f"event: status\ndata: {json.dumps({'status': saga_status.value})}\n\n"
+            return
+        
+        if time.monotonic() >= deadline:
+            return
+        
+        await asyncio.sleep(settings.transaction_status_poll_seconds)
@@ -0,0 +1,207 @@
+"""
+Reports API - Izveštaji o prodaji tura
+
+/reports/* - administrator, sve ture
+/reports/guide/* - vodič, samo njegove ture (lista tura dolazi iz Tours
+servisa, GET /tours/my sa tokenom vodiča)
+
+Izveštaji čitaju inkrementalne agregate (app/services/sales_rollups.py),
+a ne tabelu tokena. Puni izvoz tokena i SAGA transakcija se strimuje
+(app/services/purchase_export.py).
+"""
+
+from datetime import date
+from typing import List, Optional
+import logging
+
+import httpx
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.purchase import require_admin, require_guide
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal
+from app.core.resilience import CircuitOpenError, get_breaker, guarded_request
+from app.schemas.purchase import TourSalesResponse, DailySalesResponse, MessageResponse
+from app.services.purchase_export import PurchaseExporter
+from app.services.sales_rollups import SalesRollupService
+
+router = APIRouter(prefix="/reports", dependencies=[Depends(require_admin)])
+guide_router = APIRouter(prefix="/reports/guide", dependencies=[Depends(require_guide)])
+
+MAX_TOURS_PAGE = 500
+MAX_DAILY_RANGE_DAYS = 366
+
+# Maksimalan broj SQL naredbi po endpoint-u (QUERY_BUDGET_MODE=log|strict)
+REPORT_QUERY_BUDGETS = {
+    ("GET", "/reports/sales/tours"): 1,
+    ("GET", "/reports/sales/daily"): 1,
+    ("POST", "/reports/sales/rebuild"): None,
+    ("GET", "/reports/export/{dataset}"): 2,
+    ("GET", "/reports/guide/sales/tours"): 1,
+    ("GET", "/reports/guide/sales/daily"): 1,
+}
+
+
+@router.get("/sales/tours", response_model=List[TourSalesResponse])
+def get_tour_sales(
+    limit: int = Query(50, ge=1, le=MAX_TOURS_PAGE),
+    order_by: str = Query("revenue", pattern="^(revenue|count)$"),
+    tour_id: Optional[List[int]] = Query(None, description="Ograniči izveštaj na ove ture"),
+    db: Session = Depends(get_db)
+):
+    """
+    Najprodavanije ture po prihodu ili broju prodatih tokena
+    """
+    return SalesRollupService(db).tour_sales(limit, order_by=order_by, tour_ids=tour_id)
+
+
+@router.get("/sales/daily", response_model=List[DailySalesResponse])
+def get_daily_sales(
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    tour_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Prodaja po danu u opsegu [date_from, date_to] (najviše godinu dana)
+    """
+    _validate_daily_range(date_from, date_to)
+    return SalesRollupService(db).daily_sales(date_from, date_to, tour_id=tour_id)
+
+
+def _validate_daily_range(date_from: date, date_to: date):
+    if date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_to must not be before date_from"
+        )
+    if (date_to - date_from).days >= MAX_DAILY_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range must be shorter than {MAX_DAILY_RANGE_DAYS} days"
+        )
+
+
+def _rebuild_rollups():
+    db = SessionLocal()
+    try:
+        result = SalesRollupService(db).rebuild()
+        logging.info(f"[REPORTS] Sales rollups rebuilt: {result}")
+    except Exception as e:
+        db.rollback()
+        logging.error(f"[REPORTS] Sales rollup rebuild failed: {e}")
+    finally:
+        db.close()
+
+
+@router.post("/sales/rebuild", response_model=MessageResponse, status_code=status.HTTP_202_ACCEPTED)
+def rebuild_sales_rollups(background_tasks: BackgroundTasks):
+    """
+    Ponovo izračunaj agregate prodaje iz tokena (u pozadini, seriju po seriju tura)
+    """
+    background_tasks.add_task(_rebuild_rollups)
+    return MessageResponse(message="Sales rollup rebuild started")
+
+
+@router.get("/export/{dataset}")
+def export_purchases(
+    dataset: str = Path(..., pattern="^(tokens|sagas)$"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None)
+):
+    """
+    Puni izvoz tokena (po purchased_at) ili SAGA transakcija sa arhivom
+    (po created_at) kao CSV ili NDJSON, uz opcioni opseg [date_from, date_to]
+
+    Odgovor se strimuje seriju po seriju, pa memorija ne zavisi od veličine tabele.
+    """
+    if date_from is not None and date_to is not None and date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_to must not be before date_from"
+        )
+
+    exporter = PurchaseExporter(dataset, format, date_from=date_from, date_to=date_to)
+    return StreamingResponse(
+        exporter.stream(),
+        media_type=exporter.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{exporter.filename}"'}
+    )
+
+
+# ========== Izveštaji vodiča ==========
+
+async def get_guide_tour_ids(authorization: str = Header(None)) -> List[int]:
+    """
+    Dependency - ID-jevi tura ulogovanog vodiča
+    Tours servis je izvor vlasništva nad turama; poziva se sa tokenom vodiča
+    """
+    try:
+        response = await guarded_request(
+            get_breaker("tours_http"),
+            "GET",
+            f"{settings.tours_service_url}/tours/my",
+            timeout=settings.downstream_http_timeout_seconds,
+            headers={"Authorization": authorization}
+        )
+    except (CircuitOpenError, httpx.HTTPError) as e:
+        logging.error(f"[REPORTS] Loading guide tours failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Tours service unavailable, try again later"
+        )
+
+    if response.status_code != 200:
+        logging.warning(f"[REPORTS] Tours service returned {response.status_code} for /tours/my")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not load the guide's tours"
+        )
+
+    return [tour["id"] for tour in response.json().get("tours") or []]
+
+
+@guide_router.get("/sales/tours", response_model=List[TourSalesResponse])
+def get_guide_tour_sales(
+    limit: int = Query(50, ge=1, le=MAX_TOURS_PAGE),
+    order_by: str = Query("revenue", pattern="^(revenue|count)$"),
+    tour_id: Optional[List[int]] = Query(None, description="Ograniči izveštaj na ove ture"),
+    guide_tour_ids: List[int] = Depends(get_guide_tour_ids),
+    db: Session = Depends(get_db)
+):
+    """
+    Prodaja tura ulogovanog vodiča po prihodu ili broju prodatih tokena
+    Tuđe ture iz tour_id filtera se ignorišu
+    """
+    tour_ids = guide_tour_ids
+    if tour_id:
+        requested = set(tour_id)
+        tour_ids = [t for t in guide_tour_ids if t in requested]
+    if not tour_ids:
+        return []
+    return SalesRollupService(db).tour_sales(limit, order_by=order_by, tour_ids=tour_ids)
+
+
+@guide_router.get("/sales/daily", response_model=List[DailySalesResponse])
+def get_guide_daily_sales(
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    tour_id: Optional[int] = Query(None),
+    guide_tour_ids: List[int] = Depends(get_guide_tour_ids),
+    db: Session = Depends(get_db)
+):
+    """
+    Prodaja tura ulogovanog vodiča po danu u opsegu [date_from, date_to]
+    """
+    _validate_daily_range(date_from, date_to)
+    if tour_id is not None and tour_id not in guide_tour_ids:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tour not found among the guide's tours"
+        )
+    if not guide_tour_ids:
+        return []
+    return SalesRollupService(db).daily_sales(date_from, date_to, tour_id=tour_id, tour_ids=guide_tour_ids)
@@ -5,6 +5,13 @@ class Settings(BaseSettings):
     # Database
     database_url: str
 
+    # Read replika za read-only rute i gRPC (prazno - sve ide na primarnu bazu)
+    database_replica_url: str = ""
+    replica_max_lag_seconds: float = 5.0
+    replica_lag_check_seconds: float = 1.0
+    # Korisnik posle upisa čita sa primarne baze (treba da bude > replica_max_lag_seconds)
+    read_your_writes_seconds: float = 10.0
+
     # Security
     jwt_secret: str
     algorithm: str = "HS256"
@@ -23,6 +30,95 @@ class Settings(BaseSettings):
     # gRPC addresses
     tours_grpc_addr: str = "tours-service:50052"
 
+    # Purchases gRPC server (grpc.aio)
+    # grpc_embedded=False kada server radi kao poseban proces (python -m app.grpc.purchases_server)
+    grpc_port: int = 50053
+    grpc_embedded: bool = True
+    grpc_max_concurrent_rpcs: int = 1000
+    grpc_db_concurrency: int = 10
+    grpc_metrics_port: int = 9103
+    grpc_index_refresh_seconds: float = 2.0
+    grpc_index_full_refresh_seconds: float = 300.0
+    # catch_up ponovo čita tokene od poslednjeg prolaza minus margina (najduža transakcija + razlika satova)
+    grpc_index_rescan_margin_seconds: float = 60.0
+    # Ture kojih nema u indeksu proveravaju se u bazi - indeks drugog procesa/replike
+    # ne vidi tokene do sledećeg catch_up prolaza (grpc_index_refresh_seconds)
+    grpc_index_miss_db_fallback: bool = True
+    
+    # Asinhroni checkout
+    checkout_workers: int = 4
+    checkout_poll_interval_seconds: float = 1.0
+    checkout_job_lease_seconds: int = 300
+    transaction_status_poll_seconds: float = 0.5
+    transaction_status_max_wait_seconds: int = 30
+    idempotency_key_ttl_hours: int = 24
+    # Ključ IN_PROGRESS stariji od checkout_deadline_seconds + margine se razrešava po SAGA-i
+    idempotency_stale_margin_seconds: float = 30.0
+
+    # Potpisani purchase tokeni (Ed25519) - vidi app/core/purchase_tokens.py
+    purchase_token_signing_key: str = ""
+    purchase_token_verification_keys: str = ""
+    # Bez signing ključa servis ne startuje, osim ako je privremeni ključ izričito dozvoljen (razvoj)
+    purchase_token_allow_ephemeral_key: bool = False
+
+    # Outbox sporednih efekata checkout-a (statistika u Stakeholders/Followers)
+    outbox_batch_size: int = 200
+    outbox_poll_interval_seconds: float = 1.0
+    outbox_lease_seconds: int = 60
+    outbox_max_attempts: int = 12
+    outbox_backoff_base_seconds: float = 1.0
+    outbox_backoff_max_seconds: float = 600.0
+    outbox_sent_retention_hours: int = 24
+
+    # Arhiviranje završenih SAGA transakcija (app/services/saga_archive.py)
+    saga_archive_enabled: bool = True
+    saga_archive_after_days: int = 30
+    saga_archive_batch_size: int = 500
+    saga_archive_batch_pause_seconds: float = 0.1
+    saga_archive_interval_seconds: float = 3600.0
+
+    # Čišćenje napuštenih (PENDING) i neuspelih korpi (app/services/cart_sweeper.py)
+    cart_sweep_enabled: bool = True
+    cart_abandon_after_days: int = 30
+    cart_failed_retention_days: int = 7
+    cart_sweep_batch_size: int = 500
+    cart_sweep_batch_pause_seconds: float = 0.1
+    cart_sweep_interval_seconds: float = 900.0
+
+    # Admin izvoz tokena i SAGA transakcija (app/services/purchase_export.py)
+    export_yield_per: int = 1000
+    export_log_every_rows: int = 100000
+
+    # Keš snimaka korpe (GET /cart) - u TTL prozoru bez provere verzije u bazi
+    cart_cache_ttl_seconds: float = 5.0
+    cart_cache_max_entries: int = 10000
+
+    # Tracing (OTLP, npr. http://jaeger:4317) - prazno isključuje izvoz span-ova
+    otel_exporter_endpoint: str = ""
+    otel_service_name: str = "purchases-service"
+
+    # Brojanje SQL naredbi po zahtevu: off | log | strict (development/test)
+    query_budget_mode: str = "off"
+    query_budget_default: int = 20
+    query_repeat_threshold: int = 3
+
+    # SAGA timeout-i po koraku
+    saga_validate_user_timeout_seconds: float = 6.0
+    saga_reserve_tours_timeout_seconds: float = 15.0
+    saga_payment_timeout_seconds: float = 10.0
+    saga_update_stats_timeout_seconds: float = 12.0
+
+    # Ukupan budžet checkout-a (deli se između koraka) i limiti pojedinačnih poziva
+    checkout_deadline_seconds: float = 10.0
+    tours_grpc_timeout_seconds: float = 2.0
+    downstream_http_timeout_seconds: float = 3.0
+    downstream_min_timeout_seconds: float = 0.05
+
+    # Circuit breaker-i downstream zavisnosti
+    circuit_failure_threshold: int = 5
+    circuit_recovery_seconds: float = 30.0
+    circuit_half_open_max_calls: int = 1
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,7 +1,18 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.core.query_budget import uncounted
+from app.observability import db_read_routing_total
+
+logger = logging.getLogger(__name__)
 
 engine = create_engine(
     settings.database_url,
@@ -10,11 +21,191 @@ engine = create_engine(
     max_overflow=20
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False - objekti ostaju učitani posle commit-a, pa serijalizacija
+# odgovora ne radi dodatne SELECT upite
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+
+def _async_database_url(database_url: str) -> str:
+    """Isti URL baze sa asinhronim drajverom (asyncpg / aiosqlite)"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return database_url
+
+
+def new_async_engine(pool_size: int = 10, max_overflow: int = 20, database_url: Optional[str] = None) -> AsyncEngine:
+    """
+    Asinhroni engine nad bazom servisa (ili replikom, uz database_url)
+    Konekcije su vezane za event loop u kome su otvorene, pa kod koji ima
+    sopstveni loop (npr. gRPC server) pravi poseban engine
+    """
+    return create_async_engine(
+        _async_database_url(database_url or settings.database_url),
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow
+    )
+
+
+# Asinhroni engine za async rute i SAGA orkestraciju - commit-i ne blokiraju event loop
+async_engine = new_async_engine()
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
 
 Base = declarative_base()
 
 
+# ========== Read replika ==========
+
+# Zaostajanje replike u sekundama (0 ako je replika sustigla primarnu bazu)
+_PG_REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def replica_lag_seconds(db: Session) -> float:
+    """Zaostajanje replike; baze bez replikacije (npr. SQLite u testu) vraćaju 0"""
+    if db.get_bind().dialect.name != "postgresql":
+        return 0.0
+    return float(db.execute(_PG_REPLICA_LAG_SQL).scalar() or 0.0)
+
+
+class SessionRouter:
+    """
+    Bira bazu za čitanje: replika ili primarna baza
+
+    Čitanje ide na primarnu bazu kada:
+    - replika nije podešena (DATABASE_REPLICA_URL)
+    - korisnik je pisao u poslednjih read_your_writes_seconds (vidi svoje izmene)
+    - replika zaostaje više od replica_max_lag_seconds ili provera ne uspe
+
+    Zaostajanje se meri najviše jednom u replica_lag_check_seconds.
+    Prozor posle upisa se pamti u procesu; read_your_writes_seconds treba
+    da bude veći od replica_max_lag_seconds.
+    """
+
+    def __init__(
+        self,
+        primary_factory: Callable[[], Session],
+        replica_factory: Optional[Callable[[], Session]],
+        max_lag_seconds: float,
+        lag_check_seconds: float,
+        sticky_seconds: float,
+        max_tracked_users: int = 100000
+    ):
+        self.primary_factory = primary_factory
+        self.replica_factory = replica_factory
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_seconds = lag_check_seconds
+        self.sticky_seconds = sticky_seconds
+        self.max_tracked_users = max_tracked_users
+        self._recent_writes: "OrderedDict[int, float]" = OrderedDict()
+        self._lag: Optional[float] = None
+        self._lag_checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @property
+    def has_replica(self) -> bool:
+        return self.replica_factory is not None
+
+    def mark_write(self, user_id: int):
+        """Poziva se posle commit-a upisa korisnika (korpa, checkout)"""
+        with self._lock:
+            self._recent_writes[user_id] = time.monotonic()
+            self._recent_writes.move_to_end(user_id)
+            while len(self._recent_writes) > self.max_tracked_users:
+                self._recent_writes.popitem(last=False)
+
+    def is_sticky(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        with self._lock:
+            written_at = self._recent_writes.get(user_id)
+            if written_at is None:
+                return False
+            if time.monotonic() - written_at < self.sticky_seconds:
+                return True
+            del self._recent_writes[user_id]
+            return False
+
+    def replica_lag(self) -> Optional[float]:
+        """Keširano zaostajanje replike (None ako provera nije uspela)"""
+        with self._lock:
+            if time.monotonic() - self._lag_checked_at < self.lag_check_seconds:
+                return self._lag
+            self._lag_checked_at = time.monotonic()
+
+        db = self.replica_factory()
+        try:
+            with uncounted():
+                lag = replica_lag_seconds(db)
+        except Exception as e:
+            logger.warning(f"Replica lag check failed: {e}")
+            lag = None
+        finally:
+            db.close()
+
+        with self._lock:
+            self._lag = lag
+        return lag
+
+    def route(self, user_id: Optional[int] = None) -> Tuple[str, str]:
+        """
+        Returns:
+            (baza, razlog) - baza je "replica" ili "primary"
+        """
+        if not self.has_replica:
+            return "primary", "no_replica"
+        if self.is_sticky(user_id):
+            return "primary", "recent_write"
+        lag = self.replica_lag()
+        if lag is None or lag > self.max_lag_seconds:
+            return "primary", "replica_lagging"
+        return "replica", "ok"
+
+    def read_session(self, user_id: Optional[int] = None) -> Session:
+        target, reason = self.route(user_id)
+        db_read_routing_total.labels(target, reason).inc()
+        return self.replica_factory() if target == "replica" else self.primary_factory()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "replica": self.has_replica,
+                "lag_seconds": self._lag,
+                "sticky_users": len(self._recent_writes),
+            }
+
+
+replica_engine = create_engine(
+    settings.database_replica_url,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+) if settings.database_replica_url else None
+
+ReplicaSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=replica_engine
+) if replica_engine is not None else None
+
+session_router = SessionRouter(
+    primary_factory=SessionLocal,
+    replica_factory=ReplicaSessionLocal,
+    max_lag_seconds=settings.replica_max_lag_seconds,
+    lag_check_seconds=settings.replica_lag_check_seconds,
+    sticky_seconds=settings.read_your_writes_seconds
+)
+
+
 def get_db():
     """Dependency za dobijanje database sesije"""
     db = SessionLocal()
@@ -22,3 +213,18 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def read_db(user_id: Optional[int] = None):
+    """Sesija za čitanje (replika ili primarna baza, vidi SessionRouter)"""
+    db = session_router.read_session(user_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Dependency za dobijanje asinhrone database sesije"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,183 @@
+"""
+Purchase Tokens - Potpisani dokaz kupovine koji se proverava bez poziva servisa
+
+Format (kompaktan, URL-safe):
+    tpt1.<base64url(JSON claims)>.<base64url(Ed25519 potpis)>
+
+Claims: kid (ID ključa), tid (ID tokena), uid (korisnik), tour (tura),
+iat (vreme izdavanja, unix sekunde). Potpisuje se tačno "tpt1.<claims>".
+
+Javni ključevi se objavljuju na GET /tokens/keys (JWKS, OKP/Ed25519), pa
+drugi servis može da proveri token lokalno sa verify_purchase_token().
+Potpis dokazuje samo da je token izdat - za opoziv (kompenzovan checkout)
+i dalje služi gRPC VerifyPurchase.
+
+Ključ: PURCHASE_TOKEN_SIGNING_KEY (base64url 32-bajtni Ed25519 seed).
+Bez njega servis ne startuje; privremeni ključ po procesu se pravi samo uz
+PURCHASE_TOKEN_ALLOW_EPHEMERAL_KEY=true (razvoj).
+Stari javni ključevi ostaju u PURCHASE_TOKEN_VERIFICATION_KEYS
+("kid:base64url,...") dok god postoje tokeni potpisani njima.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = "tpt1"
+
+
+class PurchaseTokenKeyMissing(RuntimeError):
+    """Signing ključ nije podešen, a privremeni ključ nije dozvoljen"""
+
+
+class InvalidPurchaseToken(ValueError):
+    """Token nije ispravno formiran, ključ nije poznat ili potpis ne važi"""
+
+
+@dataclass(frozen=True)
+class PurchaseTokenClaims:
+    key_id: str
+    token_id: str
+    user_id: int
+    tour_id: int
+    issued_at: datetime
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _raw_public_key(public_key: Ed25519PublicKey) -> bytes:
+    return public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+
+def key_id_for(public_key: Ed25519PublicKey) -> str:
+    """Stabilan ID ključa - prvih 8 bajtova SHA-256 javnog ključa"""
+    return _b64encode(hashlib.sha256(_raw_public_key(public_key)).digest()[:8])
+
+
+def public_key_from_b64(data: str) -> Ed25519PublicKey:
+    return Ed25519PublicKey.from_public_bytes(_b64decode(data))
+
+
+def load_jwks(jwks: dict) -> Dict[str, Ed25519PublicKey]:
+    """Javni ključevi iz odgovora GET /tokens/keys"""
+    return {
+        key["kid"]: public_key_from_b64(key["x"])
+        for key in jwks.get("keys", [])
+        if key.get("kty") == "OKP" and key.get("crv") == "Ed25519"
+    }
+
+
+def verify_purchase_token(
+    token: str,
+    public_keys: Dict[str, Ed25519PublicKey],
+    user_id: Optional[int] = None,
+    tour_id: Optional[int] = None
+) -> PurchaseTokenClaims:
+    """
+    Proveri potpis tokena (i, opciono, da pripada korisniku i turi)
+
+    Raises:
+        InvalidPurchaseToken
+    """
+    try:
+        prefix, encoded_claims, encoded_signature = token.split(".")
+    except (AttributeError, ValueError):
+        raise InvalidPurchaseToken("Malformed purchase token")
+    if prefix != TOKEN_PREFIX:
+        raise InvalidPurchaseToken("Unsupported purchase token format")
+
+    try:
+        raw = json.loads(_b64decode(encoded_claims))
+        signature = _b64decode(encoded_signature)
+        claims = PurchaseTokenClaims(
+            key_id=str(raw["kid"]),
+            token_id=str(raw["tid"]),
+            user_id=int(raw["uid"]),
+            tour_id=int(raw["tour"]),
+            issued_at=datetime.fromtimestamp(int(raw["iat"]), tz=timezone.utc)
+        )
+    except (ValueError, KeyError, TypeError):
+        raise InvalidPurchaseToken("Malformed purchase token claims")
+
+    public_key = public_keys.get(claims.key_id)
+    if public_key is None:
+        raise InvalidPurchaseToken(f"Unknown purchase token key '{claims.key_id}'")
+    try:
+        public_key.verify(signature, f"{prefix}.{encoded_claims}".encode("ascii"))
+    except InvalidSignature:
+        raise InvalidPurchaseToken("Invalid purchase token signature")
+
+    if user_id is not None and claims.user_id != user_id:
+        raise InvalidPurchaseToken("Purchase token belongs to another user")
+    if tour_id is not None and claims.tour_id != tour_id:
+        raise InvalidPurchaseToken("Purchase token is for another tour")
+    return claims
+
+
+class PurchaseTokenSigner:
+    """Izdavanje tokena aktivnim ključem i objava javnih ključeva"""
+
+    def __init__(self, private_key: Ed25519PrivateKey, verification_keys: Optional[Dict[str, Ed25519PublicKey]] = None):
+        self._private_key = private_key
+        self.key_id = key_id_for(private_key.public_key())
+        self.public_keys: Dict[str, Ed25519PublicKey] = dict(verification_keys or {})
+        self.public_keys[self.key_id] = private_key.public_key()
+
+    @classmethod
+    def from_settings(cls) -> "PurchaseTokenSigner":
+        verification_keys = {}
+        for item in filter(None, (part.strip() for part in settings.purchase_token_verification_keys.split(","))):
+            kid, _, encoded = item.partition(":")
+            verification_keys[kid] = public_key_from_b64(encoded)
+
+        if settings.purchase_token_signing_key:
+            private_key = Ed25519PrivateKey.from_private_bytes(_b64decode(settings.purchase_token_signing_key))
+        elif not settings.purchase_token_allow_ephemeral_key:
+            raise PurchaseTokenKeyMissing(
+                "PURCHASE_TOKEN_SIGNING_KEY is not set; set PURCHASE_TOKEN_ALLOW_EPHEMERAL_KEY=true "
+                "to use an ephemeral key in development"
+            )
+        else:
+            logger.warning("PURCHASE_TOKEN_SIGNING_KEY not set, using an ephemeral key (tokens will not verify after restart)")
+            private_key = Ed25519PrivateKey.generate()
+        return cls(private_key, verification_keys)
+
+    def sign(self, token_id: str, user_id: int, tour_id: int, issued_at: datetime) -> str:
+        claims = json.dumps(
+            {"kid": self.key_id, "tid": token_id, "uid": user_id, "tour": tour_id, "iat": int(issued_at.timestamp())},
+            separators=(",", ":")
+        )
+        signing_input = f"{TOKEN_PREFIX}.{_b64encode(claims.encode('utf-8'))}"
+        return f"{signing_input}.{_b64encode(self._private_key.sign(signing_input.encode('ascii')))}"
+
+    def verify(self, token: str, user_id: Optional[int] = None, tour_id: Optional[int] = None) -> PurchaseTokenClaims:
+        return verify_purchase_token(token, self.public_keys, user_id=user_id, tour_id=tour_id)
+
+    def jwks(self) -> dict:
+        return {
+            "keys": [
+                {"kty": "OKP", "crv": "Ed25519", "use": "sig", "alg": "EdDSA", "kid": kid, "x": _b64encode(_raw_public_key(key))}
+                for kid, key in self.public_keys.items()
+            ]
+        }
+
+
+purchase_token_signer = PurchaseTokenSigner.from_settings()
@@ -0,0 +1,149 @@
+"""
+Query Budget - Brojanje SQL naredbi po zahtevu (development/test)
+
+Listener na `before_cursor_execute` broji naredbe za trenutni zahtev
+(ContextVar, pa radi i za rute u threadpool-u i za async sesije).
+Middleware na kraju zahteva:
+- loguje otiske naredbi koje se ponavljaju (tipičan N+1)
+- poredi broj naredbi sa budžetom endpoint-a; u "strict" modu prekoračenje
+  podiže QueryBudgetExceeded, pa testovi (TestClient) padaju
+
+Uključuje se podešavanjem QUERY_BUDGET_MODE=log|strict (podrazumevano off).
+"""
+
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_current_counter: ContextVar[Optional["QueryCounter"]] = ContextVar("query_counter", default=None)
+
+_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Zahtev je izvršio više SQL naredbi nego što budžet dozvoljava"""
+
+    def __init__(self, endpoint: str, count: int, budget: int, repeated: List[Tuple[str, int]]):
+        self.endpoint = endpoint
+        self.count = count
+        self.budget = budget
+        self.repeated = repeated
+        super().__init__(f"{endpoint} executed {count} SQL statements (budget {budget})")
+
+
+def statement_fingerprint(statement: str) -> str:
+    """Otisak naredbe - literali i brojevi zamenjeni sa ?, razmaci sažeti"""
+    return _WHITESPACE_PATTERN.sub(" ", _LITERAL_PATTERN.sub("?", statement)).strip()
+
+
+class QueryCounter:
+    """Brojač SQL naredbi jednog zahteva"""
+
+    def __init__(self):
+        self.fingerprints: Counter = Counter()
+
+    @property
+    def count(self) -> int:
+        return sum(self.fingerprints.values())
+
+    def record(self, statement: str):
+        self.fingerprints[statement_fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Otisci koji su izvršeni bar `threshold` puta"""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.record(statement)
+
+
+def install_query_counter(engine: Engine):
+    """Registruj listener na engine (za async engine proslediti async_engine.sync_engine)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Broji SQL naredbe izvršene unutar bloka"""
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+@contextmanager
+def uncounted() -> Iterator[None]:
+    """Naredbe unutar bloka se ne broje (infrastruktura, npr. provera replike)"""
+    token = _current_counter.set(None)
+    try:
+        yield
+    finally:
+        _current_counter.reset(token)
+
+
+def assert_query_budget(counter: QueryCounter, budget: int, endpoint: str = "block", repeat_threshold: int = 3):
+    """Za testove - podiže QueryBudgetExceeded ako je budžet prekoračen"""
+    if counter.count > budget:
+        raise QueryBudgetExceeded(endpoint, counter.count, budget, counter.repeated(repeat_threshold))
+
+
+class QueryBudgetMiddleware:
+    """
+    ASGI middleware koji broji SQL naredbe po zahtevu
+
+    budgets: {"GET /cart": 3, ...} - ključ je metoda i šablon putanje rute;
+    None znači da se budžet ne proverava (long-poll/SSE - broj zavisi od trajanja)
+    """
+
+    def __init__(
+        self,
+        app,
+        budgets: Dict[str, Optional[int]],
+        default_budget: int = 20,
+        repeat_threshold: int = 3,
+        strict: bool = False
+    ):
+        self.app = app
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.repeat_threshold = repeat_threshold
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as counter:
+            await self.app(scope, receive, send)
+
+        route = scope.get("route")
+        endpoint = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+        budget = self.budgets.get(endpoint, self.default_budget)
+
+        for fingerprint, times in counter.repeated(self.repeat_threshold):
+            logger.warning(f"[QUERY BUDGET] {endpoint} repeated statement {times}x: {fingerprint[:300]}")
+
+        if budget is None or counter.count <= budget:
+            logger.debug(f"[QUERY BUDGET] {endpoint}: {counter.count}/{budget} statements")
+            return
+
+        logger.error(f"[QUERY BUDGET] {endpoint} executed {counter.count} SQL statements (budget {budget})")
+        if self.strict:
+            # Odgovor je već poslat - greška izlazi iz aplikacije (TestClient je prosleđuje testu)
+            raise QueryBudgetExceeded(endpoint, counter.count, budget, counter.repeated(self.repeat_threshold))
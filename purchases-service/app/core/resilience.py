@@ -0,0 +1,211 @@
+"""
+Resilience - Circuit breaker-i i deadline budžet za downstream pozive
+
+CircuitBreaker (po zavisnosti - tours gRPC, tours HTTP, stakeholders, followers):
+- CLOSED: pozivi prolaze, uzastopne greške se broje
+- OPEN: posle `failure_threshold` grešaka pozivi se odbijaju odmah,
+  bez čekanja na timeout, dok ne istekne `recovery_timeout`
+- HALF_OPEN: propušta se najviše `half_open_max_calls` probnih poziva;
+  uspeh zatvara kolo, greška ga ponovo otvara
+
+Deadline je ukupan vremenski budžet (npr. jednog checkout-a). Svaki
+poziv dobija timeout = min(sopstveni limit, preostalo vreme), pa se
+budžet deli između koraka umesto da se timeout-i sabiraju.
+
+Breaker-i su thread-safe jer se gRPC klijent poziva iz thread-ova.
+"""
+
+import enum
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Kolo je otvoreno - poziv je odbijen bez kontaktiranja servisa"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit '{name}' is open (retry in {retry_after:.1f}s)")
+
+
+class DeadlineExceeded(Exception):
+    """Ukupan vremenski budžet je potrošen"""
+
+
+class CircuitBreaker:
+    """Circuit breaker jedne downstream zavisnosti"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._current_state() != CircuitState.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """
+        Da li poziv sme da krene
+        U HALF_OPEN stanju zauzima mesto probnog poziva - pozivalac mora
+        zatim pozvati record_success() ili record_failure()
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CircuitState.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+            self._half_open_calls = 0
+
+    def record_failure(self):
+        with self._lock:
+            state = self._current_state()
+            self._failures += 1
+            if state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != CircuitState.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} failure(s)")
+                self._state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            return {"state": state.value, "failures": self._failures}
+
+
+class Deadline:
+    """Ukupan vremenski budžet operacije (monotoni sat)"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """
+        Timeout za sledeći poziv: min(cap, preostalo vreme)
+        Raises:
+            DeadlineExceeded - ako je ostalo manje od minimalnog timeout-a
+        """
+        remaining = self.remaining()
+        if remaining < settings.downstream_min_timeout_seconds:
+            raise DeadlineExceeded(f"Deadline of {self.seconds}s exceeded")
+        return remaining if cap is None else min(cap, remaining)
+
+
+def call_timeout(deadline: Optional[Deadline], cap: float) -> float:
+    """Timeout poziva - bez deadline-a važi samo limit poziva"""
+    return cap if deadline is None else deadline.timeout(cap)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Deljeni breaker zavisnosti (kreira se pri prvom korišćenju)"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.circuit_failure_threshold,
+                recovery_timeout=settings.circuit_recovery_seconds,
+                half_open_max_calls=settings.circuit_half_open_max_calls
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def breaker_snapshot() -> Dict[str, dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+async def guarded_request(
+    breaker: CircuitBreaker,
+    method: str,
+    url: str,
+    timeout: float,
+    **kwargs
+) -> httpx.Response:
+    """
+    HTTP poziv kroz circuit breaker
+    Mrežne greške, timeout-i, prekid i 5xx odgovori se računaju kao greške servisa
+
+    Raises:
+        CircuitOpenError, httpx.HTTPError
+    """
+    if not breaker.allow_request():
+        raise CircuitOpenError(breaker.name, breaker.retry_after())
+
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.request(method, url, **kwargs)
+    except BaseException:
+        breaker.record_failure()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
@@ -0,0 +1,81 @@
+"""
+Scheduler - Periodični pozadinski poslovi servisa (održavanje baze)
+
+Svaki posao je sinhrona funkcija koja se izvršava u thread-u
+(asyncio.to_thread), pa ne blokira event loop. Prvo pokretanje i razmak
+između pokretanja imaju jitter, da se poslovi više replika ne poklapaju;
+poslovi sami moraju biti bezbedni za paralelno izvršavanje (SKIP LOCKED).
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from app.observability import scheduled_job_duration_seconds, scheduled_job_runs_total
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PeriodicJob:
+    name: str
+    interval_seconds: float
+    func: Callable[[], object]
+    jitter: float = 0.1
+
+
+class Scheduler:
+    """Pokreće registrovane periodične poslove u trenutnom event loop-u"""
+
+    def __init__(self):
+        self._jobs: List[PeriodicJob] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, name: str, interval_seconds: float, func: Callable[[], object], jitter: float = 0.1):
+        self._jobs.append(PeriodicJob(name, interval_seconds, func, jitter))
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run(job), name=f"scheduled-{job.name}")
+            for job in self._jobs
+        ]
+        logger.info("Started %d scheduled jobs", len(self._tasks))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, job: PeriodicJob):
+        # Prvo pokretanje negde u prvom intervalu
+        await asyncio.sleep(random.uniform(0, job.interval_seconds * job.jitter))
+        while True:
+            await self.run_once(job)
+            await asyncio.sleep(job.interval_seconds * random.uniform(1 - job.jitter, 1 + job.jitter))
+
+    @staticmethod
+    async def run_once(job: PeriodicJob) -> Optional[object]:
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            result = await asyncio.to_thread(job.func)
+            logger.info(f"Scheduled job {job.name} finished: {result}")
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcome = "error"
+            logger.error(f"Scheduled job {job.name} failed: {e}")
+            return None
+        finally:
+            scheduled_job_runs_total.labels(job.name, outcome).inc()
+            scheduled_job_duration_seconds.labels(job.name).observe(time.perf_counter() - started)
+
+
+scheduler = Scheduler()
@@ -0,0 +1,97 @@
+"""
+Schema Upgrade - Dopuna tabela koje su postojale pre novih kolona i indeksa
+
+Base.metadata.create_all() kreira samo tabele koje ne postoje, a Postgres
+podaci žive na trajnom volume-u. Zato se pri startu (posle create_all)
+idempotentno dodaje ono što je kasnije dodato u postojeće tabele:
+- shopping_carts.version (optimistic concurrency)
+- uq_order_items_cart_tour - posle spajanja duplih (cart_id, tour_id) stavki,
+  jer ga koristi INSERT ... ON CONFLICT (cart_id, tour_id)
+- indeksi za istoriju, arhiviranje i čišćenje korpi
+
+Sve ide u jednoj transakciji; na PostgreSQL-u je zaštićeno advisory lock-om,
+pa više replika može da startuje istovremeno.
+Ručno pokretanje: python -m app.core.schema_upgrade
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.models.purchase import ShoppingCart, OrderItem, TourPurchaseToken, SagaTransaction
+
+logger = logging.getLogger(__name__)
+
+# Proizvoljan ključ advisory lock-a za upgrade šeme purchases servisa
+_UPGRADE_LOCK_KEY = 7340031
+
+# Indeksi dodati u tabele koje su postojale ranije
+_ADDED_INDEXES = {
+    ShoppingCart.__table__: ("ix_shopping_carts_user_pending", "ix_shopping_carts_status_updated"),
+    TourPurchaseToken.__table__: ("ix_tour_purchase_tokens_user_purchased", "ix_tour_purchase_tokens_purchased_at"),
+    SagaTransaction.__table__: ("ix_saga_transactions_user_created", "ix_saga_transactions_status_updated"),
+}
+
+# Duplikati se spajaju u stavku sa najmanjim id-em (količine i cene se sabiraju)
+_MERGE_DUPLICATE_ITEMS = text("""
+    UPDATE order_items SET
+        quantity = (SELECT SUM(d.quantity) FROM order_items d
+                    WHERE d.cart_id = order_items.cart_id AND d.tour_id = order_items.tour_id),
+        price = (SELECT SUM(d.price) FROM order_items d
+                 WHERE d.cart_id = order_items.cart_id AND d.tour_id = order_items.tour_id)
+    WHERE id IN (SELECT MIN(id) FROM order_items GROUP BY cart_id, tour_id HAVING COUNT(*) > 1)
+""")
+_DELETE_DUPLICATE_ITEMS = text("""
+    DELETE FROM order_items
+    WHERE id NOT IN (SELECT MIN(id) FROM order_items GROUP BY cart_id, tour_id)
+""")
+
+
+def _add_cart_version(conn: Connection):
+    columns = {column["name"] for column in inspect(conn).get_columns("shopping_carts")}
+    if "version" in columns:
+        return
+    conn.execute(text("ALTER TABLE shopping_carts ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    logger.info("Schema upgrade: added shopping_carts.version")
+
+
+def _add_order_item_unique(conn: Connection):
+    inspector = inspect(conn)
+    existing = {c["name"] for c in inspector.get_unique_constraints("order_items")}
+    existing |= {i["name"] for i in inspector.get_indexes("order_items") if i.get("unique")}
+    if "uq_order_items_cart_tour" in existing:
+        return
+
+    merged = conn.execute(_MERGE_DUPLICATE_ITEMS).rowcount
+    deleted = conn.execute(_DELETE_DUPLICATE_ITEMS).rowcount
+    if conn.dialect.name == "sqlite":
+        # SQLite ne podržava ADD CONSTRAINT - jedinstveni indeks važi i za ON CONFLICT
+        conn.execute(text("CREATE UNIQUE INDEX uq_order_items_cart_tour ON order_items (cart_id, tour_id)"))
+    else:
+        conn.execute(text(
+            "ALTER TABLE order_items ADD CONSTRAINT uq_order_items_cart_tour UNIQUE (cart_id, tour_id)"
+        ))
+    logger.info(f"Schema upgrade: added uq_order_items_cart_tour (merged {merged}, deleted {deleted} duplicate items)")
+
+
+def _add_indexes(conn: Connection):
+    for table, names in _ADDED_INDEXES.items():
+        for index in table.indexes:
+            if index.name in names:
+                index.create(conn, checkfirst=True)
+
+
+def upgrade_schema(engine: Engine):
+    """Idempotentno - poziva se pri svakom startu posle create_all"""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _UPGRADE_LOCK_KEY})
+        _add_cart_version(conn)
+        _add_order_item_unique(conn)
+        _add_indexes(conn)
+
+
+if __name__ == "__main__":
+    from app.core.database import engine
+    upgrade_schema(engine)
@@ -1,13 +1,40 @@
 """
-gRPC server for Purchases service
+gRPC server for Purchases service (grpc.aio)
+
+Provera kupovine odgovara iz in-memory indeksa; dok indeks nije popunjen,
+i za ture kojih nema u indeksu (token iz drugog procesa/replike još nije
+učitan), koristi se asinhrona sesija nad bazom sa ograničenim brojem
+paralelnih upita.
+Svaki RPC se meri (Prometheus histogram i brojač po metodi i statusu).
+
+Server može da radi:
+- u procesu REST API-ja (grpc_embedded=True, sopstveni event loop u thread-u)
+- kao poseban proces, nezavisno skaliran od REST workera:
+      python -m app.grpc.purchases_server
+  tada sam dopunjava indeks iz baze i izlaže metrike na grpc_metrics_port
 """
+import asyncio
+import functools
 import grpc
 import logging
-from concurrent import futures
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from app.core.database import SessionLocal
+import signal
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.config import settings
+from app.core.database import SessionLocal, new_async_engine, session_router
 from app.models.purchase import TourPurchaseToken, OrderStatus
+from app.observability import (
+    db_read_routing_total,
+    grpc_server_handled_total,
+    grpc_server_handling_seconds,
+    grpc_server_in_flight,
+    purchase_index_lookups_total
+)
+from app.services.purchase_index import purchase_index, PurchaseEntry
+
+logger = logging.getLogger(__name__)
 
 # Try to import generated proto files
 try:
@@ -28,98 +55,273 @@ except ImportError as e:
         GRPC_AVAILABLE = False
         logging.warning(f"Purchases proto files not found: {e}. Direct import also failed: {e2}. gRPC server will not start.")
 
+SERVER_OPTIONS = [
+    ('grpc.keepalive_time_ms', 30000),
+    ('grpc.keepalive_timeout_ms', 5000),
+    ('grpc.keepalive_permit_without_calls', True),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.http2.min_time_between_pings_ms', 10000),
+    ('grpc.http2.min_ping_interval_without_data_ms', 300000),
+    ('grpc.max_connection_idle_ms', 60000),
+    ('grpc.max_connection_age_ms', 120000),
+]
+
+
+def observed_rpc(method: str):
+    """Meri trajanje RPC-a i beleži status (OK, APPLICATION_ERROR ili gRPC kod)"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(self, request, context):
+            started = time.perf_counter()
+            status = "OK"
+            grpc_server_in_flight.labels(method).inc()
+            try:
+                response = await handler(self, request, context)
+                if getattr(response, "error", ""):
+                    status = "APPLICATION_ERROR"
+                return response
+            except asyncio.CancelledError:
+                status = "CANCELLED"
+                raise
+            except Exception:
+                code = context.code() if hasattr(context, "code") else None
+                status = (code or grpc.StatusCode.UNKNOWN).name
+                raise
+            finally:
+                grpc_server_in_flight.labels(method).dec()
+                grpc_server_handled_total.labels(method, status).inc()
+                grpc_server_handling_seconds.labels(method, status).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
 
 class PurchasesServicer(purchases_pb2_grpc.PurchasesServiceServicer):
     """gRPC servicer for purchases verification"""
-    
-    def VerifyPurchase(self, request, context):
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        db_concurrency: int,
+        replica_session_factory: Optional[async_sessionmaker] = None
+    ):
+        self.session_factory = session_factory
+        self.replica_session_factory = replica_session_factory
+        self._db_slots = asyncio.Semaphore(db_concurrency)
+
+    @observed_rpc("VerifyPurchase")
+    async def VerifyPurchase(self, request, context):
         """Verify if user has purchased a specific tour"""
-        logging.info(f"[gRPC] VerifyPurchase called for user_id: {request.user_id}, tour_id: {request.tour_id}")
-        
-        db: Session = SessionLocal()
+        logger.debug("[gRPC] VerifyPurchase user_id=%s tour_id=%s", request.user_id, request.tour_id)
+
         try:
-            # Query for active purchase token
-            token = db.query(TourPurchaseToken).filter(
-                and_(
-                    TourPurchaseToken.user_id == request.user_id,
-                    TourPurchaseToken.tour_id == request.tour_id,
-                    TourPurchaseToken.is_active == OrderStatus.COMPLETED
-                )
-            ).first()
-            
-            if token:
-                logging.info(f"[gRPC] Purchase verified: user {request.user_id} has token for tour {request.tour_id}")
-                return purchases_pb2.VerifyPurchaseResponse(
-                    has_purchased=True,
-                    token_id=str(token.id),
-                    purchased_at=token.purchased_at.isoformat() if token.purchased_at else "",
-                    error=""
-                )
-            else:
-                logging.info(f"[gRPC] Purchase not found: user {request.user_id} has not purchased tour {request.tour_id}")
-                return purchases_pb2.VerifyPurchaseResponse(
-                    has_purchased=False,
-                    token_id="",
-                    purchased_at="",
-                    error=""
-                )
-                
+            entry = (await self._lookup_many(request.user_id, [request.tour_id]))[request.tour_id]
         except Exception as e:
-            logging.error(f"[gRPC] Error verifying purchase: {e}")
+            logger.error("[gRPC] Error verifying purchase: %s", e)
             return purchases_pb2.VerifyPurchaseResponse(
                 has_purchased=False,
                 token_id="",
                 purchased_at="",
                 error=str(e)
             )
-        finally:
-            db.close()
 
+        has_purchased, token_id, purchased_at = _entry_fields(entry)
+        return purchases_pb2.VerifyPurchaseResponse(
+            has_purchased=has_purchased,
+            token_id=token_id,
+            purchased_at=purchased_at,
+            error=""
+        )
 
-def start_grpc_server(port: str = "50053"):
-    """Start the gRPC server"""
-    if not GRPC_AVAILABLE:
-        logging.error("gRPC proto files not available. Cannot start gRPC server.")
-        return None
-    
-    if purchases_pb2_grpc is None:
-        logging.error("purchases_pb2_grpc is None. Cannot start gRPC server.")
-        return None
-    
+    @observed_rpc("VerifyPurchases")
+    async def VerifyPurchases(self, request, context):
+        """Verify purchases of several tours for one user in a single call"""
+        tour_ids = list(request.tour_ids)
+        logger.debug("[gRPC] VerifyPurchases user_id=%s tours=%d", request.user_id, len(tour_ids))
+
+        try:
+            entries = await self._lookup_many(request.user_id, tour_ids)
+        except Exception as e:
+            logger.error("[gRPC] Error verifying purchases: %s", e)
+            return purchases_pb2.VerifyPurchasesResponse(error=str(e))
+
+        purchases = []
+        for tour_id in tour_ids:
+            has_purchased, token_id, purchased_at = _entry_fields(entries[tour_id])
+            purchases.append(purchases_pb2.TourPurchaseStatus(
+                tour_id=tour_id,
+                has_purchased=has_purchased,
+                token_id=token_id,
+                purchased_at=purchased_at
+            ))
+
+        return purchases_pb2.VerifyPurchasesResponse(purchases=purchases, error="")
+
+    async def _lookup_many(self, user_id: int, tour_ids: List[int]) -> Dict[int, Optional[PurchaseEntry]]:
+        """Answer from the in-memory index; query the database until it is warm and for index misses"""
+        if not purchase_index.is_warm:
+            purchase_index_lookups_total.labels("database").inc()
+            logger.debug("[gRPC] Purchase index not warm, falling back to database")
+            return await self._query_purchases(user_id, tour_ids)
+
+        entries = purchase_index.lookup_many(user_id, tour_ids)
+        missing = [tour_id for tour_id, entry in entries.items() if entry is None]
+        if not missing or not settings.grpc_index_miss_db_fallback:
+            purchase_index_lookups_total.labels("index").inc()
+            return entries
+
+        # Kupovina iz drugog procesa/replike može biti u bazi pre sledećeg catch_up prolaza
+        purchase_index_lookups_total.labels("index_miss").inc()
+        found = {
+            tour_id: entry
+            for tour_id, entry in (await self._query_purchases(user_id, missing)).items()
+            if entry is not None
+        }
+        purchase_index.add_entries(user_id, found)
+        entries.update(found)
+        return entries
+
+    async def _query_purchases(self, user_id: int, tour_ids: List[int]) -> Dict[int, Optional[PurchaseEntry]]:
+        session_factory = await self._read_session_factory(user_id)
+        async with self._db_slots:
+            async with session_factory() as db:
+                rows = (await db.execute(
+                    select(
+                        TourPurchaseToken.tour_id,
+                        TourPurchaseToken.id,
+                        TourPurchaseToken.purchased_at
+                    ).where(
+                        and_(
+                            TourPurchaseToken.user_id == user_id,
+                            TourPurchaseToken.tour_id.in_(tour_ids),
+                            TourPurchaseToken.is_active == OrderStatus.COMPLETED
+                        )
+                    )
+                )).all()
+
+        entries: Dict[int, Optional[PurchaseEntry]] = {tour_id: None for tour_id in tour_ids}
+        for tour_id, token_id, purchased_at in rows:
+            if entries[tour_id] is None:
+                entries[tour_id] = (token_id, purchased_at)
+        return entries
+
+    async def _read_session_factory(self, user_id: int) -> async_sessionmaker:
+        """Replika kada je sustigla primarnu bazu i korisnik nije nedavno kupovao"""
+        if self.replica_session_factory is None:
+            return self.session_factory
+        target, reason = await asyncio.to_thread(session_router.route, user_id)
+        db_read_routing_total.labels(target, reason).inc()
+        return self.replica_session_factory if target == "replica" else self.session_factory
+
+
+def _entry_fields(entry: Optional[PurchaseEntry]) -> Tuple[bool, str, str]:
+    """Convert an index entry to (has_purchased, token_id, purchased_at) response fields"""
+    if entry is None:
+        return False, "", ""
+    token_id, purchased_at = entry
+    return True, str(token_id), purchased_at.isoformat() if purchased_at else ""
+
+
+def _refresh_index_once(full: bool):
+    db = SessionLocal()
     try:
-        # Add server options for better connection handling
-        options = [
-            ('grpc.keepalive_time_ms', 30000),
-            ('grpc.keepalive_timeout_ms', 5000),
-            ('grpc.keepalive_permit_without_calls', True),
-            ('grpc.http2.max_pings_without_data', 0),
-            ('grpc.http2.min_time_between_pings_ms', 10000),
-            ('grpc.http2.min_ping_interval_without_data_ms', 300000),
-            ('grpc.max_connection_idle_ms', 60000),
-            ('grpc.max_connection_age_ms', 120000),
-        ]
-        
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10), options=options)
-        purchases_pb2_grpc.add_PurchasesServiceServicer_to_server(PurchasesServicer(), server)
-        
-        listen_addr = f'[::]:{port}'
-        server.add_insecure_port(listen_addr)
-        
-        logging.info(f"[gRPC] Starting Purchases gRPC server on port {port}")
-        server.start()
-        
+        if full:
+            purchase_index.warm(db)
+        else:
+            purchase_index.catch_up(db)
+    finally:
+        db.close()
+
+
+async def _refresh_index_periodically():
+    """Samostalni server: dopuna indeksa novim tokenima i povremeno puno učitavanje"""
+    last_full_refresh = time.monotonic()
+    while True:
+        await asyncio.sleep(settings.grpc_index_refresh_seconds)
+        full = time.monotonic() - last_full_refresh >= settings.grpc_index_full_refresh_seconds
         try:
-            server.wait_for_termination()
-        except KeyboardInterrupt:
-            logging.info("[gRPC] Shutting down Purchases gRPC server...")
-            server.stop(grace=5)
-            
-        return server
-        
+            await asyncio.to_thread(_refresh_index_once, full)
+            if full:
+                last_full_refresh = time.monotonic()
+        except Exception as e:
+            logger.error("[gRPC] Purchase index refresh failed: %s", e)
+
+
+async def serve(port: int = None, refresh_index: bool = False, stop_event: Optional[asyncio.Event] = None):
+    """Pokreni grpc.aio server i čekaj do zaustavljanja"""
+    if not GRPC_AVAILABLE or purchases_pb2_grpc is None:
+        logging.error("gRPC proto files not available. Cannot start gRPC server.")
+        return
+
+    port = port or settings.grpc_port
+    engine = new_async_engine(pool_size=settings.grpc_db_concurrency, max_overflow=0)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    replica_engine = new_async_engine(
+        pool_size=settings.grpc_db_concurrency,
+        max_overflow=0,
+        database_url=settings.database_replica_url
+    ) if settings.database_replica_url else None
+    replica_session_factory = async_sessionmaker(
+        replica_engine, expire_on_commit=False, class_=AsyncSession
+    ) if replica_engine is not None else None
+
+    server = grpc.aio.server(
+        options=SERVER_OPTIONS,
+        maximum_concurrent_rpcs=settings.grpc_max_concurrent_rpcs
+    )
+    purchases_pb2_grpc.add_PurchasesServiceServicer_to_server(
+        PurchasesServicer(session_factory, settings.grpc_db_concurrency, replica_session_factory), server
+    )
+    server.add_insecure_port(f'[::]:{port}')
+
+    logger.info("[gRPC] Starting Purchases gRPC server on port %s", port)
+    await server.start()
+
+    refresher = asyncio.create_task(_refresh_index_periodically()) if refresh_index else None
+    try:
+        if stop_event is None:
+            await server.wait_for_termination()
+        else:
+            await stop_event.wait()
+    finally:
+        if refresher is not None:
+            refresher.cancel()
+        logger.info("[gRPC] Shutting down Purchases gRPC server...")
+        await server.stop(grace=5)
+        await engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
+
+
+def start_grpc_server(port: str = None):
+    """Start the gRPC server in the calling thread (own event loop)"""
+    try:
+        asyncio.run(serve(int(port) if port else None))
     except Exception as e:
         logging.error(f"Error starting gRPC server: {e}")
-        return None
+
+
+async def _run_standalone():
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    # Indeks se puni pre prvog odgovora; do tada odgovara baza
+    try:
+        await asyncio.to_thread(_refresh_index_once, True)
+    except Exception as e:
+        logger.error("[gRPC] Failed to warm purchase index: %s", e)
+
+    await serve(refresh_index=True, stop_event=stop_event)
+
+
+def main():
+    from prometheus_client import start_http_server
+
+    logging.basicConfig(level=logging.INFO)
+    start_http_server(settings.grpc_metrics_port)
+    asyncio.run(_run_standalone())
 
 
 if __name__ == "__main__":
-    start_grpc_server()
+    main()
@@ -7,6 +7,7 @@ from typing import Tuple, Optional
 import os
 
 from app.core.config import settings
+from app.core.resilience import get_breaker
 
 # Try to import generated proto files
 try:
@@ -19,6 +20,15 @@ except ImportError:
     GRPC_AVAILABLE = False
     logging.warning("Tours proto files not found. gRPC features will use fallback.")
 
+# Greške koje znače da servis nije dostupan (ostale su odgovor servisa)
+_UNAVAILABLE_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+}
+
 
 class ToursGRPCClient:
     """Client for Tours service gRPC communication"""
@@ -27,6 +37,7 @@ class ToursGRPCClient:
         self.grpc_addr = grpc_addr or settings.tours_grpc_addr
         self.channel = None
         self.stub = None
+        self.breaker = get_breaker("tours_grpc")
         
     def connect(self) -> bool:
         """Establish gRPC connection"""
@@ -43,10 +54,17 @@ class ToursGRPCClient:
             logging.error(f"Failed to connect to Tours gRPC: {e}")
             return False
     
-    def verify_tour_exists(self, tour_id: int) -> Tuple[bool, Optional[dict], Optional[str]]:
+    def verify_tour_exists(
+        self, 
+        tour_id: int, 
+        timeout: Optional[float] = None
+    ) -> Tuple[bool, Optional[dict], Optional[str]]:
         """
         Verify if a tour exists and get its details
         
+        timeout - gRPC deadline poziva (podrazumevano tours_grpc_timeout_seconds);
+        dok je kolo otvoreno poziv se odmah odbija
+        
         Returns:
             (exists, tour_data, error_message)
         """
@@ -61,9 +79,16 @@ class ToursGRPCClient:
                 logging.warning(f"gRPC connection failed for tour {tour_id}")
                 return False, None, "gRPC connection failed"
         
+        if not self.breaker.allow_request():
+            return False, None, "gRPC circuit open"
+        
         try:
             request = tours_pb2.VerifyTourRequest(tour_id=tour_id)
-            response = self.stub.VerifyTourExists(request, timeout=5.0)
+            response = self.stub.VerifyTourExists(
+                request, 
+                timeout=timeout or settings.tours_grpc_timeout_seconds
+            )
+            self.breaker.record_success()
             
             if response.error and response.error != "":
                 return False, None, response.error
@@ -80,10 +105,15 @@ class ToursGRPCClient:
             return True, tour_data, None
             
         except grpc.RpcError as e:
+            if e.code() in _UNAVAILABLE_CODES:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
             logging.error(f"gRPC error verifying tour: {e}")
             # Return failure so HTTP can be tried
             return False, None, f"gRPC error: {str(e)}"
         except Exception as e:
+            self.breaker.record_failure()
             logging.error(f"Error verifying tour: {e}")
             return False, None, str(e)
 
@@ -1,14 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.database import engine
+from app.core.database import engine, async_engine, replica_engine, SessionLocal, session_router
 from app.models.purchase import Base
-from app.api.purchase import router as purchase_router
+from app.api.purchase import router as purchase_router, PURCHASE_QUERY_BUDGETS
+from app.api.reports import router as reports_router, guide_router as guide_reports_router, REPORT_QUERY_BUDGETS
+from app.core.schema_upgrade import upgrade_schema
+from app.core.query_budget import install_query_counter, QueryBudgetMiddleware
+from app.core.resilience import breaker_snapshot
+from app.observability import metrics_response, setup_tracing
+from app.services.purchase_index import purchase_index
+from app.services.cart_cache import cart_cache
+from app.saga.worker import checkout_workers
+from app.saga.outbox import outbox_dispatcher
+from app.core.scheduler import scheduler
+from app.services.saga_archive import archive_sagas_job
+from app.services.cart_sweeper import sweep_carts_job
 import threading
 import logging
 
-# Kreiranje tabela u bazi
+# Kreiranje tabela u bazi i dopuna postojećih (nove kolone, ograničenja, indeksi)
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 # Kreiranje FastAPI aplikacije
 app = FastAPI(
@@ -51,27 +64,91 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+# OpenTelemetry (samo kada je OTEL_EXPORTER_ENDPOINT podešen)
+setup_tracing(app)
+
 # Uključivanje router-a
 app.include_router(
     purchase_router, 
     prefix=f"{settings.api_prefix}", 
     tags=["purchase"]
 )
+app.include_router(
+    reports_router,
+    prefix=f"{settings.api_prefix}",
+    tags=["reports"]
+)
+app.include_router(
+    guide_reports_router,
+    prefix=f"{settings.api_prefix}",
+    tags=["reports"]
+)
+
+# Brojanje SQL naredbi po zahtevu (samo development/test)
+if settings.query_budget_mode != "off":
+    install_query_counter(engine)
+    install_query_counter(async_engine.sync_engine)
+    if replica_engine is not None:
+        install_query_counter(replica_engine)
+    app.add_middleware(
+        QueryBudgetMiddleware,
+        budgets={
+            f"{method} {settings.api_prefix}{path}": budget
+            for (method, path), budget in {**PURCHASE_QUERY_BUDGETS, **REPORT_QUERY_BUDGETS}.items()
+        },
+        default_budget=settings.query_budget_default,
+        repeat_threshold=settings.query_repeat_threshold,
+        strict=settings.query_budget_mode == "strict"
+    )
 
 # Start gRPC server in background thread
 def start_grpc_background():
+    try:
+        # Indeks kupovina mora biti popunjen pre nego što gRPC počne da odgovara
+        db = SessionLocal()
+        try:
+            purchase_index.warm(db)
+        finally:
+            db.close()
+    except Exception as e:
+        logging.error(f"Failed to warm purchase index: {e}")
+
     try:
         from app.grpc.purchases_server import start_grpc_server
-        start_grpc_server("50053")
+        start_grpc_server(settings.grpc_port)
     except Exception as e:
         logging.error(f"Failed to start gRPC server: {e}")
 
-# Start gRPC server
-grpc_thread = threading.Thread(target=start_grpc_background, daemon=True)
-grpc_thread.start()
-logging.info("gRPC server thread started")
+# Start gRPC server (osim kada radi kao poseban proces)
+if settings.grpc_embedded:
+    grpc_thread = threading.Thread(target=start_grpc_background, daemon=True)
+    grpc_thread.start()
+    logging.info("gRPC server thread started")
+
+# Periodični poslovi održavanja baze
+if settings.saga_archive_enabled:
+    scheduler.add("saga_archive", settings.saga_archive_interval_seconds, archive_sagas_job)
+if settings.cart_sweep_enabled:
+    scheduler.add("cart_sweep", settings.cart_sweep_interval_seconds, sweep_carts_job)
+
+# Workeri za asinhroni checkout
+@app.on_event("startup")
+async def start_checkout_workers():
+    checkout_workers.start()
+    outbox_dispatcher.start()
+    scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_checkout_workers():
+    await checkout_workers.stop()
+    await outbox_dispatcher.stop()
+    await scheduler.stop()
+    await async_engine.dispose()
+
 
 # Health check endpoints
 @app.get("/")
@@ -83,19 +160,28 @@ async def root():
         "features": [
             "Shopping Cart",
             "SAGA Pattern Checkout", 
+            "Async Checkout Queue",
             "Purchase Tokens",
             "Distributed Transactions",
             "gRPC Purchase Verification"
         ]
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrike"""
+    return metrics_response()
+
 @app.get("/health")
 async def health_check():
     """Provera zdravlja servisa"""
     return {
         "status": "healthy",
         "service": "purchase",
-        "database": "connected"
+        "database": "connected",
+        "circuits": breaker_snapshot(),
+        "cart_cache": cart_cache.stats(),
+        "database_routing": session_router.stats()
     }
 
 
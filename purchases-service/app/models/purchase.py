@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SQLEnum, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Enum as SQLEnum, Text, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, timezone
@@ -7,6 +7,15 @@ import json
 from app.core.database import Base
 
 
+def utcnow() -> datetime:
+    """
+    Trenutno UTC vreme bez zone
+    Kolone su TIMESTAMP WITHOUT TIME ZONE, a asyncpg odbija datetime sa zonom
+    za njih - sve što se upisuje ili poredi sa ovim kolonama ide kroz utcnow()
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class OrderStatus(str, enum.Enum):
     """Statusi narudžbine"""
     PENDING = "pending" 
@@ -16,24 +25,67 @@ class OrderStatus(str, enum.Enum):
     CANCELLED = "cancelled" 
 
 
+class SagaEventType(str, enum.Enum):
+    """Tipovi prelaza SAGA koraka"""
+    STARTED = "started"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    COMPENSATED = "compensated"
+
+
+class CheckoutJobStatus(str, enum.Enum):
+    """Statusi checkout posla u redu"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+
+
+class OutboxStatus(str, enum.Enum):
+    """Statusi događaja u outbox-u"""
+    PENDING = "pending"
+    IN_FLIGHT = "in_flight"
+    SENT = "sent"
+    DEAD = "dead"
+
+
+class IdempotencyStatus(str, enum.Enum):
+    """Statusi idempotentnog zahteva"""
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+
 class ShoppingCart(Base):
     """
     Shopping Cart - Korpa za kupovinu
     Svaki korisnik može imati aktivnu korpu
     """
     __tablename__ = "shopping_carts"
+    __table_args__ = (
+        # Parcijalni indeks - aktivnih korpi ima malo, pa lookup korpe ostaje brz
+        Index(
+            "ix_shopping_carts_user_pending", "user_id",
+            postgresql_where=text("status = 'PENDING'"),
+            sqlite_where=text("status = 'PENDING'")
+        ),
+        Index("ix_shopping_carts_status_updated", "status", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)
     total_price = Column(Float, default=0.0)
     status = Column(SQLEnum(OrderStatus), default=OrderStatus.PENDING)
     
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # Optimistic concurrency - svaka izmena korpe povećava verziju
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     
     items = relationship("OrderItem", back_populates="cart", cascade="all, delete-orphan")
     purchase_tokens = relationship("TourPurchaseToken", back_populates="cart")
     
+    __mapper_args__ = {"version_id_col": version}
+    
     def calculate_total(self):
         """Kalkulacija ukupne cene"""
         self.total_price = sum(item.price for item in self.items)
@@ -46,6 +98,9 @@ class OrderItem(Base):
     Sadrži informacije o turi koja se kupuje
     """
     __tablename__ = "order_items"
+    __table_args__ = (
+        UniqueConstraint("cart_id", "tour_id", name="uq_order_items_cart_tour"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey("shopping_carts.id"), nullable=False)
@@ -57,7 +112,7 @@ class OrderItem(Base):
     quantity = Column(Integer, default=1)
     price = Column(Float, nullable=False)  # tour_price * quantity
     
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
     
     cart = relationship("ShoppingCart", back_populates="items")
     
@@ -73,6 +128,12 @@ class TourPurchaseToken(Base):
     Generiše se nakon uspešnog checkout-a
     """
     __tablename__ = "tour_purchase_tokens"
+    __table_args__ = (
+        # Keyset paginacija istorije: WHERE user_id = ? AND (purchased_at, id) < (?, ?)
+        Index("ix_tour_purchase_tokens_user_purchased", "user_id", "purchased_at", "id"),
+        # Dopuna gRPC indeksa: WHERE purchased_at >= ?
+        Index("ix_tour_purchase_tokens_purchased_at", "purchased_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     token = Column(String(255), unique=True, nullable=False, index=True)
@@ -84,7 +145,7 @@ class TourPurchaseToken(Base):
     tour_name = Column(String(255), nullable=False)
     
     purchase_price = Column(Float, nullable=False)
-    purchased_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    purchased_at = Column(DateTime, default=utcnow)
     
     is_active = Column(SQLEnum(OrderStatus), default=OrderStatus.COMPLETED)
     
@@ -97,6 +158,10 @@ class SagaTransaction(Base):
     Čuva stanje svake transakcije za potrebe rollback-a
     """
     __tablename__ = "saga_transactions"
+    __table_args__ = (
+        Index("ix_saga_transactions_user_created", "user_id", "created_at", "id"),
+        Index("ix_saga_transactions_status_updated", "status", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     transaction_id = Column(String(100), unique=True, nullable=False, index=True)
@@ -107,10 +172,194 @@ class SagaTransaction(Base):
     status = Column(SQLEnum(OrderStatus), default=OrderStatus.PROCESSING)
     current_step = Column(String(100))
     
+    # Legacy JSON kolone - novi koraci se beleže u saga_events
     steps_completed = Column(Text)
     compensation_log = Column(Text) 
     error_message = Column(Text, nullable=True)
     
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    
+    events = relationship(
+        "SagaEvent",
+        back_populates="saga",
+        order_by="SagaEvent.id",
+        cascade="all, delete-orphan"
+    )
+
+
+class SagaEvent(Base):
+    """
+    SAGA Event - Append-only log prelaza SAGA koraka
+    Jedan red po prelazu (started/completed/failed/compensated) sa trajanjem koraka
+    """
+    __tablename__ = "saga_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    saga_id = Column(Integer, ForeignKey("saga_transactions.id"), nullable=False, index=True)
+    
+    step = Column(String(100), nullable=False)
+    event = Column(SQLEnum(SagaEventType), nullable=False)
+    detail = Column(Text, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    
+    created_at = Column(DateTime, default=utcnow)
+    
+    saga = relationship("SagaTransaction", back_populates="events")
+
+
+class SagaTransactionArchive(Base):
+    """
+    Arhiva završenih SAGA transakcija (iste kolone i ID-jevi kao saga_transactions)
+    Puni je SagaArchiver, čitanja padaju na arhivu kada transakcije nema u aktivnoj tabeli
+    """
+    __tablename__ = "saga_transactions_archive"
+    __table_args__ = (
+        Index("ix_saga_transactions_archive_user_created", "user_id", "created_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    transaction_id = Column(String(100), unique=True, nullable=False, index=True)
+    
+    cart_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    
+    status = Column(SQLEnum(OrderStatus))
+    current_step = Column(String(100))
+    
+    steps_completed = Column(Text)
+    compensation_log = Column(Text)
+    error_message = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
     completed_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=utcnow)
+    
+    events = relationship(
+        "SagaEventArchive",
+        order_by="SagaEventArchive.id",
+        cascade="all, delete-orphan"
+    )
+
+
+class SagaEventArchive(Base):
+    """Arhiva događaja arhiviranih SAGA transakcija"""
+    __tablename__ = "saga_events_archive"
+    
+    id = Column(Integer, primary_key=True)
+    saga_id = Column(Integer, ForeignKey("saga_transactions_archive.id"), nullable=False, index=True)
+    
+    step = Column(String(100), nullable=False)
+    event = Column(SQLEnum(SagaEventType), nullable=False)
+    detail = Column(Text, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    
+    created_at = Column(DateTime)
+
+
+class CheckoutJob(Base):
+    """
+    Checkout Job - Red asinhronih checkout-a
+    Workeri preuzimaju poslove sa FOR UPDATE SKIP LOCKED
+    """
+    __tablename__ = "checkout_jobs"
+    __table_args__ = (
+        Index("ix_checkout_jobs_status_created", "status", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_id = Column(String(100), unique=True, nullable=False, index=True)
+    
+    cart_id = Column(Integer, ForeignKey("shopping_carts.id"), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    
+    status = Column(SQLEnum(CheckoutJobStatus), default=CheckoutJobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    
+    created_at = Column(DateTime, default=utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class IdempotencyKey(Base):
+    """
+    Idempotency Key - Zapamćen checkout zahtev po Idempotency-Key headeru
+    Čuva otisak zahteva, SAGA transakciju i konačan odgovor za ponovljene zahteve
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    key = Column(String(255), nullable=False)
+    
+    fingerprint = Column(String(64), nullable=False)
+    transaction_id = Column(String(100), nullable=True)
+    
+    status = Column(SQLEnum(IdempotencyStatus), default=IdempotencyStatus.IN_PROGRESS, nullable=False)
+    response_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+
+class TourSalesRollup(Base):
+    """
+    Tour Sales Rollup - Ukupan broj prodaja i prihod po turi
+    Ažurira se u istoj transakciji sa generisanjem i kompenzacijom tokena
+    """
+    __tablename__ = "tour_sales_rollups"
+    
+    tour_id = Column(Integer, primary_key=True)
+    tour_name = Column(String(255), nullable=False)
+    
+    purchase_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+
+class TourSalesDaily(Base):
+    """Tour Sales Daily - Broj prodaja i prihod po turi i danu (UTC)"""
+    __tablename__ = "tour_sales_daily"
+    __table_args__ = (
+        Index("ix_tour_sales_daily_day", "day"),
+    )
+    
+    tour_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    
+    purchase_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+
+class OutboxEvent(Base):
+    """
+    Outbox Event - Sporedni efekat checkout-a koji treba isporučiti drugom servisu
+    Upisuje se u istoj transakciji sa tokenima, isporučuje ga OutboxDispatcher
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("ix_outbox_events_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(50), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    saga_id = Column(String(100), nullable=True, index=True)
+    payload = Column(Text, nullable=False)
+    
+    status = Column(SQLEnum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    claim_token = Column(String(32), nullable=True)
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=utcnow)
+    next_attempt_at = Column(DateTime, default=utcnow, nullable=False)
+    claimed_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
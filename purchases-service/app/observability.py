@@ -0,0 +1,181 @@
+"""
+Observability - Prometheus metrike i tracing Purchase servisa
+
+Metrike su definisane na nivou modula (jedan registry po procesu).
+REST aplikacija ih izlaže na /metrics, a samostalni gRPC server na
+posebnom HTTP portu (grpc_metrics_port).
+
+Span-ovi se prave preko OpenTelemetry API-ja; bez podešenog
+OTEL_EXPORTER_ENDPOINT tracer je no-op, pa instrumentacija ne košta ništa.
+"""
+
+import logging
+
+from fastapi import FastAPI, Response
+from opentelemetry import trace
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("purchases-service")
+
+# gRPC odgovori iz indeksa su ispod milisekunde - gušći bucket-i na početku
+GRPC_LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+# ========== gRPC server ==========
+
+grpc_server_handling_seconds = Histogram(
+    "purchases_grpc_server_handling_seconds",
+    "Duration of purchases gRPC calls in seconds",
+    ["method", "status"],
+    buckets=GRPC_LATENCY_BUCKETS
+)
+
+grpc_server_handled_total = Counter(
+    "purchases_grpc_server_handled_total",
+    "Total purchases gRPC calls by method and status",
+    ["method", "status"]
+)
+
+grpc_server_in_flight = Gauge(
+    "purchases_grpc_server_in_flight",
+    "Purchases gRPC calls currently being handled",
+    ["method"]
+)
+
+purchase_index_lookups_total = Counter(
+    "purchases_index_lookups_total",
+    "Purchase verifications by source (index, database before warm-up, or index_miss database check)",
+    ["source"]
+)
+
+purchase_index_tokens = Gauge(
+    "purchases_index_tokens",
+    "Active purchase tokens held in the in-memory index"
+)
+
+# ========== Baza ==========
+
+db_read_routing_total = Counter(
+    "purchases_db_read_routing_total",
+    "Read sessions by target database (replica, primary) and reason",
+    ["target", "reason"]
+)
+
+# ========== SAGA checkout ==========
+
+# Koraci zovu druge servise - bucket-i do deadline-a checkout-a
+SAGA_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+saga_step_duration_seconds = Histogram(
+    "purchases_saga_step_duration_seconds",
+    "Duration of checkout saga steps including retries",
+    ["step", "outcome"],
+    buckets=SAGA_LATENCY_BUCKETS
+)
+
+saga_steps_total = Counter(
+    "purchases_saga_steps_total",
+    "Checkout saga steps by outcome (completed, failed)",
+    ["step", "outcome"]
+)
+
+saga_compensations_total = Counter(
+    "purchases_saga_compensations_total",
+    "Checkout saga compensation actions by outcome (compensated, failed)",
+    ["step", "outcome"]
+)
+
+saga_duration_seconds = Histogram(
+    "purchases_saga_duration_seconds",
+    "Duration of whole checkout sagas",
+    ["outcome"],
+    buckets=SAGA_LATENCY_BUCKETS
+)
+
+saga_in_flight = Gauge(
+    "purchases_saga_in_flight",
+    "Checkout sagas currently executing"
+)
+
+# ========== Outbox ==========
+
+outbox_events_total = Counter(
+    "purchases_outbox_events_total",
+    "Outbox events by delivery outcome (sent, retry, dead)",
+    ["event_type", "outcome"]
+)
+
+outbox_deliveries_total = Counter(
+    "purchases_outbox_deliveries_total",
+    "Coalesced outbox HTTP deliveries by outcome (sent, retry, dead)",
+    ["event_type", "outcome"]
+)
+
+# ========== Održavanje ==========
+
+scheduled_job_runs_total = Counter(
+    "purchases_scheduled_job_runs_total",
+    "Scheduled maintenance job runs by outcome",
+    ["job", "outcome"]
+)
+
+scheduled_job_duration_seconds = Histogram(
+    "purchases_scheduled_job_duration_seconds",
+    "Duration of scheduled maintenance job runs",
+    ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+
+saga_archived_total = Counter(
+    "purchases_saga_archived_total",
+    "Saga transactions moved to the archive tables"
+)
+
+
+carts_swept_total = Counter(
+    "purchases_carts_swept_total",
+    "Abandoned or failed shopping carts deleted by the sweeper",
+    ["status"]
+)
+
+cart_items_swept_total = Counter(
+    "purchases_cart_items_swept_total",
+    "Order items deleted together with swept shopping carts"
+)
+
+
+def metrics_response() -> Response:
+    """Odgovor za /metrics endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def setup_tracing(app: FastAPI) -> bool:
+    """
+    Uključi izvoz span-ova (OTLP) i instrumentaciju FastAPI-ja
+    SAGA span-ovi checkout-a postaju deca span-a HTTP zahteva
+    """
+    if not settings.otel_exporter_endpoint:
+        return False
+
+    try:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning(f"OpenTelemetry SDK not installed, tracing disabled: {e}")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.otel_service_name}))
+    provider.add_span_processor(BatchSpanProcessor(
+        OTLPSpanExporter(endpoint=settings.otel_exporter_endpoint, insecure=True)
+    ))
+    trace.set_tracer_provider(provider)
+    FastAPIInstrumentor.instrument_app(app)
+    return True
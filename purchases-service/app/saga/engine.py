@@ -0,0 +1,251 @@
+"""
+SAGA Engine - Deklarativno izvršavanje SAGA koraka kao DAG-a
+
+Koraci deklarišu zavisnosti (depends_on). Koraci čije su zavisnosti
+završene pokreću se odmah, pa se nezavisni koraci izvršavaju paralelno.
+Svaki korak ima svoj timeout i politiku ponovnih pokušaja. Ako je zadat
+ukupan Deadline, korak dobija najviše preostalo vreme, a posle isteka se
+novi pokušaji ne pokreću. Korak bez timeout-a (upis u bazu, commit) se
+pokreće samo ako budžet nije istekao i nikad se ne prekida u toku - prekinut
+commit bi ostavio nepoznato stanje, a kompenzacija bi vratila plaćanje za
+kupovinu koja je možda upisana.
+
+Ako korak ne uspe, novi koraci se ne pokreću, koraci u toku se puštaju da
+završe, a zatim se kompenzuju svi započeti koraci obrnutim topološkim
+redosledom - korak se kompenzuje tek kad su kompenzovani svi koraci koji od
+njega zavise, a međusobno nezavisne kompenzacije idu paralelno.
+
+Napomena: koraci koji rade sa istom sesijom baze ne smeju biti nezavisni
+(moraju biti povezani zavisnošću), jer sesija nije bezbedna za paralelnu upotrebu.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.core.resilience import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class SagaAbort(Exception):
+    """Poslovni neuspeh koraka - ne pokušava se ponovo"""
+
+
+class SagaExecutionError(Exception):
+    """SAGA nije uspela; započeti koraci su već kompenzovani"""
+
+    def __init__(self, step: str, cause: BaseException):
+        self.step = step
+        self.cause = cause
+        super().__init__(str(cause))
+
+
+class SagaStep:
+    """Pojedinačan korak u SAGA transakciji"""
+
+    def __init__(
+        self,
+        name: str,
+        action: Callable[[], Awaitable[Any]],
+        compensation: Optional[Callable[[], Awaitable[Any]]] = None,
+        depends_on: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        retry_backoff: float = 0.2
+    ):
+        self.name = name
+        self.action = action  # Forward action
+        self.compensation = compensation  # Rollback action
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+
+class SagaListener:
+    """Hook-ovi za praćenje prelaza koraka (log događaja, metrike)"""
+
+    def on_step_started(self, step: str):
+        pass
+
+    def on_step_completed(self, step: str, result: Any):
+        pass
+
+    def on_step_failed(self, step: str, error: BaseException):
+        pass
+
+    def on_step_compensated(self, step: str):
+        pass
+
+    def on_step_compensation_failed(self, step: str, error: BaseException):
+        pass
+
+
+class SagaEngine:
+    """Izvršava SAGA korake po grafu zavisnosti"""
+
+    def __init__(
+        self,
+        steps: List[SagaStep],
+        listener: Optional[SagaListener] = None,
+        deadline: Optional[Deadline] = None,
+        before_compensation: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        self.steps: Dict[str, SagaStep] = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Duplicate saga step '{step.name}'")
+            self.steps[step.name] = step
+
+        for step in steps:
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"Saga step '{step.name}' depends on unknown step '{dependency}'")
+
+        self.order = self._topological_order()
+        self.listener = listener or SagaListener()
+        self.deadline = deadline
+        # Npr. rollback sesije koju je neuspeli korak ostavio u grešci
+        self.before_compensation = before_compensation
+        self.results: Dict[str, Any] = {}
+        self.started: List[str] = []
+        self.compensated = False
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Izvrši sve korake
+
+        Returns:
+            rezultati koraka po imenu
+        Raises:
+            SagaExecutionError - posle kompenzacije započetih koraka
+        """
+        pending = list(self.order)
+        completed: Set[str] = set()
+        running: Dict[asyncio.Task, str] = {}
+        failure: Optional[SagaExecutionError] = None
+
+        while pending or running:
+            if failure is None:
+                for name in list(pending):
+                    if all(dep in completed for dep in self.steps[name].depends_on):
+                        pending.remove(name)
+                        self.started.append(name)
+                        self.listener.on_step_started(name)
+                        running[asyncio.create_task(self._execute(self.steps[name]))] = name
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                error = task.exception()
+                if error is None:
+                    completed.add(name)
+                    self.results[name] = task.result()
+                    self.listener.on_step_completed(name, self.results[name])
+                else:
+                    self.listener.on_step_failed(name, error)
+                    if failure is None:
+                        failure = SagaExecutionError(name, error)
+
+        if failure is not None:
+            await self.compensate()
+            raise failure
+
+        return self.results
+
+    async def compensate(self):
+        """Kompenzuj započete korake obrnutim topološkim redosledom"""
+        self.compensated = True
+        if self.before_compensation is not None:
+            try:
+                await self.before_compensation()
+            except Exception as e:
+                logger.error(f"Preparing saga compensation failed: {e}")
+        remaining = [name for name in reversed(self.order) if name in self.started]
+        dependents = {
+            name: {other for other in remaining if name in self.steps[other].depends_on}
+            for name in remaining
+        }
+        compensated: Set[str] = set()
+
+        while remaining:
+            ready = [name for name in remaining if dependents[name] <= compensated]
+            await asyncio.gather(*(self._compensate_step(name) for name in ready))
+            compensated.update(ready)
+            remaining = [name for name in remaining if name not in compensated]
+
+    async def _execute(self, step: SagaStep) -> Any:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                timeout = self._step_timeout(step)
+            except DeadlineExceeded as e:
+                raise SagaAbort(f"Step '{step.name}' not started: {e}")
+            try:
+                if step.timeout is None:
+                    # Deadline je proveren pre pokretanja; korak koji piše u bazu se ne prekida
+                    return await step.action()
+                return await asyncio.wait_for(step.action(), timeout=timeout)
+            except SagaAbort:
+                raise
+            except DeadlineExceeded as e:
+                raise SagaAbort(f"Step '{step.name}' aborted: {e}")
+            except asyncio.TimeoutError:
+                error = SagaAbort(f"Step '{step.name}' timed out after {timeout:.2f}s")
+                if attempt > step.retries:
+                    raise error
+            except Exception as e:
+                if attempt > step.retries:
+                    raise
+                error = e
+
+            backoff = step.retry_backoff * 2 ** (attempt - 1)
+            if self.deadline is not None and self.deadline.remaining() <= backoff:
+                # Ponovni pokušaj ne bi stigao da se izvrši u okviru budžeta
+                raise error
+            logger.warning(f"Saga step '{step.name}' attempt {attempt} failed: {error}, retrying")
+            await asyncio.sleep(backoff)
+
+    def _step_timeout(self, step: SagaStep) -> Optional[float]:
+        """Timeout koraka ograničen preostalim ukupnim budžetom"""
+        if self.deadline is None:
+            return step.timeout
+        return self.deadline.timeout(step.timeout)
+
+    async def _compensate_step(self, name: str):
+        compensation = self.steps[name].compensation
+        if compensation is None:
+            return
+        try:
+            await compensation()
+        except Exception as e:
+            logger.error(f"Compensation of saga step '{name}' failed: {e}")
+            self.listener.on_step_compensation_failed(name, e)
+        else:
+            self.listener.on_step_compensated(name)
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        visiting: Set[str] = set()
+        visited: Set[str] = set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Saga step dependency cycle at '{name}'")
+            visiting.add(name)
+            for dependency in self.steps[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+            order.append(name)
+
+        for name in self.steps:
+            visit(name)
+        return order
@@ -0,0 +1,86 @@
+"""
+SAGA Event Log - Baferovani append-only log SAGA koraka
+
+Prelazi koraka se čuvaju u memoriji i upisuju u `saga_events` tek na
+granicama koje zahtevaju trajnost (kreiranje transakcije, pre plaćanja,
+generisanje tokena, završetak). Tako jedan checkout radi nekoliko commit-a
+umesto po jedan za svaki korak, i ne prepisuje JSON kolone.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+from app.models.purchase import SagaEvent, SagaEventType, utcnow
+
+
+class SagaEventLog:
+    """Bafer SAGA događaja jedne transakcije"""
+
+    def __init__(self):
+        self._pending: List[SagaEvent] = []
+        self._started_at: Dict[str, float] = {}
+
+    def step_started(self, step: str):
+        """Korak je započet"""
+        self._started_at[step] = time.perf_counter()
+        self._append(step, SagaEventType.STARTED)
+
+    def step_completed(self, step: str, detail: Optional[str] = None):
+        """Korak je uspešno završen"""
+        self._append(step, SagaEventType.COMPLETED, detail, self._elapsed_ms(step))
+
+    def step_failed(self, step: str, error: str):
+        """Korak nije uspeo"""
+        self._append(step, SagaEventType.FAILED, error, self._elapsed_ms(step))
+
+    def compensated(self, step: str, action: str):
+        """Kompenzaciona akcija za korak je izvršena"""
+        self._append(step, SagaEventType.COMPENSATED, action)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def drain(self, saga_id: int) -> List[SagaEvent]:
+        """Vrati baferovane događaje vezane za SAGA transakciju i isprazni bafer"""
+        events, self._pending = self._pending, []
+        for event in events:
+            event.saga_id = saga_id
+        return events
+
+    def _append(
+        self,
+        step: str,
+        event: SagaEventType,
+        detail: Optional[str] = None,
+        duration_ms: Optional[float] = None
+    ):
+        self._pending.append(SagaEvent(
+            step=step,
+            event=event,
+            detail=detail,
+            duration_ms=duration_ms,
+            created_at=utcnow()
+        ))
+
+    def _elapsed_ms(self, step: str) -> Optional[float]:
+        started = self._started_at.pop(step, None)
+        if started is None:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+
+def derive_saga_view(events: List[SagaEvent]) -> dict:
+    """
+    Izvedi prikaz SAGA transakcije iz događaja
+    (steps_completed, compensation_log i poslednji korak)
+    """
+    return {
+        "steps_completed": [
+            e.step for e in events if e.event == SagaEventType.COMPLETED
+        ],
+        "compensation_log": [
+            f"{e.step}: {e.detail}" for e in events if e.event == SagaEventType.COMPENSATED
+        ],
+        "last_step": events[-1].step if events else None
+    }
@@ -2,75 +2,113 @@
 SAGA Orchestrator - Koordinacija distribuirane transakcije za kupovinu tura
 
 SAGA Pattern implementacija sa kompenzacionim transakcijama.
-Koraci:
+Koraci (graf zavisnosti, izvršava ga SagaEngine):
 1. Validate User (provera korisnika u Stakeholders servisu)
 2. Reserve Tours (rezervacija tura - simulirano sa Tours servisom)
-3. Process Payment (procesiranje plaćanja - simulirano)
-4. Generate Tokens (kreiranje purchase tokena)
-5. Update User Stats (ažuriranje statistike u drugim servisima)
+   - koraci 1 i 2 su nezavisni i izvršavaju se paralelno
+3. Process Payment (procesiranje plaćanja - simulirano), posle 1 i 2
+4. Generate Tokens (kreiranje purchase tokena), posle 3
+5. Update User Stats (statistika u drugim servisima), posle 4
+   - događaji se upisuju u outbox zajedno sa tokenima (korak 4), a
+     isporučuje ih OutboxDispatcher van checkout-a (app/saga/outbox.py)
 
-Ako bilo koji korak ne uspe, pokreće se kompenzacija (rollback).
+Ako bilo koji korak ne uspe, pokreće se kompenzacija (rollback)
+obrnutim topološkim redosledom.
+
+Ceo checkout ima jedan vremenski budžet (checkout_deadline_seconds): koraci
+i pojedinačni gRPC/HTTP pozivi dobijaju najviše preostalo vreme, a pozivi ka
+servisima čije je kolo otvoreno (circuit breaker) odbijaju se odmah.
+
+Orchestrator radi nad AsyncSession, pa upisi u bazu između koraka ne
+blokiraju event loop.
+
+Instrumentacija (app/observability.py): histogram trajanja i brojač ishoda
+po koraku, brojač kompenzacija, gauge SAGA-a u toku i OpenTelemetry span
+za checkout (dete span-a HTTP zahteva) sa span-om po koraku i kompenzaciji.
 """
 
-import httpx
+import asyncio
+import logging
+import time
 import uuid
-import json
-from datetime import datetime, timezone
+from datetime import timezone
 from typing import List, Dict, Optional, Tuple
-from sqlalchemy.orm import Session
+from opentelemetry.trace import Status, StatusCode
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.purchase import (
+    utcnow,
     ShoppingCart, OrderItem, TourPurchaseToken, 
-    SagaTransaction, OrderStatus
+    SagaTransaction, SagaEvent, SagaEventType, OrderStatus, OutboxEvent, OutboxStatus
 )
 from app.core.config import settings
+from app.core.database import session_router
+from app.core.purchase_tokens import purchase_token_signer
+from app.core.resilience import Deadline, DeadlineExceeded, call_timeout, get_breaker, guarded_request
 from app.grpc.tours_client import ToursGRPCClient
+from app.saga.outbox import outbox_dispatcher, purchase_outbox_events
+from app.observability import (
+    tracer,
+    saga_compensations_total,
+    saga_duration_seconds,
+    saga_in_flight,
+    saga_step_duration_seconds,
+    saga_steps_total
+)
+from app.services.cart_cache import cart_cache
+from app.services.purchase_index import purchase_index
+from app.services.sales_rollups import increment_statements, decrement_statements
+from app.saga.event_log import SagaEventLog
+from app.saga.engine import SagaAbort, SagaEngine, SagaExecutionError, SagaListener, SagaStep
 
+logger = logging.getLogger(__name__)
 
-class SagaStep:
-    """Pojedinačan korak u SAGA transakciji"""
-    
-    def __init__(self, name: str, action, compensation):
-        self.name = name
-        self.action = action  # Forward action
-        self.compensation = compensation  # Rollback action
 
+def new_transaction_id() -> str:
+    """Generisanje ID-a SAGA transakcije"""
+    return f"SAGA-{uuid.uuid4().hex[:12].upper()}"
 
-class SagaOrchestrator:
+
+class SagaOrchestrator(SagaListener):
     """
     Orchestrator za SAGA pattern
     Koordinira sve korake kupovine i kompenzacione akcije
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.saga_transaction: Optional[SagaTransaction] = None
         self.completed_steps: List[str] = []
         self.compensation_log: List[str] = []
+        self.event_log = SagaEventLog()
+        self._recorded_completions = set()
         self.tours_grpc_client = ToursGRPCClient()
+        self.deadline: Optional[Deadline] = None
+        self._step_started_at: Dict[str, float] = {}
     
-    def create_saga_transaction(self, cart_id: int, user_id: int) -> str:
-        """Kreiranje nove SAGA transakcije"""
-        transaction_id = f"SAGA-{uuid.uuid4().hex[:12].upper()}"
+    async def create_saga_transaction(self, cart_id: int, user_id: int, transaction_id: Optional[str] = None) -> str:
+        """Kreiranje nove SAGA transakcije (ID može biti unapred dodeljen, npr. za Idempotency-Key)"""
+        transaction_id = transaction_id or new_transaction_id()
         
         saga = SagaTransaction(
             transaction_id=transaction_id,
             cart_id=cart_id,
             user_id=user_id,
             status=OrderStatus.PROCESSING,
-            current_step="initialized",
-            steps_completed="[]",
-            compensation_log="[]"
+            current_step="initialized"
         )
         
         self.db.add(saga)
-        self.db.commit()
-        self.db.refresh(saga)
+        await self.db.commit()
         
         self.saga_transaction = saga
         return transaction_id
     
     def update_saga_step(self, step_name: str, success: bool = True, error: str = None):
-        """Ažuriranje trenutnog koraka SAGA transakcije"""
+        """
+        Beleženje prelaza SAGA koraka
+        Događaj ide u bafer, a u bazu se upisuje tek pri flush_events()
+        """
         if not self.saga_transaction:
             return
         
@@ -78,27 +116,56 @@ class SagaOrchestrator:
         
         if success:
             self.completed_steps.append(step_name)
-            self.saga_transaction.steps_completed = json.dumps(self.completed_steps)
+            self.event_log.step_started(step_name)
         else:
             self.saga_transaction.status = OrderStatus.FAILED
             self.saga_transaction.error_message = error
-        
-        self.saga_transaction.updated_at = datetime.now(timezone.utc)
-        self.db.commit()
+            self.event_log.step_failed(step_name, error)
+    
+    def complete_saga_step(self, step_name: str, detail: str = None):
+        """Korak je uspešno završen (beleži se samo jednom po koraku)"""
+        if step_name in self._recorded_completions:
+            return
+        self._recorded_completions.add(step_name)
+        self.event_log.step_completed(step_name, detail)
     
     def log_compensation(self, step_name: str, action: str):
         """Logovanje kompenzacione akcije"""
         log_entry = f"{step_name}: {action}"
         self.compensation_log.append(log_entry)
+        self.event_log.compensated(step_name, action)
+    
+    async def flush_events(self, commit: bool = True):
+        """
+        Upis baferovanih događaja u saga_events
+        Sa commit=False događaji ulaze u transakciju koju pozivalac commit-uje
+        (npr. zajedno sa purchase tokenima)
+        """
+        if not self.saga_transaction:
+            return
         
-        if self.saga_transaction:
-            self.saga_transaction.compensation_log = json.dumps(self.compensation_log)
-            self.db.commit()
+        if self.event_log.has_pending:
+            self.db.add_all(self.event_log.drain(self.saga_transaction.id))
+            self.saga_transaction.updated_at = utcnow()
+        
+        if commit:
+            await self.db.commit()
+    
+    async def resume_saga_transaction(self, saga: SagaTransaction) -> str:
+        """Preuzimanje SAGA transakcije kreirane pri stavljanju checkout-a u red"""
+        saga.status = OrderStatus.PROCESSING
+        saga.current_step = "initialized"
+        await self.db.commit()
+        
+        self.saga_transaction = saga
+        return saga.transaction_id
     
     async def execute_checkout_saga(
         self, 
         cart: ShoppingCart, 
-        user_id: int
+        user_id: int,
+        saga_transaction: Optional[SagaTransaction] = None,
+        transaction_id: Optional[str] = None
     ) -> Tuple[bool, Optional[List[TourPurchaseToken]], Optional[str]]:
         """
         Glavna SAGA transakcija za checkout
@@ -107,90 +174,269 @@ class SagaOrchestrator:
             (success, tokens, error_message)
         """
         
-        # Kreiranje SAGA transakcije
-        transaction_id = self.create_saga_transaction(cart.id, user_id)
+        # Kreiranje SAGA transakcije (ili preuzimanje već kreirane iz reda)
+        if saga_transaction is not None:
+            transaction_id = await self.resume_saga_transaction(saga_transaction)
+        else:
+            transaction_id = await self.create_saga_transaction(cart.id, user_id, transaction_id)
         print(f"🚀 SAGA Transaction started: {transaction_id}")
         
+        saga_in_flight.inc()
+        started_at = time.perf_counter()
+        outcome = "failed"
         try:
-            # === KORAK 1: Validacija korisnika ===
-            print(f"📋 Step 1: Validating user {user_id}...")
-            self.update_saga_step("validate_user")
-            
-            user_valid = await self._validate_user(user_id)
-            if not user_valid:
-                raise Exception("User validation failed - user not found or inactive")
-            
-            print(f"✅ Step 1: User validated")
-            
-            # === KORAK 2: Rezervacija tura ===
-            print(f"📋 Step 2: Reserving tours...")
-            self.update_saga_step("reserve_tours")
-            
-            tour_ids = [item.tour_id for item in cart.items]
-            reservation_success = await self._reserve_tours(tour_ids, user_id)
-            
-            if not reservation_success:
-                raise Exception("Tour reservation failed - tours not available")
-            
-            print(f"✅ Step 2: Tours reserved")
-            
-            # === KORAK 3: Procesiranje plaćanja ===
-            print(f"📋 Step 3: Processing payment...")
-            self.update_saga_step("process_payment")
-            
-            payment_success = await self._process_payment(
-                user_id, 
-                cart.total_price, 
-                transaction_id
-            )
-            
-            if not payment_success:
-                raise Exception("Payment processing failed")
-            
-            print(f"✅ Step 3: Payment processed")
-            
-            # === KORAK 4: Generisanje tokena ===
-            print(f"📋 Step 4: Generating purchase tokens...")
-            self.update_saga_step("generate_tokens")
-            
-            tokens = self._generate_purchase_tokens(cart, user_id)
-            
-            print(f"✅ Step 4: Generated {len(tokens)} tokens")
-            
-            # === KORAK 5: Ažuriranje statistike ===
-            print(f"📋 Step 5: Updating user stats...")
-            self.update_saga_step("update_stats")
-            
-            await self._update_user_purchase_stats(user_id, len(tokens))
-            
-            print(f"✅ Step 5: Stats updated")
+            with tracer.start_as_current_span("saga.checkout", attributes={
+                "saga.transaction_id": transaction_id,
+                "saga.user_id": user_id,
+                "saga.cart_id": cart.id,
+                "saga.items": len(cart.items)
+            }) as span:
+                result = await self._run_checkout_engine(cart, user_id, transaction_id)
+                outcome = "completed" if result[0] else "failed"
+                span.set_attribute("saga.outcome", outcome)
+                if not result[0]:
+                    span.set_status(Status(StatusCode.ERROR, result[2]))
+                return result
+        finally:
+            saga_in_flight.dec()
+            saga_duration_seconds.labels(outcome).observe(time.perf_counter() - started_at)
+    
+    async def _run_checkout_engine(
+        self, 
+        cart: ShoppingCart, 
+        user_id: int, 
+        transaction_id: str
+    ) -> Tuple[bool, Optional[List[TourPurchaseToken]], Optional[str]]:
+        """Izvršavanje grafa koraka i upis ishoda SAGA transakcije"""
+        self.deadline = Deadline(settings.checkout_deadline_seconds)
+        engine = SagaEngine(
+            self.checkout_steps(cart, user_id, transaction_id), 
+            listener=self, 
+            deadline=self.deadline,
+            before_compensation=lambda: self._reset_session(cart)
+        )
+        
+        try:
+            results = await engine.run()
+            tokens = results["generate_tokens"]
             
             # === Uspešno završena SAGA ===
             cart.status = OrderStatus.COMPLETED
             self.saga_transaction.status = OrderStatus.COMPLETED
-            self.saga_transaction.completed_at = datetime.now(timezone.utc)
+            self.saga_transaction.completed_at = utcnow()
             self.saga_transaction.current_step = "completed"
-            self.db.commit()
+            await self.flush_events()
+            cart_cache.invalidate(user_id)
+            session_router.mark_write(user_id)
             
             print(f"🎉 SAGA Transaction completed: {transaction_id}")
             
             return True, tokens, None
             
-        except Exception as e:
+        except SagaExecutionError as e:
             error_msg = str(e)
-            print(f"❌ SAGA Transaction failed: {error_msg}")
+            print(f"❌ SAGA Transaction failed at {e.step}: {error_msg}")
+            
+            # Ažuriranje statusa (kompenzacija je već izvršena)
+            await self._record_failure(cart, user_id, error_msg, step=e.step)
+            return False, None, error_msg
+        
+        except Exception as e:
+            # Neočekivana greška van koraka (npr. commit ishoda) - SAGA ipak
+            # mora da završi u terminalnom stanju
+            error_msg = f"Unexpected saga error: {e}"
+            print(f"❌ SAGA Transaction failed unexpectedly: {error_msg}")
             
-            # Pokretanje kompenzacije
-            await self._compensate(cart)
+            await self._reset_session(cart)
+            if not engine.compensated:
+                await engine.compensate()
             
-            # Ažuriranje statusa
+            await self._record_failure(cart, user_id, error_msg)
+            return False, None, error_msg
+    
+    async def _reset_session(self, cart: ShoppingCart):
+        """
+        Rollback transakcije koju je neuspeli korak ostavio (npr. greška baze)
+        Posle rollback-a su SAGA i korpa istekle, a async sesija ih ne učitava
+        lenjo - zato se učitavaju ponovo pre kompenzacije
+        """
+        await self.db.rollback()
+        await self.db.refresh(self.saga_transaction)
+        await self.db.refresh(cart)
+        await self.db.refresh(cart, ["items"])
+    
+    async def _record_failure(
+        self,
+        cart: ShoppingCart,
+        user_id: int,
+        error_msg: str,
+        step: Optional[str] = None
+    ):
+        """
+        Upis FAILED stanja SAGA-e i korpe u sopstvenoj transakciji
+        Ako upis zajedno sa događajima ne uspe, stanje se upisuje ponovo bez
+        njih - SAGA i korpa ne smeju ostati u PROCESSING
+        """
+        for with_events in (True, False):
             cart.status = OrderStatus.FAILED
             self.saga_transaction.status = OrderStatus.FAILED
+            if step is not None:
+                self.saga_transaction.current_step = step
             self.saga_transaction.error_message = error_msg
-            self.saga_transaction.completed_at = datetime.now(timezone.utc)
-            self.db.commit()
-            
-            return False, None, error_msg
+            self.saga_transaction.completed_at = utcnow()
+            try:
+                if with_events:
+                    await self.flush_events()
+                else:
+                    await self.db.commit()
+                break
+            except Exception as e:
+                if not with_events:
+                    raise
+                logger.error(f"Recording failed saga {self.saga_transaction.transaction_id} with events failed: {e}")
+                await self._reset_session(cart)
+        
+        cart_cache.invalidate(user_id)
+        session_router.mark_write(user_id)
+    
+    async def compensate_abandoned(self, cart: ShoppingCart, user_id: int) -> List[str]:
+        """
+        Kompenzacija SAGA-e čiji je worker nestao usred izvršavanja
+        
+        Kompenzuju se koraci za koje saga_events pokazuju da su započeti ili
+        završeni (istim kompenzacijama kao u checkout_steps), obrnutim
+        redosledom. Završetak plaćanja se upisuje tek sa tokenima, pa se
+        započeto plaćanje tretira kao izvršeno; reserve_tours se oslobađa
+        uvek, jer njegov početak nije upisan pre prvog flush-a.
+        
+        Returns:
+            kompenzovani koraci
+        """
+        rows = (await self.db.execute(
+            select(SagaEvent.step, SagaEvent.event).where(SagaEvent.saga_id == self.saga_transaction.id)
+        )).all()
+        reached = {step for step, event in rows if event in (SagaEventType.STARTED, SagaEventType.COMPLETED)}
+        compensated = {step for step, event in rows if event == SagaEventType.COMPENSATED}
+        reached.add("reserve_tours")
+        
+        engine = SagaEngine(self.checkout_steps(cart, user_id, self.saga_transaction.transaction_id), listener=self)
+        engine.started = [name for name in engine.order if name in reached and name not in compensated]
+        await engine.compensate()
+        return engine.started
+    
+    def checkout_steps(
+        self, 
+        cart: ShoppingCart, 
+        user_id: int, 
+        transaction_id: str
+    ) -> List[SagaStep]:
+        """Definicija checkout SAGA-e kao grafa koraka"""
+        tour_ids = [item.tour_id for item in cart.items]
+        
+        steps = [
+            SagaStep(
+                "validate_user",
+                action=lambda: self._step_validate_user(user_id),
+                timeout=settings.saga_validate_user_timeout_seconds,
+                retries=1
+            ),
+            SagaStep(
+                "reserve_tours",
+                action=lambda: self._step_reserve_tours(tour_ids, user_id),
+                compensation=lambda: self._compensate_reservations(cart),
+                timeout=settings.saga_reserve_tours_timeout_seconds,
+                retries=1
+            ),
+            SagaStep(
+                "process_payment",
+                action=lambda: self._step_process_payment(user_id, cart.total_price, transaction_id),
+                compensation=lambda: self._compensate_payment(cart),
+                depends_on=("validate_user", "reserve_tours"),
+                timeout=settings.saga_payment_timeout_seconds
+            ),
+            SagaStep(
+                "generate_tokens",
+                action=lambda: self._step_generate_tokens(cart, user_id),
+                compensation=lambda: self._compensate_tokens(cart),
+                depends_on=("process_payment",)
+            ),
+            SagaStep(
+                "update_stats",
+                action=self._publish_purchase_stats,
+                compensation=lambda: self._compensate_stats(cart),
+                depends_on=("generate_tokens",),
+                timeout=settings.saga_update_stats_timeout_seconds
+            ),
+        ]
+        
+        for step in steps:
+            step.action = self._traced(f"saga.step.{step.name}", step.action, transaction_id)
+            if step.compensation is not None:
+                step.compensation = self._traced(f"saga.compensate.{step.name}", step.compensation, transaction_id)
+        return steps
+    
+    @staticmethod
+    def _traced(span_name: str, action, transaction_id: str):
+        """Span oko svakog pokušaja akcije (izuzetak se beleži u span)"""
+        async def run():
+            with tracer.start_as_current_span(span_name, attributes={"saga.transaction_id": transaction_id}):
+                return await action()
+        return run
+    
+    # === SagaListener hook-ovi ===
+    
+    def on_step_started(self, step: str):
+        logger.debug(f"Saga step started: {step}")
+        self._step_started_at[step] = time.perf_counter()
+        self.update_saga_step(step)
+    
+    def on_step_completed(self, step: str, result):
+        logger.debug(f"Saga step completed: {step}")
+        self._observe_step(step, "completed")
+        self.complete_saga_step(step)
+    
+    def on_step_failed(self, step: str, error: BaseException):
+        logger.info(f"Saga step failed: {step}: {error}")
+        self._observe_step(step, "failed")
+        self.event_log.step_failed(step, str(error))
+    
+    def on_step_compensated(self, step: str):
+        saga_compensations_total.labels(step, "compensated").inc()
+    
+    def on_step_compensation_failed(self, step: str, error: BaseException):
+        saga_compensations_total.labels(step, "failed").inc()
+        self.log_compensation(step, f"Compensation failed: {error}")
+    
+    def _observe_step(self, step: str, outcome: str):
+        saga_steps_total.labels(step, outcome).inc()
+        started_at = self._step_started_at.pop(step, None)
+        if started_at is not None:
+            saga_step_duration_seconds.labels(step, outcome).observe(time.perf_counter() - started_at)
+    
+    # === Akcije koraka ===
+    
+    async def _step_validate_user(self, user_id: int) -> bool:
+        if not await self._validate_user(user_id):
+            raise SagaAbort("User validation failed - user not found or inactive")
+        return True
+    
+    async def _step_reserve_tours(self, tour_ids: List[int], user_id: int) -> bool:
+        if not await self._reserve_tours(tour_ids, user_id):
+            raise SagaAbort("Tour reservation failed - tours not available")
+        return True
+    
+    async def _step_process_payment(self, user_id: int, amount: float, transaction_id: str) -> bool:
+        # Plaćanje je prva nepovratna akcija - stanje mora biti trajno pre nje
+        await self.flush_events()
+        
+        if not await self._process_payment(user_id, amount, transaction_id):
+            raise SagaAbort("Payment processing failed")
+        return True
+    
+    async def _step_generate_tokens(self, cart: ShoppingCart, user_id: int) -> List[TourPurchaseToken]:
+        tokens = await self._generate_purchase_tokens(cart, user_id)
+        print(f"🎫 Generated {len(tokens)} tokens")
+        return tokens
     
     async def _validate_user(self, user_id: int) -> bool:
         """
@@ -198,18 +444,22 @@ class SagaOrchestrator:
         Proverava da li korisnik postoji i da li je aktivan
         """
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    f"{settings.stakeholders_service_url}/users/{user_id}"
-                )
-                
-                if response.status_code == 200:
-                    user_data = response.json()
-                    # Proveri da li je korisnik aktivan
-                    return user_data.get("is_active", True)
-                
-                return False
-                
+            response = await guarded_request(
+                get_breaker("stakeholders"),
+                "GET",
+                f"{settings.stakeholders_service_url}/users/{user_id}",
+                timeout=call_timeout(self.deadline, settings.downstream_http_timeout_seconds)
+            )
+            
+            if response.status_code == 200:
+                user_data = response.json()
+                # Proveri da li je korisnik aktivan
+                return user_data.get("is_active", True)
+            
+            return False
+            
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Error validating user: {e}")
             # U development-u, dozvoli nastavak
@@ -224,7 +474,12 @@ class SagaOrchestrator:
             # Try gRPC first
             all_verified = True
             for tour_id in tour_ids:
-                exists, tour_data, error = self.tours_grpc_client.verify_tour_exists(tour_id)
+                # Blokirajući gRPC poziv ne sme da zaustavi event loop (paralelni koraci)
+                exists, tour_data, error = await asyncio.to_thread(
+                    self.tours_grpc_client.verify_tour_exists, 
+                    tour_id, 
+                    call_timeout(self.deadline, settings.tours_grpc_timeout_seconds)
+                )
                 
                 if exists and tour_data:
                     if not tour_data.get("is_published"):
@@ -242,6 +497,8 @@ class SagaOrchestrator:
             
             return all_verified
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Error verifying tours: {e}")
             # Try HTTP fallback for all tours
@@ -250,29 +507,30 @@ class SagaOrchestrator:
     async def _verify_tour_via_http(self, tour_id: int) -> bool:
         """Verify single tour via HTTP"""
         try:
-            import httpx
-            from app.core.config import settings
+            response = await guarded_request(
+                get_breaker("tours_http"),
+                "GET",
+                f"{settings.tours_service_url}/tours/{tour_id}",
+                timeout=call_timeout(self.deadline, settings.downstream_http_timeout_seconds)
+            )
             
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    f"{settings.tours_service_url}/tours/{tour_id}"
-                )
+            if response.status_code == 200:
+                tour_json = response.json()
+                tour = tour_json.get("tour", {})
+                status = tour.get("status", "")
                 
-                if response.status_code == 200:
-                    tour_json = response.json()
-                    tour = tour_json.get("tour", {})
-                    status = tour.get("status", "")
-                    
-                    if status in ["published", "archived"]:
-                        print(f"✓ Tour {tour_id} verified via HTTP: {tour.get('name')}")
-                        return True
-                    else:
-                        print(f"Tour {tour_id} status is '{status}', not available")
-                        return False
+                if status in ["published", "archived"]:
+                    print(f"✓ Tour {tour_id} verified via HTTP: {tour.get('name')}")
+                    return True
                 else:
-                    print(f"HTTP verification failed for tour {tour_id}: {response.status_code}")
+                    print(f"Tour {tour_id} status is '{status}', not available")
                     return False
-                    
+            else:
+                print(f"HTTP verification failed for tour {tour_id}: {response.status_code}")
+                return False
+                
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Error verifying tour {tour_id} via HTTP: {e}")
             return False
@@ -304,7 +562,7 @@ class SagaOrchestrator:
         print(f"💳 Payment processed: ${amount} for user {user_id}")
         return True
     
-    def _generate_purchase_tokens(
+    async def _generate_purchase_tokens(
         self, 
         cart: ShoppingCart, 
         user_id: int
@@ -313,100 +571,82 @@ class SagaOrchestrator:
         KORAK 4: Generisanje purchase tokena
         Kreira token za svaku stavku u korpi
         """
-        tokens = []
+        # purchased_at se postavlja ovde da bi agregati prodaje znali dan kupovine
+        now = utcnow()
+        issued_at = now.replace(tzinfo=timezone.utc)
+        # Token je potpisan (Ed25519), pa se kupovina može proveriti i bez poziva ovog servisa
+        rows = [
+            {
+                "token": purchase_token_signer.sign(uuid.uuid4().hex[:16].upper(), user_id, item.tour_id, issued_at),
+                "user_id": user_id,
+                "cart_id": cart.id,
+                "tour_id": item.tour_id,
+                "tour_name": item.tour_name,
+                "purchase_price": item.price,
+                "is_active": OrderStatus.COMPLETED,
+                "purchased_at": now,
+            }
+            for item in cart.items
+        ]
         
-        for item in cart.items:
-            token_string = f"TPT-{uuid.uuid4().hex[:16].upper()}"
-            
-            token = TourPurchaseToken(
-                token=token_string,
-                user_id=user_id,
-                cart_id=cart.id,
-                tour_id=item.tour_id,
-                tour_name=item.tour_name,
-                purchase_price=item.price,
-                is_active=OrderStatus.COMPLETED
-            )
-            
-            self.db.add(token)
-            tokens.append(token)
+        # Jedan višeredni INSERT ... RETURNING vraća kompletne tokene (bez refresh-a po tokenu)
+        tokens = list((await self.db.scalars(
+            insert(TourPurchaseToken).returning(TourPurchaseToken, sort_by_parameter_order=True),
+            rows
+        )).all())
+        
+        # Statistika za druge servise ide kroz outbox, u istoj transakciji kao tokeni
+        self.db.add_all(purchase_outbox_events(self.saga_transaction.transaction_id, user_id, len(tokens)))
         
-        self.db.commit()
+        # Agregati prodaje se ažuriraju u istoj transakciji kao tokeni
+        for stmt in increment_statements(self.db.get_bind().dialect.name, tokens):
+            await self.db.execute(stmt)
         
-        for token in tokens:
-            self.db.refresh(token)
+        # Tokeni i događaji do ovog koraka se upisuju jednim commit-om
+        self.complete_saga_step("generate_tokens", f"Generated {len(tokens)} tokens")
+        await self.flush_events(commit=False)
+        await self.db.commit()
+        
+        purchase_index.add_tokens(tokens)
         
         return tokens
     
-    async def _update_user_purchase_stats(self, user_id: int, tour_count: int) -> bool:
-        """
-        KORAK 5: Ažuriranje statistike korisnika
-        Može uključivati Followers servis, Stakeholders servis, itd.
-        """
-        try:
-            # Primer: ažuriranje u Stakeholders servisu
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.post(
-                    f"{settings.stakeholders_service_url}/api/users/{user_id}/stats",
-                    json={
-                        "tours_purchased": tour_count
-                    }
-                )
-            
-            # Primer: notifikacija u Followers servisu (followers vide aktivnost)
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.post(
-                    f"{settings.followers_service_url}/api/followers/activity",
-                    json={
-                        "user_id": user_id,
-                        "activity_type": "tour_purchase",
-                        "count": tour_count
-                    }
-                )
-            
-            return True
-            
-        except Exception as e:
-            print(f"Stats update info: {e}")
-            # Ne blokiraj transakciju zbog statistike
-            return True
-    
-    async def _compensate(self, cart: ShoppingCart):
+    async def _publish_purchase_stats(self) -> bool:
         """
-        Kompenzacione transakcije (rollback)
-        Izvršava se u obrnutom redosledu od completed_steps
+        KORAK 5: Ažuriranje statistike korisnika (Stakeholders, Followers)
+        Događaji su već u outbox-u (upisani sa tokenima) - ovde se samo budi dispatcher
         """
-        print(f"🔄 Starting compensation for SAGA transaction...")
-        
-        # Obrni redosled koraka za kompenzaciju
-        for step in reversed(self.completed_steps):
-            print(f"⏪ Compensating step: {step}")
-            
-            if step == "generate_tokens":
-                await self._compensate_tokens(cart)
-            
-            elif step == "process_payment":
-                await self._compensate_payment(cart)
-            
-            elif step == "reserve_tours":
-                await self._compensate_reservations(cart)
-            
-            elif step == "update_stats":
-                await self._compensate_stats(cart)
-        
-        print(f"✅ Compensation completed")
+        outbox_dispatcher.notify()
+        return True
     
     async def _compensate_tokens(self, cart: ShoppingCart):
         """Kompenzacija: Brisanje generisanih tokena"""
-        tokens = self.db.query(TourPurchaseToken).filter(
-            TourPurchaseToken.cart_id == cart.id
-        ).all()
+        # Jedan DELETE ... RETURNING - obrisani redovi služe za agregate i indeks
+        tokens = (await self.db.execute(
+            delete(TourPurchaseToken).where(TourPurchaseToken.cart_id == cart.id).returning(
+                TourPurchaseToken.id,
+                TourPurchaseToken.user_id,
+                TourPurchaseToken.tour_id,
+                TourPurchaseToken.tour_name,
+                TourPurchaseToken.purchase_price,
+                TourPurchaseToken.purchased_at,
+                TourPurchaseToken.is_active
+            ).execution_options(synchronize_session=False)
+        )).all()
+        
+        for stmt, params in decrement_statements(tokens):
+            await self.db.execute(stmt, params)
         
-        for token in tokens:
-            self.db.delete(token)
+        # Neisporučeni događaji statistike za ovu kupovinu se povlače
+        await self.db.execute(delete(OutboxEvent).where(
+            OutboxEvent.saga_id == self.saga_transaction.transaction_id,
+            OutboxEvent.status == OutboxStatus.PENDING
+        ))
         
-        self.db.commit()
         self.log_compensation("generate_tokens", f"Deleted {len(tokens)} tokens")
+        await self.flush_events(commit=False)
+        await self.db.commit()
+        purchase_index.remove_tokens(tokens)
     
     async def _compensate_payment(self, cart: ShoppingCart):
         """Kompenzacija: Refund plaćanja"""
@@ -419,11 +659,14 @@ class SagaOrchestrator:
         tour_ids = [item.tour_id for item in cart.items]
         
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.post(
-                    f"{settings.tours_service_url}/api/tours/release",
-                    json={"tour_ids": tour_ids}
-                )
+            # Kompenzacija se izvršava i kad je budžet checkout-a potrošen
+            await guarded_request(
+                get_breaker("tours_http"),
+                "POST",
+                f"{settings.tours_service_url}/api/tours/release",
+                timeout=settings.downstream_http_timeout_seconds,
+                json={"tour_ids": tour_ids}
+            )
         except Exception as e:
             print(f"Compensation error (tours): {e}")
         
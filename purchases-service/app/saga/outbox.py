@@ -0,0 +1,339 @@
+"""
+Outbox - Pouzdana isporuka sporednih efekata checkout-a
+
+Checkout upisuje događaje (statistika korisnika u Stakeholders servisu,
+aktivnost u Followers servisu) u tabelu `outbox_events` u istoj transakciji
+sa purchase tokenima, pa se događaj ne gubi ni kada je drugi servis nedostupan,
+a checkout ne čeka na njega.
+
+OutboxDispatcher preuzima seriju događaja (FOR UPDATE SKIP LOCKED + claim
+token, kao checkout workeri), spaja događaje istog tipa za istog korisnika
+u jedan poziv i ponavlja neuspešne isporuke sa eksponencijalnim backoff-om.
+Posle outbox_max_attempts pokušaja (ili trajne 4xx greške) događaj ostaje
+u statusu DEAD radi ručne provere.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, or_, select, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.resilience import CircuitOpenError, get_breaker, guarded_request
+from app.models.purchase import OutboxEvent, OutboxStatus, utcnow
+from app.observability import outbox_deliveries_total, outbox_events_total
+
+logger = logging.getLogger(__name__)
+
+USER_STATS_EVENT = "user_stats"
+FOLLOWER_ACTIVITY_EVENT = "follower_activity"
+
+# Trajne greške - ponavljanje ne pomaže
+_RETRYABLE_4XX = {408, 425, 429}
+
+PURGE_INTERVAL_SECONDS = 600
+
+_outbox = OutboxEvent.__table__
+
+
+@dataclass(frozen=True)
+class _Delivery:
+    """Kako se isporučuje jedan tip događaja"""
+    breaker: str
+    url: Callable[[int], str]
+    count_field: str
+
+
+_DELIVERIES: Dict[str, _Delivery] = {
+    USER_STATS_EVENT: _Delivery(
+        breaker="stakeholders",
+        url=lambda user_id: f"{settings.stakeholders_service_url}/api/users/{user_id}/stats",
+        count_field="tours_purchased"
+    ),
+    FOLLOWER_ACTIVITY_EVENT: _Delivery(
+        breaker="followers",
+        url=lambda user_id: f"{settings.followers_service_url}/api/followers/activity",
+        count_field="count"
+    ),
+}
+
+
+def purchase_outbox_events(saga_id: str, user_id: int, tour_count: int) -> List[OutboxEvent]:
+    """Događaji koje checkout upisuje zajedno sa tokenima"""
+    payloads = {
+        USER_STATS_EVENT: {"tours_purchased": tour_count},
+        FOLLOWER_ACTIVITY_EVENT: {"user_id": user_id, "activity_type": "tour_purchase", "count": tour_count},
+    }
+    return [
+        OutboxEvent(event_type=event_type, user_id=user_id, saga_id=saga_id, payload=json.dumps(payload))
+        for event_type, payload in payloads.items()
+    ]
+
+
+@dataclass
+class _ClaimedEvent:
+    id: int
+    event_type: str
+    user_id: int
+    payload: dict
+    attempts: int
+
+
+@dataclass
+class _Group:
+    """Događaji istog tipa za istog korisnika - isporučuju se jednim pozivom"""
+    event_type: str
+    user_id: int
+    events: List[_ClaimedEvent] = field(default_factory=list)
+
+    def payload(self) -> dict:
+        count_field = _DELIVERIES[self.event_type].count_field
+        merged = dict(self.events[0].payload)
+        merged[count_field] = sum(event.payload.get(count_field, 0) for event in self.events)
+        return merged
+
+
+def coalesce(events: List[_ClaimedEvent]) -> List[_Group]:
+    groups: Dict[Tuple[str, int], _Group] = {}
+    for event in events:
+        key = (event.event_type, event.user_id)
+        groups.setdefault(key, _Group(event.event_type, event.user_id)).events.append(event)
+    return list(groups.values())
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Eksponencijalni backoff sa punim jitter-om, ograničen na outbox_backoff_max_seconds"""
+    ceiling = min(settings.outbox_backoff_max_seconds, settings.outbox_backoff_base_seconds * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class OutboxDispatcher:
+    """Asyncio petlja koja isporučuje događaje iz outbox-a"""
+
+    def __init__(
+        self,
+        batch_size: int = settings.outbox_batch_size,
+        poll_interval: float = settings.outbox_poll_interval_seconds,
+        lease_seconds: int = settings.outbox_lease_seconds,
+        max_attempts: int = settings.outbox_max_attempts
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_purge = 0.0
+
+    def start(self):
+        """Pokreni dispatcher u trenutnom event loop-u"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="outbox-dispatcher")
+        logger.info("Started outbox dispatcher")
+
+    async def stop(self):
+        """Zaustavi dispatcher (preuzeti događaji se ponovo šalju posle isteka lease-a)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def notify(self):
+        """Probudi dispatcher posle commit-a novih događaja (bezbedno iz drugih thread-ova)"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            try:
+                delivered = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+                delivered = 0
+
+            # Puna serija - odmah sledeća, inače čekaj novi događaj ili poll interval
+            if delivered < self.batch_size:
+                await self._purge_if_due()
+                await self._wait_for_work()
+
+    async def dispatch_once(self) -> int:
+        """Preuzmi i isporuči jednu seriju događaja; vraća broj preuzetih događaja"""
+        claim_token, events = await asyncio.to_thread(self._claim_batch)
+        if not events:
+            return 0
+
+        groups = coalesce(events)
+        results = await asyncio.gather(*(self._deliver(group) for group in groups))
+        await asyncio.to_thread(self._finish, claim_token, list(zip(groups, results)))
+        return len(events)
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def _claim_batch(self) -> Tuple[Optional[str], List[_ClaimedEvent]]:
+        now = utcnow()
+        claimable = or_(
+            and_(OutboxEvent.status == OutboxStatus.PENDING, OutboxEvent.next_attempt_at <= now),
+            and_(
+                OutboxEvent.status == OutboxStatus.IN_FLIGHT,
+                OutboxEvent.claimed_at < now - timedelta(seconds=self.lease_seconds)
+            )
+        )
+
+        db = SessionLocal()
+        try:
+            ids = db.scalars(
+                select(OutboxEvent.id).where(claimable).order_by(OutboxEvent.id)
+                .limit(self.batch_size).with_for_update(skip_locked=True)
+            ).all()
+            if not ids:
+                db.rollback()
+                return None, []
+
+            # Uslovni UPDATE sa claim token-om je zaštita i za baze bez SKIP LOCKED
+            claim_token = uuid.uuid4().hex
+            db.execute(
+                update(OutboxEvent).where(and_(OutboxEvent.id.in_(ids), claimable)).values(
+                    status=OutboxStatus.IN_FLIGHT,
+                    claim_token=claim_token,
+                    claimed_at=now,
+                    attempts=OutboxEvent.attempts + 1
+                ).execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            rows = db.execute(
+                select(
+                    OutboxEvent.id,
+                    OutboxEvent.event_type,
+                    OutboxEvent.user_id,
+                    OutboxEvent.payload,
+                    OutboxEvent.attempts
+                ).where(OutboxEvent.claim_token == claim_token).order_by(OutboxEvent.id)
+            ).all()
+            return claim_token, [
+                _ClaimedEvent(row.id, row.event_type, row.user_id, json.loads(row.payload), row.attempts)
+                for row in rows
+            ]
+        finally:
+            db.close()
+
+    async def _deliver(self, group: _Group) -> Tuple[str, Optional[str], float]:
+        """
+        Returns:
+            (ishod, greška, minimalno čekanje) - ishod je "sent", "retry" ili "dead"
+        """
+        delivery = _DELIVERIES.get(group.event_type)
+        if delivery is None:
+            outcome = ("dead", f"Unknown outbox event type: {group.event_type}", 0.0)
+        else:
+            try:
+                response = await guarded_request(
+                    get_breaker(delivery.breaker),
+                    "POST",
+                    delivery.url(group.user_id),
+                    timeout=settings.downstream_http_timeout_seconds,
+                    json=group.payload()
+                )
+            except CircuitOpenError as e:
+                outcome = ("retry", str(e), e.retry_after)
+            except Exception as e:
+                outcome = ("retry", f"{type(e).__name__}: {e}", 0.0)
+            else:
+                if response.status_code < 400:
+                    outcome = ("sent", None, 0.0)
+                elif response.status_code < 500 and response.status_code not in _RETRYABLE_4XX:
+                    outcome = ("dead", f"HTTP {response.status_code}", 0.0)
+                else:
+                    outcome = ("retry", f"HTTP {response.status_code}", 0.0)
+
+        outbox_deliveries_total.labels(group.event_type, outcome[0]).inc()
+        return outcome
+
+    def _finish(self, claim_token: str, results: List[Tuple[_Group, Tuple[str, Optional[str], float]]]):
+        """Upiši ishod isporuke (samo za događaje koje ovaj dispatcher još drži)"""
+        now = utcnow()
+        params = []
+        for group, (outcome, error, min_wait) in results:
+            for event in group.events:
+                if outcome == "retry" and event.attempts >= self.max_attempts:
+                    outcome_for_event = "dead"
+                else:
+                    outcome_for_event = outcome
+
+                if outcome_for_event == "sent":
+                    status, next_attempt_at = OutboxStatus.SENT, now
+                elif outcome_for_event == "dead":
+                    status, next_attempt_at = OutboxStatus.DEAD, now
+                else:
+                    status = OutboxStatus.PENDING
+                    next_attempt_at = now + timedelta(seconds=max(min_wait, backoff_seconds(event.attempts)))
+
+                outbox_events_total.labels(group.event_type, outcome_for_event).inc()
+                params.append({
+                    "b_id": event.id,
+                    "b_status": status,
+                    "b_next_attempt_at": next_attempt_at,
+                    "b_sent_at": now if status == OutboxStatus.SENT else None,
+                    "b_last_error": error,
+                })
+
+        stmt = update(_outbox).where(
+            and_(_outbox.c.id == bindparam("b_id"), _outbox.c.claim_token == claim_token)
+        ).values(
+            status=bindparam("b_status"),
+            next_attempt_at=bindparam("b_next_attempt_at"),
+            sent_at=bindparam("b_sent_at"),
+            last_error=bindparam("b_last_error"),
+            claim_token=None
+        )
+
+        db = SessionLocal()
+        try:
+            db.execute(stmt, params)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _purge_if_due(self):
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        try:
+            await asyncio.to_thread(self._purge_sent)
+        except Exception as e:
+            logger.error(f"Outbox purge failed: {e}")
+
+    def _purge_sent(self):
+        """Obriši isporučene događaje starije od outbox_sent_retention_hours"""
+        cutoff = utcnow() - timedelta(hours=settings.outbox_sent_retention_hours)
+        db = SessionLocal()
+        try:
+            db.execute(delete(OutboxEvent).where(
+                and_(OutboxEvent.status == OutboxStatus.SENT, OutboxEvent.sent_at < cutoff)
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+
+outbox_dispatcher = OutboxDispatcher()
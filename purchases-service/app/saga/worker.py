@@ -0,0 +1,157 @@
+"""
+Checkout Workers - Ograničen pool workera za asinhroni checkout
+
+Poslovi se čuvaju u tabeli `checkout_jobs`. Svaki worker preuzima jedan
+posao sa SELECT ... FOR UPDATE SKIP LOCKED, tako da više workera (i više
+procesa) nikad ne preuzme isti posao. Posao čiji worker je nestao (istekao
+lease) se ne izvršava ponovo, već se SAGA označava kao neuspešna.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_, and_
+
+from app.core.config import settings
+from app.core.database import SessionLocal, AsyncSessionLocal
+from app.models.purchase import CheckoutJob, CheckoutJobStatus, utcnow
+from app.services.async_purchase_service import AsyncPurchaseService
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutWorkerPool:
+    """Pool asyncio workera koji izvršavaju checkout SAGA poslove iz reda"""
+
+    def __init__(
+        self,
+        size: int = settings.checkout_workers,
+        poll_interval: float = settings.checkout_poll_interval_seconds,
+        lease_seconds: int = settings.checkout_job_lease_seconds
+    ):
+        self.size = size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    def start(self):
+        """Pokreni workere u trenutnom event loop-u"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"checkout-worker-{n}")
+            for n in range(self.size)
+        ]
+        logger.info("Started %d checkout workers", self.size)
+
+    async def stop(self):
+        """Zaustavi workere (posao u toku se prekida i preuzima se posle isteka lease-a)"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """
+        Probudi workere kada je novi posao stavljen u red
+        Bezbedno za poziv iz threadpool-a (sinhrone rute)
+        """
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _worker(self, number: int):
+        while not self._stopping:
+            try:
+                claimed = await asyncio.to_thread(self._claim_next_job)
+            except Exception as e:
+                logger.error(f"Checkout worker {number} failed to claim a job: {e}")
+                claimed = None
+
+            if claimed is None:
+                await self._wait_for_work()
+                continue
+
+            job_id, lease_expired = claimed
+            try:
+                await self._run_job(job_id, lease_expired)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Checkout job {job_id} failed: {e}")
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def _claim_next_job(self) -> Optional[Tuple[int, bool]]:
+        """
+        Preuzmi najstariji posao iz reda (ili posao sa isteklim lease-om)
+
+        Returns:
+            (job_id, lease_expired) ili None ako je red prazan
+        """
+        now = utcnow()
+        lease_cutoff = now - timedelta(seconds=self.lease_seconds)
+
+        db = SessionLocal()
+        try:
+            job = db.query(CheckoutJob).filter(
+                or_(
+                    CheckoutJob.status == CheckoutJobStatus.QUEUED,
+                    and_(
+                        CheckoutJob.status == CheckoutJobStatus.RUNNING,
+                        CheckoutJob.claimed_at < lease_cutoff
+                    )
+                )
+            ).order_by(
+                CheckoutJob.created_at
+            ).with_for_update(skip_locked=True).limit(1).first()
+
+            if not job:
+                db.rollback()
+                return None
+
+            lease_expired = job.status == CheckoutJobStatus.RUNNING
+
+            # Uslovni UPDATE je zaštita i za baze bez SKIP LOCKED (npr. SQLite)
+            claimed = db.query(CheckoutJob).filter(
+                CheckoutJob.id == job.id,
+                CheckoutJob.status == job.status,
+                CheckoutJob.attempts == job.attempts
+            ).update({
+                CheckoutJob.status: CheckoutJobStatus.RUNNING,
+                CheckoutJob.claimed_at: now,
+                CheckoutJob.attempts: CheckoutJob.attempts + 1
+            }, synchronize_session=False)
+            db.commit()
+
+            if claimed != 1:
+                return None
+
+            return job.id, lease_expired
+        finally:
+            db.close()
+
+    async def _run_job(self, job_id: int, lease_expired: bool):
+        async with AsyncSessionLocal() as db:
+            service = AsyncPurchaseService(db)
+            if lease_expired:
+                logger.warning(f"Checkout job {job_id} lease expired, failing its saga")
+                await service.abandon_checkout_job(job_id)
+            else:
+                await service.run_checkout_job(job_id)
+
+
+checkout_workers = CheckoutWorkerPool()
@@ -1,9 +1,12 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 import json
 
+from app.saga.event_log import derive_saga_view
+from app.services.cart_statements import EMPTY_CART_VERSION
+
 
 class OrderStatusEnum(str, Enum):
     """Statusi narudžbine"""
@@ -39,16 +42,28 @@ class OrderItemResponse(BaseModel):
 
 class ShoppingCartResponse(BaseModel):
     """Schema za prikaz korpe"""
-    id: int
+    id: Optional[int] = Field(None, description="ID korpe (null dok korpa ne postoji u bazi)")
     user_id: int
     total_price: float
     status: OrderStatusEnum
+    version: int = Field(..., description="Verzija korpe (za If-Match zaglavlje)")
     items: List[OrderItemResponse]
-    created_at: datetime
-    updated_at: datetime
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
+    
+    @classmethod
+    def empty(cls, user_id: int) -> "ShoppingCartResponse":
+        """Virtuelna prazna korpa - kreira se u bazi tek pri prvom dodavanju"""
+        return cls(
+            user_id=user_id,
+            total_price=0.0,
+            status=OrderStatusEnum.PENDING,
+            version=EMPTY_CART_VERSION,
+            items=[]
+        )
 
 
 class AddToCartRequest(BaseModel):
@@ -94,6 +109,28 @@ class CheckoutResponse(BaseModel):
     message: str
 
 
+class CheckoutAcceptedResponse(BaseModel):
+    """Response za asinhroni checkout (202 Accepted)"""
+    transaction_id: str
+    status: OrderStatusEnum
+    status_url: str = Field(..., description="Long-poll: GET sa ?wait=<sekunde>")
+    events_url: str = Field(..., description="Server-Sent Events tok koraka")
+    message: str
+
+
+class SagaEventResponse(BaseModel):
+    """Schema za prikaz jednog prelaza SAGA koraka"""
+    id: int
+    step: str
+    event: str
+    detail: Optional[str] = None
+    duration_ms: Optional[float] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
 class SagaTransactionResponse(BaseModel):
     """Schema za prikaz SAGA transakcije"""
     id: int
@@ -108,6 +145,36 @@ class SagaTransactionResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime]
+    events: List[SagaEventResponse] = Field(default_factory=list, description="Prelazi koraka sa trajanjem")
+    
+    @model_validator(mode='before')
+    @classmethod
+    def derive_from_events(cls, data):
+        """Koraci i kompenzacije se izvode iz saga_events (legacy JSON kolone za stare transakcije)"""
+        events = getattr(data, "events", None)
+        if not events:
+            return data
+        
+        view = derive_saga_view(events)
+        current_step = data.current_step
+        if data.status == OrderStatusEnum.PROCESSING and view["last_step"]:
+            current_step = view["last_step"]
+        
+        return {
+            "id": data.id,
+            "transaction_id": data.transaction_id,
+            "cart_id": data.cart_id,
+            "user_id": data.user_id,
+            "status": data.status,
+            "current_step": current_step,
+            "steps_completed": view["steps_completed"],
+            "compensation_log": view["compensation_log"],
+            "error_message": data.error_message,
+            "created_at": data.created_at,
+            "updated_at": data.updated_at,
+            "completed_at": data.completed_at,
+            "events": events
+        }
     
     @field_validator('steps_completed', mode='before')
     @classmethod
@@ -135,6 +202,29 @@ class SagaTransactionResponse(BaseModel):
         from_attributes = True
 
 
+class TourSalesResponse(BaseModel):
+    """Prodaja jedne ture (tour_sales_rollups)"""
+    tour_id: int
+    tour_name: str
+    purchase_count: int
+    revenue: float
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DailySalesResponse(BaseModel):
+    """Prodaja ture u jednom danu (tour_sales_daily)"""
+    tour_id: int
+    day: date
+    purchase_count: int
+    revenue: float
+
+    class Config:
+        from_attributes = True
+
+
 class MessageResponse(BaseModel):
     """Generička poruka"""
     message: str
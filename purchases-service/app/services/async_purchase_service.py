@@ -0,0 +1,230 @@
+"""
+Async Purchase Service - Biznis logika za async rute (AsyncSession)
+
+Isti tok kao PurchaseService, ali nad AsyncSession: dodavanje u korpu,
+checkout i izvršavanje checkout poslova iz reda. Sinhrone rute i dalje
+koriste PurchaseService u threadpool-u dok ne budu migrirane.
+"""
+
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.database import session_router
+from app.models.purchase import (
+    utcnow,
+    ShoppingCart, OrderItem, TourPurchaseToken,
+    SagaTransaction, OrderStatus, CheckoutJob, CheckoutJobStatus
+)
+from app.saga.orchestrator import SagaOrchestrator
+from app.services.cart_statements import (
+    CartConflictError,
+    EMPTY_CART_VERSION,
+    upsert_item_statement,
+    bump_cart_statement
+)
+from app.services.cart_cache import cart_cache
+from app.services.purchase_service import CART_MUTATION_ATTEMPTS, CART_CHANGED_DURING_CHECKOUT
+
+
+class AsyncPurchaseService:
+    """Asinhroni servis za upravljanje kupovinama"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def add_to_cart(
+        self,
+        user_id: int,
+        tour_id: int,
+        tour_name: str,
+        tour_price: float,
+        quantity: int = 1,
+        expected_version: Optional[int] = None
+    ) -> Tuple[ShoppingCart, OrderItem]:
+        """
+        Dodaj turu u korpu
+        Ako tura već postoji, ažuriraj količinu (INSERT ... ON CONFLICT)
+        """
+        dialect_name = self.db.get_bind().dialect.name
+
+        async def mutate(cart: ShoppingCart):
+            return (await self.db.scalars(
+                upsert_item_statement(dialect_name, cart.id, tour_id, tour_name, tour_price, quantity),
+                execution_options={"populate_existing": True}
+            )).one()
+
+        return await self._mutate_cart(user_id, mutate, expected_version)
+
+    async def _mutate_cart(self, user_id: int, mutate, expected_version: Optional[int] = None):
+        """
+        Izvrši izmenu korpe u jednoj transakciji (videti PurchaseService._mutate_cart)
+
+        Returns:
+            (cart, result) ili None ako mutate nije našao stavku
+        """
+        attempts = 1 if expected_version is not None else CART_MUTATION_ATTEMPTS
+
+        for attempt in range(attempts):
+            cart = await self._find_pending_cart(user_id)
+            if cart and expected_version == EMPTY_CART_VERSION:
+                # Klijent je video praznu virtuelnu korpu, a korpa je u međuvremenu kreirana
+                raise CartConflictError(cart.id, expected_version)
+            if not cart:
+                cart = ShoppingCart(user_id=user_id, status=OrderStatus.PENDING)
+                self.db.add(cart)
+                await self.db.flush()
+
+            version = cart.version if expected_version in (None, EMPTY_CART_VERSION) else expected_version
+
+            try:
+                result = await mutate(cart)
+                if result is None:
+                    await self.db.rollback()
+                    return None
+
+                updated_cart = (await self.db.scalars(
+                    bump_cart_statement(cart.id, version),
+                    execution_options={"populate_existing": True, "synchronize_session": False}
+                )).one_or_none()
+
+                if updated_cart is None:
+                    raise CartConflictError(cart.id, expected_version)
+
+                await self.db.commit()
+            except CartConflictError:
+                await self.db.rollback()
+                if attempt == attempts - 1:
+                    raise
+                continue
+
+            cart_cache.invalidate(user_id)
+            session_router.mark_write(user_id)
+
+            # Stavke se učitavaju ponovo jer su izmenjene direktnim SQL naredbama
+            # (lazy load nije moguć u async sesiji)
+            await self.db.refresh(updated_cart, ["items"])
+            return updated_cart, result
+
+    async def _find_pending_cart(self, user_id: int) -> Optional[ShoppingCart]:
+        """Dobij aktivnu (PENDING) korpu korisnika bez kreiranja nove"""
+        return (await self.db.scalars(
+            select(ShoppingCart).where(
+                and_(
+                    ShoppingCart.user_id == user_id,
+                    ShoppingCart.status == OrderStatus.PENDING
+                )
+            ).limit(1)
+        )).first()
+
+    async def checkout(
+        self,
+        user_id: int,
+        cart_id: int,
+        transaction_id: Optional[str] = None
+    ) -> Tuple[bool, Optional[List[TourPurchaseToken]], Optional[str], Optional[str]]:
+        """
+        Checkout proces sa SAGA pattern-om
+        transaction_id se zadaje unapred kada je zahtev vezan za Idempotency-Key
+
+        Returns:
+            (success, tokens, transaction_id, error_message)
+        """
+        cart, error = await self._lock_cart_for_checkout(user_id, cart_id)
+        if error:
+            return False, None, None, error
+
+        try:
+            await self.db.commit()
+        except StaleDataError:
+            await self.db.rollback()
+            return False, None, None, CART_CHANGED_DURING_CHECKOUT
+
+        cart_cache.invalidate(user_id)
+        session_router.mark_write(user_id)
+
+        orchestrator = SagaOrchestrator(self.db)
+        success, tokens, error = await orchestrator.execute_checkout_saga(
+            cart, user_id, transaction_id=transaction_id
+        )
+
+        transaction_id = orchestrator.saga_transaction.transaction_id if orchestrator.saga_transaction else None
+
+        return success, tokens, transaction_id, error
+
+    async def run_checkout_job(self, job_id: int) -> bool:
+        """Izvrši SAGA transakciju za posao preuzet iz reda"""
+        job, saga, cart = await self._load_checkout_job(job_id)
+
+        orchestrator = SagaOrchestrator(self.db)
+        success, _, _ = await orchestrator.execute_checkout_saga(cart, job.user_id, saga_transaction=saga)
+
+        job.status = CheckoutJobStatus.DONE
+        job.finished_at = utcnow()
+        await self.db.commit()
+
+        return success
+
+    async def abandon_checkout_job(self, job_id: int):
+        """
+        Posao čiji je worker nestao (istekao lease) se ne pokreće ponovo -
+        SAGA se označava kao neuspešna, a svi koraci do kojih je stigla
+        (tokeni, plaćanje, rezervacije) se kompenzuju
+        """
+        job, saga, cart = await self._load_checkout_job(job_id)
+
+        orchestrator = SagaOrchestrator(self.db)
+        orchestrator.saga_transaction = saga
+        await orchestrator.compensate_abandoned(cart, job.user_id)
+        await orchestrator.flush_events(commit=False)
+
+        cart.status = OrderStatus.FAILED
+        saga.status = OrderStatus.FAILED
+        saga.error_message = "Checkout worker stopped before the transaction finished"
+        saga.completed_at = utcnow()
+        job.status = CheckoutJobStatus.DONE
+        job.finished_at = utcnow()
+        await self.db.commit()
+
+    async def _load_checkout_job(self, job_id: int) -> Tuple[CheckoutJob, SagaTransaction, ShoppingCart]:
+        job = await self.db.get(CheckoutJob, job_id)
+        saga = (await self.db.scalars(
+            select(SagaTransaction).where(SagaTransaction.transaction_id == job.transaction_id)
+        )).one()
+        cart = await self.db.get(ShoppingCart, job.cart_id, options=[selectinload(ShoppingCart.items)])
+        return job, saga, cart
+
+    async def _lock_cart_for_checkout(self, user_id: int, cart_id: int) -> Tuple[Optional[ShoppingCart], Optional[str]]:
+        """
+        Proveri korpu i prebaci je u PROCESSING (bez commit-a)
+        Stavke se učitavaju odmah jer ih SAGA koraci čitaju
+        """
+        cart = (await self.db.scalars(
+            select(ShoppingCart).options(
+                selectinload(ShoppingCart.items)
+            ).where(
+                and_(
+                    ShoppingCart.id == cart_id,
+                    ShoppingCart.user_id == user_id
+                )
+            )
+        )).first()
+
+        if not cart:
+            return None, "Cart not found"
+
+        # Allow retry if cart is in FAILED status by resetting it to PENDING
+        if cart.status == OrderStatus.FAILED:
+            cart.status = OrderStatus.PENDING
+
+        if cart.status != OrderStatus.PENDING:
+            return None, f"Cart already processed (status: {cart.status})"
+
+        if not cart.items:
+            return None, "Cart is empty"
+
+        cart.status = OrderStatus.PROCESSING
+        return cart, None
@@ -0,0 +1,126 @@
+"""
+Cart Cache - Keš snimaka korpe po korisniku za GET /cart
+
+Snimak (ShoppingCartResponse) se čuva zajedno sa ID-om i verzijom korpe:
+- unutar `ttl_seconds` od upisa vraća se bez odlaska u bazu
+- posle toga se proverava samo (id, version) aktivne korpe; ako se
+  poklapa, snimak važi i dalje (revalidacija jednim indeksiranim upitom)
+
+Izmene korpe i checkout pozivaju invalidate(user_id) posle commit-a.
+Invalidacija ostavlja oznaku sa generacijom, pa čitanje koje je počelo
+pre invalidacije ne može da upiše zastareli snimak.
+
+Veličina je ograničena (LRU), a statistika pogodaka se prijavljuje na /health.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.schemas.purchase import ShoppingCartResponse
+
+
+@dataclass
+class _CartEntry:
+    generation: int
+    snapshot: Optional[ShoppingCartResponse] = None
+    cart_id: Optional[int] = None
+    version: Optional[int] = None
+    stored_at: float = 0.0
+
+
+class CartSnapshotCache:
+    """Thread-safe LRU keš snimaka korpe"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, _CartEntry]" = OrderedDict()
+        self._generations = itertools.count(1)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def lookup(self, user_id: int) -> Tuple[Optional[_CartEntry], bool, int]:
+        """
+        Returns:
+            (entry, fresh, read_token) - entry je None ako snimka nema;
+            fresh=True znači da se snimak vraća bez provere u bazi;
+            read_token se prosleđuje u store()
+        """
+        with self._lock:
+            token = self._generation
+            entry = self._entries.get(user_id)
+            if entry is None or entry.snapshot is None:
+                return None, False, token
+            self._entries.move_to_end(user_id)
+            fresh = time.monotonic() - entry.stored_at < self.ttl_seconds
+            if fresh:
+                self.hits += 1
+            return entry, fresh, token
+
+    def revalidate(self, user_id: int, entry: _CartEntry, cart_id: Optional[int], version: Optional[int]) -> bool:
+        """Snimak važi ako aktivna korpa ima isti ID i verziju"""
+        with self._lock:
+            if self._entries.get(user_id) is not entry or (entry.cart_id, entry.version) != (cart_id, version):
+                return False
+            entry.stored_at = time.monotonic()
+            self.revalidated += 1
+            return True
+
+    def store(self, user_id: int, read_token: int, snapshot: ShoppingCartResponse):
+        """Upiši snimak učitan iz baze (ignoriše se ako je korpa u međuvremenu invalidirana)"""
+        with self._lock:
+            self.misses += 1
+            current = self._entries.get(user_id)
+            if current is not None and current.generation > read_token:
+                return
+            self._entries[user_id] = _CartEntry(
+                generation=read_token,
+                snapshot=snapshot,
+                cart_id=snapshot.id,
+                version=snapshot.version if snapshot.id is not None else None,
+                stored_at=time.monotonic()
+            )
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def invalidate(self, user_id: int):
+        """Poziva se posle commit-a izmene korpe ili checkout-a"""
+        with self._lock:
+            self._generation = next(self._generations)
+            self._entries[user_id] = _CartEntry(generation=self._generation)
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            served = self.hits + self.revalidated
+            total = served + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "hit_ratio": round(served / total, 4) if total else None,
+            }
+
+
+cart_cache = CartSnapshotCache(
+    max_entries=settings.cart_cache_max_entries,
+    ttl_seconds=settings.cart_cache_ttl_seconds
+)
@@ -0,0 +1,114 @@
+"""
+Cart Statements - SQL naredbe za izmene korpe
+
+Svaka izmena korpe se izvršava u jednoj transakciji: upsert/izmena stavke,
+ponovno računanje ukupne cene u SQL-u i povećanje verzije korpe sa
+RETURNING. Naredbe se grade ovde kako bi ih koristili i sinhroni i
+asinhroni servis.
+"""
+
+from typing import Optional
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models.purchase import ShoppingCart, OrderItem, utcnow
+
+
+# Verzija prazne virtuelne korpe (ETag "0") - korpa u bazi počinje od verzije 1,
+# pa If-Match: "0" znači "korpa još ne postoji"
+EMPTY_CART_VERSION = 0
+
+
+class CartConflictError(Exception):
+    """Korpa je u međuvremenu izmenjena (verzija se ne poklapa)"""
+
+    def __init__(self, cart_id: int, expected_version: Optional[int] = None):
+        self.cart_id = cart_id
+        self.expected_version = expected_version
+        super().__init__(f"Cart {cart_id} was modified concurrently")
+
+
+def insert_for_dialect(dialect_name: str):
+    """INSERT sa podrškom za ON CONFLICT za dati dijalekt"""
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"ON CONFLICT upsert not supported for dialect '{dialect_name}'")
+
+
+def upsert_item_statement(
+    dialect_name: str,
+    cart_id: int,
+    tour_id: int,
+    tour_name: str,
+    tour_price: float,
+    quantity: int
+):
+    """
+    INSERT ... ON CONFLICT (cart_id, tour_id) DO UPDATE
+    Ako tura već postoji u korpi, količina se uvećava
+    """
+    stmt = insert_for_dialect(dialect_name)(OrderItem).values(
+        cart_id=cart_id,
+        tour_id=tour_id,
+        tour_name=tour_name,
+        tour_price=tour_price,
+        quantity=quantity,
+        price=tour_price * quantity,
+        created_at=utcnow()
+    )
+    new_quantity = OrderItem.quantity + stmt.excluded.quantity
+    return stmt.on_conflict_do_update(
+        index_elements=[OrderItem.cart_id, OrderItem.tour_id],
+        set_={
+            "quantity": new_quantity,
+            "price": OrderItem.tour_price * new_quantity
+        }
+    ).returning(OrderItem)
+
+
+def update_item_quantity_statement(cart_id: int, item_id: int, quantity: int):
+    """Postavi količinu stavke i preračunaj njenu cenu"""
+    return update(OrderItem).where(
+        OrderItem.id == item_id,
+        OrderItem.cart_id == cart_id
+    ).values(
+        quantity=quantity,
+        price=OrderItem.tour_price * quantity
+    ).returning(OrderItem)
+
+
+def delete_item_statement(cart_id: int, item_id: int):
+    """Obriši jednu stavku iz korpe"""
+    return delete(OrderItem).where(
+        OrderItem.id == item_id,
+        OrderItem.cart_id == cart_id
+    ).returning(OrderItem.id)
+
+
+def delete_all_items_statement(cart_id: int):
+    """Obriši sve stavke iz korpe"""
+    return delete(OrderItem).where(OrderItem.cart_id == cart_id)
+
+
+def bump_cart_statement(cart_id: int, expected_version: int):
+    """
+    Preračunaj ukupnu cenu u SQL-u i povećaj verziju korpe
+    Ne vraća ništa ako je verzija u međuvremenu promenjena
+    """
+    total = select(
+        func.coalesce(func.sum(OrderItem.price), 0.0)
+    ).where(
+        OrderItem.cart_id == cart_id
+    ).scalar_subquery()
+
+    return update(ShoppingCart).where(
+        ShoppingCart.id == cart_id,
+        ShoppingCart.version == expected_version
+    ).values(
+        total_price=total,
+        version=ShoppingCart.version + 1,
+        updated_at=utcnow()
+    ).returning(ShoppingCart)
@@ -0,0 +1,128 @@
+"""
+Cart Sweeper - Brisanje napuštenih i neuspelih korpi
+
+Korpa se briše (sa stavkama) kada je:
+- PENDING i nije menjana cart_abandon_after_days dana
+- FAILED/CANCELLED i nije menjana cart_failed_retention_days dana
+
+i na nju ne pokazuje nijedna aktivna SAGA transakcija, checkout posao ni
+purchase token (arhivirane transakcije nemaju FK, pa ne sprečavaju brisanje).
+
+Brisanje ide u ograničenim serijama, svaka u kratkoj transakciji
+(FOR UPDATE SKIP LOCKED). Posao pokreće scheduler sa jitter-om, a broj
+obrisanih redova se izvozi kao Prometheus brojač.
+Ručno pokretanje: python -m app.services.cart_sweeper
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import and_, delete, exists, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.purchase import (
+    utcnow,
+    ShoppingCart, OrderItem, TourPurchaseToken, SagaTransaction, CheckoutJob, OrderStatus
+)
+from app.observability import cart_items_swept_total, carts_swept_total
+from app.services.cart_cache import cart_cache
+
+SWEPT_FINISHED_STATUSES = (OrderStatus.FAILED, OrderStatus.CANCELLED)
+
+
+class CartSweeper:
+    """Brisanje isteklih korpi u serijama"""
+
+    def __init__(
+        self,
+        db: Session,
+        batch_size: int = settings.cart_sweep_batch_size,
+        batch_pause_seconds: float = settings.cart_sweep_batch_pause_seconds
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch_pause_seconds = batch_pause_seconds
+
+    def _expired(self, now: datetime):
+        """Uslov isteka - ponavlja se i u DELETE-u, pa izmenjena korpa ne može biti obrisana"""
+        abandoned_before = now - timedelta(days=settings.cart_abandon_after_days)
+        failed_before = now - timedelta(days=settings.cart_failed_retention_days)
+        return and_(
+            or_(
+                and_(ShoppingCart.status == OrderStatus.PENDING, ShoppingCart.updated_at < abandoned_before),
+                and_(ShoppingCart.status.in_(SWEPT_FINISHED_STATUSES), ShoppingCart.updated_at < failed_before)
+            ),
+            ~exists().where(SagaTransaction.cart_id == ShoppingCart.id),
+            ~exists().where(CheckoutJob.cart_id == ShoppingCart.id),
+            ~exists().where(TourPurchaseToken.cart_id == ShoppingCart.id)
+        )
+
+    def sweep(self) -> Dict[str, int]:
+        """Briši seriju po seriju dok ima isteklih korpi"""
+        totals = {"carts": 0, "items": 0, "batches": 0}
+        while True:
+            carts, items = self.sweep_batch()
+            if not carts:
+                break
+            totals["carts"] += carts
+            totals["items"] += items
+            totals["batches"] += 1
+            if carts < self.batch_size:
+                break
+            time.sleep(self.batch_pause_seconds)
+        return totals
+
+    def sweep_batch(self) -> Tuple[int, int]:
+        """
+        Obriši jednu seriju u jednoj transakciji
+        Returns:
+            (broj korpi, broj stavki)
+        """
+        expired = self._expired(utcnow())
+        try:
+            candidates = self.db.execute(
+                select(ShoppingCart.id, ShoppingCart.user_id, ShoppingCart.status).where(expired)
+                .order_by(ShoppingCart.id).limit(self.batch_size).with_for_update(skip_locked=True)
+            ).all()
+            if not candidates:
+                self.db.rollback()
+                return 0, 0
+
+            ids = [row.id for row in candidates]
+            items = self.db.execute(delete(OrderItem).where(
+                OrderItem.cart_id.in_(select(ShoppingCart.id).where(and_(ShoppingCart.id.in_(ids), expired)))
+            )).rowcount
+            deleted: List[int] = self.db.scalars(
+                delete(ShoppingCart).where(and_(ShoppingCart.id.in_(ids), expired)).returning(ShoppingCart.id)
+            ).all()
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        deleted_ids = set(deleted)
+        for row in candidates:
+            if row.id not in deleted_ids:
+                continue
+            carts_swept_total.labels(row.status.value).inc()
+            if row.status == OrderStatus.PENDING:
+                cart_cache.invalidate(row.user_id)
+        cart_items_swept_total.inc(max(items, 0))
+
+        return len(deleted_ids), max(items, 0)
+
+
+def sweep_carts_job() -> Dict[str, int]:
+    """Periodični posao (app/core/scheduler.py)"""
+    db = SessionLocal()
+    try:
+        return CartSweeper(db).sweep()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print(sweep_carts_job())
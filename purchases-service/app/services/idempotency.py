@@ -0,0 +1,272 @@
+"""
+Idempotency Service - Idempotentni checkout preko Idempotency-Key headera
+
+Prvi zahtev sa ključem upisuje red u `idempotency_keys` (otisak zahteva i
+unapred dodeljen ID SAGA transakcije) pre pokretanja SAGA-e. Ponovljen
+zahtev sa istim ključem:
+- dok je original u toku - čeka njegov rezultat (isti transaction_id)
+- kada je original završen - dobija zapamćen odgovor bez poziva drugih servisa
+- sa drugačijim telom zahteva - odbija se
+
+Ključ koji je ostao IN_PROGRESS duže od checkout roka (proces je pao pre
+complete/release) razrešava se po SAGA transakciji: ako SAGA nije ni
+kreirana ključ se oslobađa, a inače odgovor gradi pozivalac iz njenog stanja.
+
+IdempotencyService radi sa sinhronom sesijom (sinhrone rute), a
+AsyncIdempotencyService sa AsyncSession-om async ruta - ista pravila, bez
+dodatne sinhrone konekcije po zahtevu.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.purchase import IdempotencyKey, IdempotencyStatus, SagaTransaction, utcnow
+
+# Odgovor iz stanja SAGA-e: (status_code, body) ili None dok odgovor još nije poznat
+SagaResponseBuilder = Callable[[Session, SagaTransaction], Optional[Tuple[int, dict]]]
+AsyncSagaResponseBuilder = Callable[[AsyncSession, SagaTransaction], Awaitable[Optional[Tuple[int, dict]]]]
+
+
+class IdempotencyKeyMismatch(Exception):
+    """Ključ je već iskorišćen za drugačiji zahtev"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__(f"Idempotency key '{key}' was already used with a different request")
+
+
+def request_fingerprint(endpoint: str, payload: dict) -> str:
+    """Otisak zahteva - endpoint i kanonski JSON tela"""
+    canonical = json.dumps(
+        {"endpoint": endpoint, "payload": payload},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _is_stale(record: IdempotencyKey) -> bool:
+    """IN_PROGRESS ključ stariji od checkout roka - originalni zahtev nije završen"""
+    if record.status != IdempotencyStatus.IN_PROGRESS:
+        return False
+    stale_after = settings.checkout_deadline_seconds + settings.idempotency_stale_margin_seconds
+    return record.created_at < utcnow() - timedelta(seconds=stale_after)
+
+
+def _is_expired(record: IdempotencyKey) -> bool:
+    return record.created_at < utcnow() - timedelta(hours=settings.idempotency_key_ttl_hours)
+
+
+def _complete_record(record: IdempotencyKey, status_code: int, body: dict):
+    record.status = IdempotencyStatus.COMPLETED
+    record.response_code = status_code
+    record.response_body = json.dumps(body)
+    record.completed_at = utcnow()
+
+
+def _key_query(user_id: int, key: str):
+    return select(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key
+    ).execution_options(populate_existing=True)
+
+
+def _saga_query(transaction_id: str):
+    return select(SagaTransaction).where(SagaTransaction.transaction_id == transaction_id).limit(1)
+
+
+class IdempotencyService:
+    """Servis za čuvanje i ponavljanje odgovora po Idempotency-Key"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def claim(
+        self,
+        user_id: int,
+        key: str,
+        fingerprint: str,
+        transaction_id: str,
+        saga_response: Optional[SagaResponseBuilder] = None
+    ) -> Tuple[IdempotencyKey, bool]:
+        """
+        Zauzmi ključ za novi zahtev
+        saga_response razrešava zaglavljen IN_PROGRESS ključ (videti recover_stale)
+
+        Returns:
+            (record, is_new) - is_new=False znači da je zahtev ponovljen
+        Raises:
+            IdempotencyKeyMismatch ako je ključ iskorišćen za drugi zahtev
+        """
+        for _ in range(2):
+            record = self.get(user_id, key)
+
+            if record is not None and _is_expired(record):
+                self.db.delete(record)
+                self.db.commit()
+                record = None
+
+            if (
+                record is not None
+                and saga_response is not None
+                and record.fingerprint == fingerprint
+                and _is_stale(record)
+            ):
+                record = self.recover_stale(record, saga_response)
+
+            if record is None:
+                record = IdempotencyKey(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=fingerprint,
+                    transaction_id=transaction_id
+                )
+                self.db.add(record)
+                try:
+                    self.db.commit()
+                    return record, True
+                except IntegrityError:
+                    # Paralelni zahtev sa istim ključem je bio brži
+                    self.db.rollback()
+                    record = self.get(user_id, key)
+
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    raise IdempotencyKeyMismatch(key)
+                return record, False
+
+        raise IdempotencyKeyMismatch(key)
+
+    def complete(self, record: IdempotencyKey, status_code: int, body: dict):
+        """Zapamti konačan odgovor zahteva"""
+        _complete_record(record, status_code, body)
+        self.db.commit()
+
+    def release(self, record: IdempotencyKey):
+        """Oslobodi ključ kada zahtev nije završen (neočekivana greška) - ponovni pokušaj kreće iznova"""
+        self.db.rollback()
+        self.db.delete(record)
+        self.db.commit()
+
+    def recover_stale(self, record: IdempotencyKey, saga_response: SagaResponseBuilder) -> Optional[IdempotencyKey]:
+        """
+        Razreši ključ čiji originalni zahtev nije završen
+
+        Returns:
+            None ako je ključ oslobođen (SAGA nije kreirana), inače record -
+            COMPLETED ako je saga_response vratio odgovor
+        """
+        saga = self.db.scalars(_saga_query(record.transaction_id)).first()
+
+        if saga is None:
+            self.release(record)
+            return None
+
+        response = saga_response(self.db, saga)
+        if response is not None:
+            self.complete(record, *response)
+        return record
+
+    def get(self, user_id: int, key: str) -> Optional[IdempotencyKey]:
+        return self.db.scalars(_key_query(user_id, key)).first()
+
+
+class AsyncIdempotencyService:
+    """IdempotencyService nad AsyncSession-om (videti IdempotencyService)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def claim(
+        self,
+        user_id: int,
+        key: str,
+        fingerprint: str,
+        transaction_id: str,
+        saga_response: Optional[AsyncSagaResponseBuilder] = None
+    ) -> Tuple[IdempotencyKey, bool]:
+        """
+        Zauzmi ključ za novi zahtev
+
+        Returns:
+            (record, is_new) - is_new=False znači da je zahtev ponovljen
+        Raises:
+            IdempotencyKeyMismatch ako je ključ iskorišćen za drugi zahtev
+        """
+        for _ in range(2):
+            record = await self.get(user_id, key)
+
+            if record is not None and _is_expired(record):
+                await self.db.delete(record)
+                await self.db.commit()
+                record = None
+
+            if (
+                record is not None
+                and saga_response is not None
+                and record.fingerprint == fingerprint
+                and _is_stale(record)
+            ):
+                record = await self.recover_stale(record, saga_response)
+
+            if record is None:
+                record = IdempotencyKey(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=fingerprint,
+                    transaction_id=transaction_id
+                )
+                self.db.add(record)
+                try:
+                    await self.db.commit()
+                    return record, True
+                except IntegrityError:
+                    # Paralelni zahtev sa istim ključem je bio brži
+                    await self.db.rollback()
+                    record = await self.get(user_id, key)
+
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    raise IdempotencyKeyMismatch(key)
+                return record, False
+
+        raise IdempotencyKeyMismatch(key)
+
+    async def complete(self, record: IdempotencyKey, status_code: int, body: dict):
+        """Zapamti konačan odgovor zahteva"""
+        _complete_record(record, status_code, body)
+        await self.db.commit()
+
+    async def release(self, record: IdempotencyKey):
+        """Oslobodi ključ kada zahtev nije završen - ponovni pokušaj kreće iznova"""
+        await self.db.rollback()
+        await self.db.delete(record)
+        await self.db.commit()
+
+    async def recover_stale(
+        self,
+        record: IdempotencyKey,
+        saga_response: AsyncSagaResponseBuilder
+    ) -> Optional[IdempotencyKey]:
+        """Razreši ključ čiji originalni zahtev nije završen (videti IdempotencyService.recover_stale)"""
+        saga = (await self.db.scalars(_saga_query(record.transaction_id))).first()
+
+        if saga is None:
+            await self.release(record)
+            return None
+
+        response = await saga_response(self.db, saga)
+        if response is not None:
+            await self.complete(record, *response)
+        return record
+
+    async def get(self, user_id: int, key: str) -> Optional[IdempotencyKey]:
+        return (await self.db.scalars(_key_query(user_id, key))).first()
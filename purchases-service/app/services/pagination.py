@@ -0,0 +1,49 @@
+"""
+Pagination - Keyset (seek) paginacija i ETag za istoriju kupovina
+
+Kursor je pozicija poslednjeg vraćenog reda (datum, id) kodirana kao
+base64url JSON. Sledeća strana se čita sa WHERE (datum, id) < kursor,
+pa cena upita ne raste sa brojem strane (nema OFFSET).
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(ValueError):
+    """Kursor nije ispravan (izmenjen ili iz druge verzije API-ja)"""
+
+
+def encode_cursor(position: datetime, row_id: int) -> str:
+    payload = json.dumps([position.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(position), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def history_etag(*parts) -> str:
+    """Slab ETag iz agregata istorije (broj redova, poslednja izmena) i parametara strane"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match može sadržati više ETag-ova ili *"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    weak = etag.removeprefix("W/")
+    return "*" in candidates or any(tag.removeprefix("W/") == weak for tag in candidates)
@@ -0,0 +1,174 @@
+"""
+Purchase Export - Izvoz tokena i SAGA transakcija za finansije (CSV / NDJSON)
+
+Redovi se čitaju kao torke kolona (bez ORM objekata) sa yield_per, što na
+PostgreSQL-u znači server-side kursor - u memoriji je najviše jedna serija
+redova, bez obzira na veličinu tabele. Svaka serija se kodira u jedan komad
+odgovora (StreamingResponse), pa klijent dobija podatke odmah.
+
+SAGA izvoz obuhvata i arhivu (saga_transactions_archive), jer su starije
+transakcije premeštene tamo. Čita se sa replike kada je podešena.
+Protok (redova/s) se loguje tokom i na kraju izvoza.
+"""
+
+import csv
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Table, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import session_router
+from app.models.purchase import TourPurchaseToken, SagaTransaction, SagaTransactionArchive
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    """Tabele jednog izvoza (redom) i kolona po kojoj se filtrira datum"""
+    tables: Sequence[Table]
+    columns: List[str]
+    date_column: str
+
+
+EXPORT_DATASETS: Dict[str, ExportDataset] = {
+    "tokens": ExportDataset(
+        tables=(TourPurchaseToken.__table__,),
+        columns=[
+            "id", "token", "user_id", "cart_id", "tour_id", "tour_name",
+            "purchase_price", "purchased_at", "is_active"
+        ],
+        date_column="purchased_at"
+    ),
+    "sagas": ExportDataset(
+        tables=(SagaTransaction.__table__, SagaTransactionArchive.__table__),
+        columns=[
+            "id", "transaction_id", "cart_id", "user_id", "status", "current_step",
+            "error_message", "created_at", "updated_at", "completed_at"
+        ],
+        date_column="created_at"
+    ),
+}
+
+
+def _value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_encoder(columns: List[str]) -> Callable[[List[Sequence]], str]:
+    """Prvi komad je zaglavlje, ostali su serije redova"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def encode(rows: List[Sequence]) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_value(v) for v in row] for row in rows)
+        return buffer.getvalue()
+
+    return encode
+
+
+def _ndjson_encoder(columns: List[str]) -> Callable[[List[Sequence]], str]:
+    def encode(rows: List[Sequence]) -> str:
+        return "".join(
+            json.dumps(dict(zip(columns, (_value(v) for v in row))), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+    return encode
+
+
+class PurchaseExporter:
+    """Strimovanje jednog izvoza u komadima teksta"""
+
+    def __init__(
+        self,
+        dataset: str,
+        export_format: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        yield_per: int = settings.export_yield_per
+    ):
+        self.name = dataset
+        self.dataset = EXPORT_DATASETS[dataset]
+        self.export_format = export_format
+        self.date_from = date_from
+        self.date_to = date_to
+        self.yield_per = yield_per
+
+    @property
+    def media_type(self) -> str:
+        return EXPORT_FORMATS[self.export_format]
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{self.export_format}"
+
+    def _statement(self, table: Table):
+        """SELECT kolona izvoza; date_to je uključiv dan"""
+        date_column = table.c[self.dataset.date_column]
+        conditions = []
+        if self.date_from is not None:
+            conditions.append(date_column >= datetime.combine(self.date_from, dt_time.min))
+        if self.date_to is not None:
+            conditions.append(date_column < datetime.combine(self.date_to + timedelta(days=1), dt_time.min))
+        return (
+            select(*(table.c[name] for name in self.dataset.columns))
+            .where(*conditions)
+            .order_by(table.c.id)
+            .execution_options(yield_per=self.yield_per)
+        )
+
+    def stream(self) -> Iterator[str]:
+        """Sinhroni generator - Starlette ga iterira u threadpool-u"""
+        columns = self.dataset.columns
+        if self.export_format == "csv":
+            encode = _csv_encoder(columns)
+            yield encode([columns])
+        else:
+            encode = _ndjson_encoder(columns)
+
+        started = time.perf_counter()
+        rows_total = 0
+        next_log = settings.export_log_every_rows
+        db: Session = session_router.read_session()
+        try:
+            for table in self.dataset.tables:
+                result = db.execute(self._statement(table))
+                for partition in result.partitions():
+                    yield encode(partition)
+                    rows_total += len(partition)
+                    if rows_total >= next_log:
+                        next_log += settings.export_log_every_rows
+                        self._log_progress("progress", rows_total, started)
+            self._log_progress("finished", rows_total, started)
+        except GeneratorExit:
+            # Klijent je prekinuo preuzimanje
+            self._log_progress("aborted", rows_total, started)
+            raise
+        finally:
+            db.close()
+
+    def _log_progress(self, stage: str, rows: int, started: float):
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"[EXPORT] {self.name}.{self.export_format} {stage}: {rows} rows in {elapsed:.1f}s "
+            f"({rows / elapsed if elapsed > 0 else 0:.0f} rows/s)"
+        )
@@ -0,0 +1,179 @@
+"""
+Purchase Index - In-memory indeks kupljenih tura
+
+Mapa user_id -> {tour_id: (token_id, purchased_at)} koja se puni iz
+`tour_purchase_tokens` pri pokretanju servisa i ažurira se pri generisanju
+i kompenzaciji tokena. gRPC provera kupovine odgovara iz indeksa bez
+odlaska u bazu.
+
+Samostalni gRPC server (drugi proces) ne vidi tokene generisane u REST
+procesu, pa periodično dopunjava indeks (catch_up) i povremeno ga
+ponovo učitava ceo (warm) da bi uklonio kompenzovane tokene.
+
+catch_up ne prati najveći viđeni ID: transakcije se commit-uju drugačijim
+redom nego što dobijaju ID, pa bi token sa manjim ID-em commit-ovan kasnije
+bio preskočen. Umesto toga ponovo čita tokene sa purchased_at od početka
+prethodnog prolaza minus margina; već indeksirani tokeni se preskaču.
+
+Indeks je lokalan za proces. Tokeni iz drugog procesa ili replike servisa
+postaju vidljivi tek posle catch_up prolaza, a kompenzovani tokeni drugog
+procesa nestaju tek posle punog učitavanja (grpc_index_full_refresh_seconds).
+Zato gRPC server ture kojih nema u indeksu proverava u bazi
+(grpc_index_miss_db_fallback) i nađene tokene dodaje u indeks.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.purchase import TourPurchaseToken, OrderStatus, utcnow
+from app.observability import purchase_index_tokens
+
+logger = logging.getLogger(__name__)
+
+# (token_id, purchased_at) za jednu kupljenu turu
+PurchaseEntry = Tuple[int, Optional[datetime]]
+
+
+class PurchaseIndex:
+    """Thread-safe indeks aktivnih purchase tokena po korisniku"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._purchases: Dict[int, Dict[int, PurchaseEntry]] = {}
+        self._scanned_at: Optional[datetime] = None
+        self._size = 0
+        self.is_warm = False
+
+    def warm(self, db: Session, batch_size: int = 5000) -> int:
+        """Učitaj sve aktivne tokene iz baze i zameni sadržaj indeksa"""
+        purchases: Dict[int, Dict[int, PurchaseEntry]] = {}
+        scan_started = utcnow()
+        rows = db.query(
+            TourPurchaseToken.id,
+            TourPurchaseToken.user_id,
+            TourPurchaseToken.tour_id,
+            TourPurchaseToken.purchased_at
+        ).filter(
+            TourPurchaseToken.is_active == OrderStatus.COMPLETED
+        ).yield_per(batch_size)
+
+        count = 0
+        for token_id, user_id, tour_id, purchased_at in rows:
+            purchases.setdefault(user_id, {}).setdefault(tour_id, (token_id, purchased_at))
+            count += 1
+
+        with self._lock:
+            if not self.is_warm:
+                # Tokeni generisani dok je učitavanje trajalo već su upisani u stari indeks
+                for user_id, tours in self._purchases.items():
+                    for tour_id, entry in tours.items():
+                        purchases.setdefault(user_id, {}).setdefault(tour_id, entry)
+            self._purchases = purchases
+            self._mark_scanned(scan_started)
+            self._set_size(sum(len(tours) for tours in purchases.values()))
+            self.is_warm = True
+
+        logger.info("Purchase index warmed with %d tokens for %d users", count, len(purchases))
+        return count
+
+    def catch_up(self, db: Session, margin_seconds: float = settings.grpc_index_rescan_margin_seconds) -> int:
+        """
+        Dodaj tokene upisane u drugom procesu od prethodnog prolaza
+
+        Returns:
+            broj novih tokena u indeksu
+        """
+        with self._lock:
+            last_scan = self._scanned_at
+        scan_started = utcnow()
+
+        query = db.query(
+            TourPurchaseToken.id,
+            TourPurchaseToken.user_id,
+            TourPurchaseToken.tour_id,
+            TourPurchaseToken.purchased_at
+        ).filter(
+            TourPurchaseToken.is_active == OrderStatus.COMPLETED
+        )
+        if last_scan is not None:
+            query = query.filter(TourPurchaseToken.purchased_at >= last_scan - timedelta(seconds=margin_seconds))
+        rows = query.order_by(TourPurchaseToken.id).all()
+
+        added = 0
+        with self._lock:
+            for token_id, user_id, tour_id, purchased_at in rows:
+                if self._add_entry(user_id, tour_id, (token_id, purchased_at)):
+                    added += 1
+            self._mark_scanned(scan_started)
+        return added
+
+    def add_tokens(self, tokens: Iterable[TourPurchaseToken]):
+        """Dodaj novo generisane tokene u indeks"""
+        with self._lock:
+            for token in tokens:
+                if token.is_active != OrderStatus.COMPLETED:
+                    continue
+                self._add_entry(token.user_id, token.tour_id, (token.id, token.purchased_at))
+
+    def add_entries(self, user_id: int, entries: Dict[int, PurchaseEntry]):
+        """Dodaj kupovine jednog korisnika pročitane iz baze (provera promašaja indeksa)"""
+        with self._lock:
+            for tour_id, entry in entries.items():
+                self._add_entry(user_id, tour_id, entry)
+
+    def remove_tokens(self, tokens: Iterable[TourPurchaseToken]):
+        """Ukloni kompenzovane tokene iz indeksa"""
+        with self._lock:
+            for token in tokens:
+                user_purchases = self._purchases.get(token.user_id)
+                if not user_purchases:
+                    continue
+                entry = user_purchases.get(token.tour_id)
+                if entry and entry[0] == token.id:
+                    del user_purchases[token.tour_id]
+                    self._set_size(self._size - 1)
+                if not user_purchases:
+                    del self._purchases[token.user_id]
+
+    def _add_entry(self, user_id: int, tour_id: int, entry: PurchaseEntry) -> bool:
+        """
+        Poziva se pod lock-om; prva kupovina ture ostaje u indeksu, pa se
+        token viđen u prethodnom prolazu ne dodaje ponovo
+
+        Returns:
+            True ako je unos dodat
+        """
+        user_purchases = self._purchases.setdefault(user_id, {})
+        if tour_id in user_purchases:
+            return False
+        user_purchases[tour_id] = entry
+        self._set_size(self._size + 1)
+        return True
+
+    def _mark_scanned(self, scan_started: datetime):
+        """Poziva se pod lock-om"""
+        if self._scanned_at is None or scan_started > self._scanned_at:
+            self._scanned_at = scan_started
+
+    def _set_size(self, size: int):
+        self._size = size
+        purchase_index_tokens.set(size)
+
+    def lookup(self, user_id: int, tour_id: int) -> Optional[PurchaseEntry]:
+        """Vrati (token_id, purchased_at) ako je korisnik kupio turu"""
+        with self._lock:
+            return self._purchases.get(user_id, {}).get(tour_id)
+
+    def lookup_many(self, user_id: int, tour_ids: List[int]) -> Dict[int, Optional[PurchaseEntry]]:
+        """Batch provera kupovine za više tura istog korisnika"""
+        with self._lock:
+            user_purchases = self._purchases.get(user_id, {})
+            return {tour_id: user_purchases.get(tour_id) for tour_id in tour_ids}
+
+
+purchase_index = PurchaseIndex()
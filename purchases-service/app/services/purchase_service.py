@@ -2,18 +2,37 @@
 Purchase Service - Biznis logika za kupovinu tura
 """
 
+from datetime import datetime
 from typing import List, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, selectinload, raiseload
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, func, tuple_
+from app.core.database import session_router
 from app.models.purchase import (
     ShoppingCart, OrderItem, TourPurchaseToken, 
-    SagaTransaction, OrderStatus
+    SagaTransaction, SagaEvent, OrderStatus, CheckoutJob,
+    SagaTransactionArchive, SagaEventArchive
 )
 from app.schemas.purchase import (
     OrderItemCreate, AddToCartRequest, 
-    UpdateCartItemRequest
+    UpdateCartItemRequest, ShoppingCartResponse
 )
-from app.saga.orchestrator import SagaOrchestrator
+from app.services.cart_cache import cart_cache
+from app.saga.orchestrator import new_transaction_id
+from app.services.cart_statements import (
+    CartConflictError,
+    EMPTY_CART_VERSION,
+    upsert_item_statement,
+    update_item_quantity_statement,
+    delete_item_statement,
+    delete_all_items_statement,
+    bump_cart_statement
+)
+
+# Broj pokušaja izmene korpe kada klijent ne šalje očekivanu verziju
+CART_MUTATION_ATTEMPTS = 3
+
+CART_CHANGED_DURING_CHECKOUT = "Cart was modified during checkout, please try again"
 
 
 class PurchaseService:
@@ -22,25 +41,31 @@ class PurchaseService:
     def __init__(self, db: Session):
         self.db = db
     
-    def get_or_create_cart(self, user_id: int) -> ShoppingCart:
+    def get_cart_snapshot(self, user_id: int) -> ShoppingCartResponse:
         """
-        Dobij aktivnu korpu korisnika ili kreiraj novu
-        Korisnik može imati samo jednu aktivnu korpu
+        Snimak aktivne korpe za prikaz - čitanje ne kreira korpu
+        Ako korisnik nema aktivnu korpu, vraća se prazna virtuelna korpa;
+        korpa se kreira tek pri prvoj izmeni (_mutate_cart)
         """
-        cart = self.db.query(ShoppingCart).filter(
-            and_(
-                ShoppingCart.user_id == user_id,
-                ShoppingCart.status == OrderStatus.PENDING
-            )
-        ).first()
+        entry, fresh, read_token = cart_cache.lookup(user_id)
+        if fresh:
+            return entry.snapshot
         
-        if not cart:
-            cart = ShoppingCart(user_id=user_id, status=OrderStatus.PENDING)
-            self.db.add(cart)
-            self.db.commit()
-            self.db.refresh(cart)
+        if entry is not None:
+            current = self.db.query(ShoppingCart.id, ShoppingCart.version).filter(
+                and_(
+                    ShoppingCart.user_id == user_id,
+                    ShoppingCart.status == OrderStatus.PENDING
+                )
+            ).first()
+            cart_id, version = current if current else (None, None)
+            if cart_cache.revalidate(user_id, entry, cart_id, version):
+                return entry.snapshot
         
-        return cart
+        cart = self._find_pending_cart(user_id, load_items=True)
+        snapshot = ShoppingCartResponse.model_validate(cart) if cart else ShoppingCartResponse.empty(user_id)
+        cart_cache.store(user_id, read_token, snapshot)
+        return snapshot
     
     def add_to_cart(
         self, 
@@ -48,135 +73,189 @@ class PurchaseService:
         tour_id: int, 
         tour_name: str, 
         tour_price: float, 
-        quantity: int = 1
+        quantity: int = 1,
+        expected_version: Optional[int] = None
     ) -> Tuple[ShoppingCart, OrderItem]:
         """
         Dodaj turu u korpu
-        Ako tura već postoji, ažuriraj količinu
+        Ako tura već postoji, ažuriraj količinu (INSERT ... ON CONFLICT)
         """
-        cart = self.get_or_create_cart(user_id)
-        
-        # Proveri da li tura već postoji u korpi
-        existing_item = self.db.query(OrderItem).filter(
-            and_(
-                OrderItem.cart_id == cart.id,
-                OrderItem.tour_id == tour_id
-            )
-        ).first()
-        
-        if existing_item:
-            # Ažuriraj količinu
-            existing_item.quantity += quantity
-            existing_item.calculate_price()
-            item = existing_item
-        else:
-            # Kreiraj novu stavku
-            item = OrderItem(
-                cart_id=cart.id,
-                tour_id=tour_id,
-                tour_name=tour_name,
-                tour_price=tour_price,
-                quantity=quantity
-            )
-            item.calculate_price()
-            self.db.add(item)
-        
-        # Ažuriraj ukupnu cenu korpe
-        self.db.commit()
-        self.db.refresh(cart)
-        cart.calculate_total()
-        self.db.commit()
-        self.db.refresh(cart)
-        
-        return cart, item
+        dialect_name = self.db.get_bind().dialect.name
+
+        def mutate(cart: ShoppingCart):
+            return self.db.scalars(
+                upsert_item_statement(dialect_name, cart.id, tour_id, tour_name, tour_price, quantity),
+                execution_options={"populate_existing": True}
+            ).one()
+
+        return self._mutate_cart(user_id, mutate, expected_version)
     
-    def remove_from_cart(self, user_id: int, item_id: int) -> Optional[ShoppingCart]:
+    def remove_from_cart(
+        self, 
+        user_id: int, 
+        item_id: int, 
+        expected_version: Optional[int] = None
+    ) -> Optional[ShoppingCart]:
         """Ukloni stavku iz korpe"""
-        cart = self.get_or_create_cart(user_id)
-        
-        item = self.db.query(OrderItem).filter(
-            and_(
-                OrderItem.id == item_id,
-                OrderItem.cart_id == cart.id
-            )
-        ).first()
-        
-        if not item:
-            return None
-        
-        self.db.delete(item)
-        self.db.commit()
-        
-        # Ažuriraj ukupnu cenu
-        self.db.refresh(cart)
-        cart.calculate_total()
-        self.db.commit()
-        self.db.refresh(cart)
-        
-        return cart
+        def mutate(cart: ShoppingCart):
+            return self.db.execute(delete_item_statement(cart.id, item_id)).scalar_one_or_none()
+
+        result = self._mutate_cart(user_id, mutate, expected_version)
+        return result[0] if result else None
     
     def update_cart_item(
         self, 
         user_id: int, 
         item_id: int, 
-        quantity: int
+        quantity: int,
+        expected_version: Optional[int] = None
     ) -> Optional[OrderItem]:
         """Ažuriraj količinu stavke u korpi"""
-        cart = self.get_or_create_cart(user_id)
-        
-        item = self.db.query(OrderItem).filter(
-            and_(
-                OrderItem.id == item_id,
-                OrderItem.cart_id == cart.id
-            )
-        ).first()
-        
-        if not item:
-            return None
-        
-        item.quantity = quantity
-        item.calculate_price()
+        def mutate(cart: ShoppingCart):
+            return self.db.scalars(
+                update_item_quantity_statement(cart.id, item_id, quantity),
+                execution_options={"populate_existing": True, "synchronize_session": False}
+            ).one_or_none()
+
+        result = self._mutate_cart(user_id, mutate, expected_version)
+        return result[1] if result else None
+    
+    def _mutate_cart(self, user_id: int, mutate, expected_version: Optional[int] = None):
+        """
+        Izvrši izmenu korpe u jednoj transakciji
         
-        self.db.commit()
+        mutate(cart) menja stavke i vraća rezultat (None ako stavka ne postoji).
+        Ukupna cena se računa u SQL-u, a verzija korpe se proverava i povećava
+        istom UPDATE ... RETURNING naredbom. Ako klijent nije prosledio verziju,
+        konflikt sa paralelnom izmenom se rešava ponovnim pokušajem. Verzija
+        prazne virtuelne korpe (EMPTY_CART_VERSION) važi samo dok korpa ne postoji.
         
-        # Ažuriraj ukupnu cenu korpe
-        cart.calculate_total()
-        self.db.commit()
+        Returns:
+            (cart, result) ili None ako mutate nije našao stavku
+        """
+        attempts = 1 if expected_version is not None else CART_MUTATION_ATTEMPTS
         
-        self.db.refresh(item)
-        return item
+        for attempt in range(attempts):
+            cart = self._find_pending_cart(user_id)
+            if cart and expected_version == EMPTY_CART_VERSION:
+                # Klijent je video praznu virtuelnu korpu, a korpa je u međuvremenu kreirana
+                raise CartConflictError(cart.id, expected_version)
+            if not cart:
+                cart = ShoppingCart(user_id=user_id, status=OrderStatus.PENDING)
+                self.db.add(cart)
+                self.db.flush()
+            
+            version = cart.version if expected_version in (None, EMPTY_CART_VERSION) else expected_version
+            
+            try:
+                result = mutate(cart)
+                if result is None:
+                    self.db.rollback()
+                    return None
+                
+                updated_cart = self.db.scalars(
+                    bump_cart_statement(cart.id, version),
+                    execution_options={"populate_existing": True, "synchronize_session": False}
+                ).one_or_none()
+                
+                if updated_cart is None:
+                    raise CartConflictError(cart.id, expected_version)
+                
+                self.db.commit()
+            except CartConflictError:
+                self.db.rollback()
+                if attempt == attempts - 1:
+                    raise
+                continue
+            
+            cart_cache.invalidate(user_id)
+            session_router.mark_write(user_id)
+            
+            # Stavke se učitavaju ponovo jer su izmenjene direktnim SQL naredbama
+            self.db.refresh(updated_cart, ["items"])
+            return updated_cart, result
     
-    def get_cart(self, user_id: int) -> ShoppingCart:
-        """Dobij korpu korisnika"""
-        return self.get_or_create_cart(user_id)
+    def _find_pending_cart(self, user_id: int, load_items: bool = False) -> Optional[ShoppingCart]:
+        """
+        Dobij aktivnu (PENDING) korpu korisnika bez kreiranja nove
+        load_items=True učitava stavke odmah (za odgovor); izmene korpe ih
+        učitavaju tek posle izmene
+        """
+        query = self.db.query(ShoppingCart).filter(
+            and_(
+                ShoppingCart.user_id == user_id,
+                ShoppingCart.status == OrderStatus.PENDING
+            )
+        )
+        if load_items:
+            query = query.options(selectinload(ShoppingCart.items))
+        return query.first()
+    
+    def get_cart(self, user_id: int) -> Optional[ShoppingCart]:
+        """Dobij aktivnu korpu korisnika (None ako još ne postoji)"""
+        return self._find_pending_cart(user_id, load_items=True)
     
     def clear_cart(self, user_id: int) -> ShoppingCart:
         """Isprazni korpu"""
-        cart = self.get_or_create_cart(user_id)
-        
-        # Obriši sve stavke
-        self.db.query(OrderItem).filter(OrderItem.cart_id == cart.id).delete()
-        
-        cart.total_price = 0.0
-        self.db.commit()
-        self.db.refresh(cart)
-        
+        def mutate(cart: ShoppingCart):
+            self.db.execute(delete_all_items_statement(cart.id))
+            return True
+
+        cart, _ = self._mutate_cart(user_id, mutate)
         return cart
     
-    async def checkout(
+    def enqueue_checkout(
         self, 
         user_id: int, 
-        cart_id: int
-    ) -> Tuple[bool, Optional[List[TourPurchaseToken]], Optional[str], Optional[str]]:
+        cart_id: int, 
+        transaction_id: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
         """
-        Checkout proces sa SAGA pattern-om
+        Asinhroni checkout - korpa se zaključava, a SAGA se stavlja u red
+        Transakcija i posao se upisuju jednim commit-om
         
         Returns:
-            (success, tokens, transaction_id, error_message)
+            (transaction_id, error_message)
+        """
+        cart, error = self._lock_cart_for_checkout(user_id, cart_id)
+        if error:
+            return None, error
+        
+        transaction_id = transaction_id or new_transaction_id()
+        self.db.add(SagaTransaction(
+            transaction_id=transaction_id,
+            cart_id=cart.id,
+            user_id=user_id,
+            status=OrderStatus.PENDING,
+            current_step="queued"
+        ))
+        self.db.add(CheckoutJob(
+            transaction_id=transaction_id,
+            cart_id=cart.id,
+            user_id=user_id
+        ))
+        
+        try:
+            self.db.commit()
+        except StaleDataError:
+            self.db.rollback()
+            return None, CART_CHANGED_DURING_CHECKOUT
+        
+        cart_cache.invalidate(user_id)
+        session_router.mark_write(user_id)
+        return transaction_id, None
+    
+    def _lock_cart_for_checkout(self, user_id: int, cart_id: int) -> Tuple[Optional[ShoppingCart], Optional[str]]:
         """
+        Proveri korpu i prebaci je u PROCESSING (bez commit-a)
+        Verzija korpe sprečava da paralelna izmena stavki prođe neprimećeno
         
-        # Dobij korpu
-        cart = self.db.query(ShoppingCart).filter(
+        Returns:
+            (cart, error_message)
+        """
+        cart = self.db.query(ShoppingCart).options(
+            selectinload(ShoppingCart.items)
+        ).filter(
             and_(
                 ShoppingCart.id == cart_id,
                 ShoppingCart.user_id == user_id
@@ -184,53 +263,159 @@ class PurchaseService:
         ).first()
         
         if not cart:
-            return False, None, None, "Cart not found"
+            return None, "Cart not found"
         
         # Allow retry if cart is in FAILED status by resetting it to PENDING
         if cart.status == OrderStatus.FAILED:
             cart.status = OrderStatus.PENDING
-            self.db.commit()
         
         if cart.status != OrderStatus.PENDING:
-            return False, None, None, f"Cart already processed (status: {cart.status})"
+            return None, f"Cart already processed (status: {cart.status})"
         
         if not cart.items:
-            return False, None, None, "Cart is empty"
+            return None, "Cart is empty"
         
-        # Pokreni SAGA transakciju
         cart.status = OrderStatus.PROCESSING
-        self.db.commit()
-        
-        orchestrator = SagaOrchestrator(self.db)
-        success, tokens, error = await orchestrator.execute_checkout_saga(cart, user_id)
-        
-        transaction_id = orchestrator.saga_transaction.transaction_id if orchestrator.saga_transaction else None
-        
-        return success, tokens, transaction_id, error
+        return cart, None
     
-    def get_user_tokens(self, user_id: int) -> List[TourPurchaseToken]:
-        """Dobij sve tokene korisnika (kupljene ture)"""
-        return self.db.query(TourPurchaseToken).filter(
+    def get_user_tokens(
+        self, 
+        user_id: int, 
+        limit: Optional[int] = None, 
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[TourPurchaseToken]:
+        """
+        Dobij tokene korisnika (kupljene ture), najnoviji prvi
+        Keyset paginacija po (purchased_at, id) - after je pozicija poslednjeg reda prethodne strane
+        """
+        query = self.db.query(TourPurchaseToken).options(
+            raiseload("*")
+        ).filter(
+            TourPurchaseToken.user_id == user_id
+        )
+        if after is not None:
+            query = query.filter(tuple_(TourPurchaseToken.purchased_at, TourPurchaseToken.id) < after)
+        query = query.order_by(TourPurchaseToken.purchased_at.desc(), TourPurchaseToken.id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+    
+    def get_user_tokens_version(self, user_id: int) -> Tuple[int, Optional[int]]:
+        """Verzija istorije tokena (broj, poslednji ID) - tokeni se samo dodaju ili brišu"""
+        return tuple(self.db.query(
+            func.count(TourPurchaseToken.id),
+            func.max(TourPurchaseToken.id)
+        ).filter(
             TourPurchaseToken.user_id == user_id
-        ).order_by(TourPurchaseToken.purchased_at.desc()).all()
+        ).one())
     
     def get_token_by_id(self, token_id: int, user_id: int) -> Optional[TourPurchaseToken]:
         """Dobij specifičan token"""
-        return self.db.query(TourPurchaseToken).filter(
+        return self.db.query(TourPurchaseToken).options(
+            raiseload("*")
+        ).filter(
             and_(
                 TourPurchaseToken.id == token_id,
                 TourPurchaseToken.user_id == user_id
             )
         ).first()
     
-    def get_saga_transaction(self, transaction_id: str) -> Optional[SagaTransaction]:
-        """Dobij SAGA transakciju po ID-u"""
-        return self.db.query(SagaTransaction).filter(
+    def get_saga_transaction(self, transaction_id: str, refresh: bool = False) -> Optional[SagaTransaction]:
+        """
+        Dobij SAGA transakciju po ID-u
+        refresh=True ponovo učitava red i događaje (za long-poll u istoj sesiji),
+        inače se događaji ne učitavaju
+        """
+        query = self.db.query(SagaTransaction).filter(
             SagaTransaction.transaction_id == transaction_id
-        ).first()
+        )
+        if refresh:
+            query = query.options(selectinload(SagaTransaction.events)).populate_existing()
+        else:
+            query = query.options(raiseload(SagaTransaction.events))
+        transaction = query.first()
+        if transaction is not None:
+            return transaction
+        
+        # Stare završene transakcije su u arhivi (app/services/saga_archive.py)
+        archived = self.db.query(SagaTransactionArchive).filter(
+            SagaTransactionArchive.transaction_id == transaction_id
+        )
+        if refresh:
+            archived = archived.options(selectinload(SagaTransactionArchive.events))
+        else:
+            archived = archived.options(raiseload(SagaTransactionArchive.events))
+        return archived.first()
+    
+    def get_saga_events_since(self, saga_id: int, after_event_id: int) -> Tuple[List[SagaEvent], Optional[OrderStatus]]:
+        """Dobij nove događaje SAGA transakcije i njen trenutni status"""
+        events = self.db.query(SagaEvent).filter(
+            and_(
+                SagaEvent.saga_id == saga_id,
+                SagaEvent.id > after_event_id
+            )
+        ).order_by(SagaEvent.id).all()
+        
+        saga_status = self.db.query(SagaTransaction.status).filter(
+            SagaTransaction.id == saga_id
+        ).scalar()
+        
+        if saga_status is None:
+            # Transakcija je arhivirana (i završena) - događaji su u arhivi
+            events = self.db.query(SagaEventArchive).filter(
+                and_(
+                    SagaEventArchive.saga_id == saga_id,
+                    SagaEventArchive.id > after_event_id
+                )
+            ).order_by(SagaEventArchive.id).all()
+            saga_status = self.db.query(SagaTransactionArchive.status).filter(
+                SagaTransactionArchive.id == saga_id
+            ).scalar()
+        
+        return events, saga_status
+    
+    def get_user_saga_transactions(
+        self, 
+        user_id: int, 
+        limit: Optional[int] = None, 
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[SagaTransaction]:
+        """
+        Dobij SAGA transakcije korisnika, najnovije prve
+        Keyset paginacija po (created_at, id)
+        
+        Arhiva sadrži samo starije završene transakcije, pa se čita tek
+        kada aktivna tabela nema dovoljno redova za stranu.
+        """
+        transactions = self._user_saga_page(SagaTransaction, user_id, limit, after)
+        if limit is not None and len(transactions) >= limit:
+            return transactions
+        
+        if transactions:
+            last = transactions[-1]
+            after = (last.created_at, last.id)
+        remaining = None if limit is None else limit - len(transactions)
+        return transactions + self._user_saga_page(SagaTransactionArchive, user_id, remaining, after)
+    
+    def _user_saga_page(self, model, user_id: int, limit: Optional[int], after: Optional[Tuple[datetime, int]]) -> list:
+        query = self.db.query(model).options(
+            selectinload(model.events)
+        ).filter(
+            model.user_id == user_id
+        )
+        if after is not None:
+            query = query.filter(tuple_(model.created_at, model.id) < after)
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
     
-    def get_user_saga_transactions(self, user_id: int) -> List[SagaTransaction]:
-        """Dobij sve SAGA transakcije korisnika"""
-        return self.db.query(SagaTransaction).filter(
+    def get_user_saga_transactions_version(self, user_id: int) -> Tuple[int, Optional[int], Optional[datetime]]:
+        """Verzija istorije transakcija (broj, poslednji ID, poslednja izmena)"""
+        return tuple(self.db.query(
+            func.count(SagaTransaction.id),
+            func.max(SagaTransaction.id),
+            func.max(SagaTransaction.updated_at)
+        ).filter(
             SagaTransaction.user_id == user_id
-        ).order_by(SagaTransaction.created_at.desc()).all()
+        ).one())
@@ -0,0 +1,124 @@
+"""
+Saga Archive - Premeštanje starih završenih SAGA transakcija u arhivu
+
+Završene (COMPLETED/FAILED/CANCELLED) transakcije koje se nisu menjale
+saga_archive_after_days dana se sa svojim događajima premeštaju u
+saga_transactions_archive / saga_events_archive. Svaka serija je kratka
+transakcija (FOR UPDATE SKIP LOCKED, INSERT ... SELECT, DELETE), pa nema
+dugih zaključavanja i više replika može da radi istovremeno.
+
+Aktivna tabela ostaje mala; PurchaseService čitanja po transaction_id i
+istorija korisnika padaju na arhivu kada red nije u aktivnoj tabeli.
+Ručno pokretanje: python -m app.services.saga_archive
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.purchase import (
+    utcnow,
+    SagaTransaction, SagaEvent, SagaTransactionArchive, SagaEventArchive, OrderStatus
+)
+from app.observability import saga_archived_total
+
+TERMINAL_STATUSES = (OrderStatus.COMPLETED, OrderStatus.FAILED, OrderStatus.CANCELLED)
+
+_SAGA_COLUMNS = [
+    "id", "transaction_id", "cart_id", "user_id", "status", "current_step",
+    "steps_completed", "compensation_log", "error_message",
+    "created_at", "updated_at", "completed_at"
+]
+_EVENT_COLUMNS = ["id", "saga_id", "step", "event", "detail", "duration_ms", "created_at"]
+
+
+class SagaArchiver:
+    """Arhiviranje završenih SAGA transakcija u serijama"""
+
+    def __init__(
+        self,
+        db: Session,
+        batch_size: int = settings.saga_archive_batch_size,
+        batch_pause_seconds: float = settings.saga_archive_batch_pause_seconds
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch_pause_seconds = batch_pause_seconds
+
+    def archive_older_than(self, days: int = settings.saga_archive_after_days, max_batches: Optional[int] = None) -> Dict[str, int]:
+        """Arhiviraj seriju po seriju dok ima kandidata (ili do max_batches serija)"""
+        cutoff = utcnow() - timedelta(days=days)
+        totals = {"sagas": 0, "events": 0, "batches": 0}
+
+        while max_batches is None or totals["batches"] < max_batches:
+            sagas, events = self.archive_batch(cutoff)
+            if not sagas:
+                break
+            totals["sagas"] += sagas
+            totals["events"] += events
+            totals["batches"] += 1
+            if sagas < self.batch_size:
+                break
+            # Pauza između serija ostavlja prostor checkout upisima
+            time.sleep(self.batch_pause_seconds)
+
+        return totals
+
+    def archive_batch(self, cutoff: datetime):
+        """
+        Premesti jednu seriju u jednoj transakciji
+        Returns:
+            (broj transakcija, broj događaja)
+        """
+        try:
+            ids = self.db.scalars(
+                select(SagaTransaction.id).where(
+                    and_(
+                        SagaTransaction.status.in_(TERMINAL_STATUSES),
+                        SagaTransaction.updated_at < cutoff
+                    )
+                ).order_by(SagaTransaction.id).limit(self.batch_size).with_for_update(skip_locked=True)
+            ).all()
+            if not ids:
+                self.db.rollback()
+                return 0, 0
+
+            sagas = SagaTransaction.__table__
+            events = SagaEvent.__table__
+
+            self.db.execute(insert(SagaTransactionArchive).from_select(
+                _SAGA_COLUMNS,
+                select(*(sagas.c[name] for name in _SAGA_COLUMNS)).where(sagas.c.id.in_(ids))
+            ))
+            event_count = self.db.execute(insert(SagaEventArchive).from_select(
+                _EVENT_COLUMNS,
+                select(*(events.c[name] for name in _EVENT_COLUMNS)).where(events.c.saga_id.in_(ids))
+            )).rowcount
+
+            self.db.execute(delete(events).where(events.c.saga_id.in_(ids)))
+            self.db.execute(delete(sagas).where(sagas.c.id.in_(ids)))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        saga_archived_total.inc(len(ids))
+        return len(ids), max(event_count, 0)
+
+
+def archive_sagas_job() -> Dict[str, int]:
+    """Periodični posao (app/core/scheduler.py)"""
+    db = SessionLocal()
+    try:
+        return SagaArchiver(db).archive_older_than()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print(archive_sagas_job())
@@ -0,0 +1,246 @@
+"""
+Sales Rollups - Inkrementalni agregati prodaje po turi i po danu
+
+tour_sales_rollups (tour_id) i tour_sales_daily (tour_id, day) čuvaju broj
+prodatih tokena i prihod. SAGA ih ažurira u istoj transakciji u kojoj
+upisuje tokene (increment_statements) odnosno ih briše pri kompenzaciji
+(decrement_statements), pa izveštaji čitaju samo agregate.
+
+rebuild() ponovo računa agregate iz tokena u serijama tura (GROUP BY u
+bazi, INSERT ... SELECT po seriji) - za inicijalno punjenje i popravku.
+Pokretanje: python -m app.services.sales_rollups
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.purchase import TourPurchaseToken, TourSalesRollup, TourSalesDaily, OrderStatus, utcnow
+from app.services.cart_statements import insert_for_dialect
+
+REBUILD_BATCH_SIZE = 500
+
+_rollups = TourSalesRollup.__table__
+_daily = TourSalesDaily.__table__
+
+
+def _aggregate(tokens: Iterable[TourPurchaseToken]):
+    """Zbir tokena po turi (naziv, broj, prihod) i po (tura, dan) (broj, prihod)"""
+    per_tour: Dict[int, List] = {}
+    per_day: Dict[Tuple[int, date], List] = defaultdict(lambda: [0, 0.0])
+    for token in tokens:
+        if token.is_active != OrderStatus.COMPLETED:
+            continue
+        tour = per_tour.setdefault(token.tour_id, [token.tour_name, 0, 0.0])
+        tour[1] += 1
+        tour[2] += token.purchase_price
+        day = per_day[(token.tour_id, token.purchased_at.date())]
+        day[0] += 1
+        day[1] += token.purchase_price
+    return per_tour, per_day
+
+
+def increment_statements(dialect_name: str, tokens: Iterable[TourPurchaseToken]) -> list:
+    """
+    Višeredni INSERT ... ON CONFLICT DO UPDATE za nove tokene
+    (tokeni moraju imati postavljen purchased_at)
+    """
+    per_tour, per_day = _aggregate(tokens)
+    if not per_tour:
+        return []
+
+    now = utcnow()
+    insert_ = insert_for_dialect(dialect_name)
+
+    tour_stmt = insert_(TourSalesRollup).values([
+        {"tour_id": tour_id, "tour_name": name, "purchase_count": count, "revenue": revenue, "updated_at": now}
+        for tour_id, (name, count, revenue) in per_tour.items()
+    ])
+    tour_stmt = tour_stmt.on_conflict_do_update(
+        index_elements=[TourSalesRollup.tour_id],
+        set_={
+            "tour_name": tour_stmt.excluded.tour_name,
+            "purchase_count": TourSalesRollup.purchase_count + tour_stmt.excluded.purchase_count,
+            "revenue": TourSalesRollup.revenue + tour_stmt.excluded.revenue,
+            "updated_at": tour_stmt.excluded.updated_at,
+        }
+    )
+
+    day_stmt = insert_(TourSalesDaily).values([
+        {"tour_id": tour_id, "day": day, "purchase_count": count, "revenue": revenue}
+        for (tour_id, day), (count, revenue) in per_day.items()
+    ])
+    day_stmt = day_stmt.on_conflict_do_update(
+        index_elements=[TourSalesDaily.tour_id, TourSalesDaily.day],
+        set_={
+            "purchase_count": TourSalesDaily.purchase_count + day_stmt.excluded.purchase_count,
+            "revenue": TourSalesDaily.revenue + day_stmt.excluded.revenue,
+        }
+    )
+
+    return [tour_stmt, day_stmt]
+
+
+def decrement_statements(tokens: Iterable[TourPurchaseToken]) -> List[Tuple[object, List[dict]]]:
+    """
+    UPDATE (executemany) koji oduzima kompenzovane tokene
+    Returns:
+        [(statement, parametri)] - izvršava se sa db.execute(statement, parametri)
+    """
+    per_tour, per_day = _aggregate(tokens)
+    if not per_tour:
+        return []
+
+    tour_stmt = update(_rollups).where(
+        _rollups.c.tour_id == bindparam("b_tour_id")
+    ).values(
+        purchase_count=_rollups.c.purchase_count - bindparam("b_count"),
+        revenue=_rollups.c.revenue - bindparam("b_revenue"),
+        updated_at=utcnow()
+    )
+    day_stmt = update(_daily).where(
+        and_(
+            _daily.c.tour_id == bindparam("b_tour_id"),
+            _daily.c.day == bindparam("b_day")
+        )
+    ).values(
+        purchase_count=_daily.c.purchase_count - bindparam("b_count"),
+        revenue=_daily.c.revenue - bindparam("b_revenue")
+    )
+
+    return [
+        (tour_stmt, [
+            {"b_tour_id": tour_id, "b_count": count, "b_revenue": revenue}
+            for tour_id, (_, count, revenue) in per_tour.items()
+        ]),
+        (day_stmt, [
+            {"b_tour_id": tour_id, "b_day": day, "b_count": count, "b_revenue": revenue}
+            for (tour_id, day), (count, revenue) in per_day.items()
+        ]),
+    ]
+
+
+class SalesRollupService:
+    """Izveštaji i ponovna izgradnja agregata prodaje"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def tour_sales(
+        self,
+        limit: int,
+        order_by: str = "revenue",
+        tour_ids: Optional[List[int]] = None
+    ) -> List[TourSalesRollup]:
+        """Prodaja po turi - čita samo tour_sales_rollups"""
+        query = self.db.query(TourSalesRollup).filter(TourSalesRollup.purchase_count > 0)
+        if tour_ids:
+            query = query.filter(TourSalesRollup.tour_id.in_(tour_ids))
+        sort_column = TourSalesRollup.purchase_count if order_by == "count" else TourSalesRollup.revenue
+        return query.order_by(sort_column.desc(), TourSalesRollup.tour_id).limit(limit).all()
+
+    def daily_sales(
+        self,
+        date_from: date,
+        date_to: date,
+        tour_id: Optional[int] = None,
+        tour_ids: Optional[List[int]] = None
+    ) -> List[TourSalesDaily]:
+        """Prodaja po danu (i turi) u opsegu [date_from, date_to]"""
+        query = self.db.query(TourSalesDaily).filter(
+            and_(
+                TourSalesDaily.day >= date_from,
+                TourSalesDaily.day <= date_to,
+                TourSalesDaily.purchase_count > 0
+            )
+        )
+        if tour_id is not None:
+            query = query.filter(TourSalesDaily.tour_id == tour_id)
+        if tour_ids is not None:
+            query = query.filter(TourSalesDaily.tour_id.in_(tour_ids))
+        return query.order_by(TourSalesDaily.day, TourSalesDaily.tour_id).all()
+
+    def rebuild(self, batch_size: int = REBUILD_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Ponovo izračunaj agregate iz tokena, seriju po seriju tura
+        Svaka serija (opseg tour_id) je jedna transakcija: brisanje agregata
+        opsega i INSERT ... SELECT ... GROUP BY nad tokenima tog opsega
+        """
+        active = TourPurchaseToken.is_active == OrderStatus.COMPLETED
+        last_tour_id: Optional[int] = None
+        tours = batches = 0
+
+        while True:
+            query = select(TourPurchaseToken.tour_id).where(active)
+            if last_tour_id is not None:
+                query = query.where(TourPurchaseToken.tour_id > last_tour_id)
+            tour_ids = self.db.scalars(
+                query.distinct().order_by(TourPurchaseToken.tour_id).limit(batch_size)
+            ).all()
+            if not tour_ids:
+                break
+
+            upper = tour_ids[-1]
+            self._rebuild_range(last_tour_id, upper)
+            self.db.commit()
+
+            last_tour_id = upper
+            tours += len(tour_ids)
+            batches += 1
+
+        # Agregati tura koje više nemaju aktivnih tokena
+        self._delete_range(last_tour_id, None)
+        self.db.commit()
+
+        return {"tours": tours, "batches": batches}
+
+    def _rebuild_range(self, lower: Optional[int], upper: int):
+        self._delete_range(lower, upper)
+
+        in_range = [TourPurchaseToken.is_active == OrderStatus.COMPLETED, TourPurchaseToken.tour_id <= upper]
+        if lower is not None:
+            in_range.append(TourPurchaseToken.tour_id > lower)
+
+        self.db.execute(insert(TourSalesRollup).from_select(
+            ["tour_id", "tour_name", "purchase_count", "revenue", "updated_at"],
+            select(
+                TourPurchaseToken.tour_id,
+                func.max(TourPurchaseToken.tour_name),
+                func.count(TourPurchaseToken.id),
+                func.sum(TourPurchaseToken.purchase_price),
+                func.current_timestamp()
+            ).where(*in_range).group_by(TourPurchaseToken.tour_id)
+        ))
+
+        day = func.date(TourPurchaseToken.purchased_at)
+        self.db.execute(insert(TourSalesDaily).from_select(
+            ["tour_id", "day", "purchase_count", "revenue"],
+            select(
+                TourPurchaseToken.tour_id,
+                day,
+                func.count(TourPurchaseToken.id),
+                func.sum(TourPurchaseToken.purchase_price)
+            ).where(*in_range).group_by(TourPurchaseToken.tour_id, day)
+        ))
+
+    def _delete_range(self, lower: Optional[int], upper: Optional[int]):
+        for table in (_rollups, _daily):
+            conditions = []
+            if lower is not None:
+                conditions.append(table.c.tour_id > lower)
+            if upper is not None:
+                conditions.append(table.c.tour_id <= upper)
+            self.db.execute(delete(table).where(*conditions))
+
+
+if __name__ == "__main__":
+    from app.core.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(SalesRollupService(db).rebuild())
+    finally:
+        db.close()
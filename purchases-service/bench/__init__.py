@@ -0,0 +1 @@
+# Benchmark checkout-a sa lokalnim fake-ovima downstream servisa
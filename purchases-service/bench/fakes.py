@@ -0,0 +1,157 @@
+"""
+Lokalni fake-ovi downstream servisa za benchmark checkout-a
+
+- HTTP (stakeholders + followers + tours HTTP fallback) na jednom portu:
+    GET  /users/{id}
+    POST /api/users/{id}/stats
+    POST /api/followers/activity
+    GET  /tours/{id}
+    POST /api/tours/release
+- Tours gRPC: VerifyTourExists i ReserveTours
+
+Svaki fake ima podesivu latenciju (ms, sa jitter-om) i procenat grešaka.
+Greška je HTTP 503 odnosno gRPC UNAVAILABLE.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from concurrent import futures
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import grpc
+
+
+@dataclass
+class FaultProfile:
+    """Latencija i greške jednog fake servisa"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    calls: int = 0
+    errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def apply(self) -> bool:
+        """Odspavaj latenciju i vrati True ako poziv treba da ne uspe"""
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        failed = random.random() < self.error_rate
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+        return failed
+
+    def summary(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+_USER_PATH = re.compile(r"^/users/(\d+)$")
+_USER_STATS_PATH = re.compile(r"^/api/users/(\d+)/stats$")
+_TOUR_PATH = re.compile(r"^/tours/(\d+)$")
+
+
+class FakeHttpServices:
+    """Stakeholders, followers i Tours HTTP API na jednom lokalnom portu"""
+
+    def __init__(self, profiles: Dict[str, FaultProfile], host: str = "127.0.0.1", port: int = 0):
+        self.profiles = profiles
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if match := _USER_PATH.match(self.path):
+                    return services._respond(self, "stakeholders", {"id": int(match.group(1)), "is_active": True})
+                if match := _TOUR_PATH.match(self.path):
+                    tour_id = int(match.group(1))
+                    return services._respond(self, "tours", {
+                        "tour": {"id": tour_id, "name": f"Tour {tour_id}", "price": 10.0, "status": "published"}
+                    })
+                self._send(404, {"detail": "Not found"})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if _USER_STATS_PATH.match(self.path):
+                    return services._respond(self, "stakeholders", {"ok": True})
+                if self.path == "/api/followers/activity":
+                    return services._respond(self, "followers", {"ok": True})
+                if self.path == "/api/tours/release":
+                    return services._respond(self, "tours", {"ok": True})
+                self._send(404, {"detail": "Not found"})
+
+            def _send(self, code: int, body: dict):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread: Optional[threading.Thread] = None
+
+    def _respond(self, handler, service: str, body: dict):
+        if self.profiles[service].apply():
+            return handler._send(503, {"detail": f"{service} unavailable (injected)"})
+        handler._send(200, body)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeToursGrpc:
+    """Tours gRPC servis (VerifyTourExists, ReserveTours)"""
+
+    def __init__(self, profile: FaultProfile, host: str = "127.0.0.1", port: int = 0, workers: int = 32):
+        from proto import tours_pb2, tours_pb2_grpc
+
+        class Servicer(tours_pb2_grpc.ToursServiceServicer):
+            def VerifyTourExists(self, request, context):
+                if profile.apply():
+                    context.abort(grpc.StatusCode.UNAVAILABLE, "tours unavailable (injected)")
+                return tours_pb2.VerifyTourResponse(
+                    exists=True,
+                    is_published=True,
+                    name=f"Tour {request.tour_id}",
+                    price=10.0
+                )
+
+            def ReserveTours(self, request, context):
+                if profile.apply():
+                    context.abort(grpc.StatusCode.UNAVAILABLE, "tours unavailable (injected)")
+                return tours_pb2.ReserveToursResponse(success=True)
+
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+        tours_pb2_grpc.add_ToursServiceServicer_to_server(Servicer(), self.server)
+        bound_port = self.server.add_insecure_port(f"{host}:{port}")
+        self.addr = f"{host}:{bound_port}"
+
+    def start(self):
+        self.server.start()
+
+    def stop(self):
+        self.server.stop(grace=None)
@@ -0,0 +1,98 @@
+"""
+Zajednička podešavanja testova purchases servisa
+
+Testovi rade nad privremenom SQLite bazom (sinhroni engine + aiosqlite).
+Downstream servisi nisu dostupni - testovi zamenjuju pozive gde su potrebni.
+Okruženje se postavlja pre prvog importa `app`, jer se settings čitaju pri importu.
+"""
+
+import asyncio
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="purchases-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_db_dir}/purchases.db",
+    "JWT_SECRET": "test-secret",
+    "PURCHASE_TOKEN_ALLOW_EPHEMERAL_KEY": "true",
+    "STAKEHOLDERS_SERVICE_URL": "http://127.0.0.1:1",
+    "FOLLOWERS_SERVICE_URL": "http://127.0.0.1:1",
+    "TOURS_SERVICE_URL": "http://127.0.0.1:1",
+    "TOURS_GRPC_ADDR": "127.0.0.1:1",
+})
+
+import httpx
+import pytest
+
+from app.core.database import Base, SessionLocal, async_engine, engine
+from app.core.security import create_access_token
+from app.models.purchase import ShoppingCart, OrderItem, OrderStatus
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Prazna šema za svaki test"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture
+def run():
+    """Izvršava korutinu u novom loop-u; async pool se zatvara u istom loop-u"""
+    def run_coroutine(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run_coroutine
+
+
+@pytest.fixture
+def make_cart():
+    """PENDING korpa sa stavkama [(tour_id, price), ...]; vraća id korpe"""
+    def create(user_id: int, items=((1, 10.0), (2, 15.0))) -> int:
+        db = SessionLocal()
+        try:
+            cart = ShoppingCart(
+                user_id=user_id,
+                status=OrderStatus.PENDING,
+                total_price=sum(price for _, price in items)
+            )
+            db.add(cart)
+            db.flush()
+            db.add_all(
+                OrderItem(
+                    cart_id=cart.id, tour_id=tour_id, tour_name=f"Tour {tour_id}",
+                    tour_price=price, price=price, quantity=1
+                )
+                for tour_id, price in items
+            )
+            db.commit()
+            return cart.id
+        finally:
+            db.close()
+    return create
+
+
+@pytest.fixture
+def api_client():
+    """httpx klijent nad purchase i reports ruterima (ASGI, bez mreže) - koristi se unutar `run`"""
+    from fastapi import FastAPI
+    from app.api.purchase import router
+    from app.api.reports import router as reports_router, guide_router
+
+    app = FastAPI()
+    for api_router in (router, reports_router, guide_router):
+        app.include_router(api_router)
+    return lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.fixture
+def auth_headers():
+    def headers(user_id: int, role: str = "TURISTA", **extra) -> dict:
+        token = create_access_token({"sub": str(user_id), "role": role})
+        return {"Authorization": f"Bearer {token}", **extra}
+    return headers
@@ -0,0 +1,52 @@
+"""If-Match verzija prazne virtuelne korpe (ETag "0") važi dok korpa ne postoji"""
+
+import pytest
+
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.services.async_purchase_service import AsyncPurchaseService
+from app.services.cart_cache import cart_cache
+from app.services.cart_statements import EMPTY_CART_VERSION, CartConflictError
+from app.services.purchase_service import PurchaseService
+
+
+@pytest.fixture
+def sync_service():
+    db = SessionLocal()
+    try:
+        yield PurchaseService(db)
+    finally:
+        db.close()
+
+
+def _add(user_id: int, tour_id: int, expected_version=None):
+    async def add():
+        async with AsyncSessionLocal() as db:
+            cart, _ = await AsyncPurchaseService(db).add_to_cart(
+                user_id, tour_id=tour_id, tour_name=f"Tour {tour_id}", tour_price=10.0,
+                expected_version=expected_version
+            )
+            return cart.version
+    return add()
+
+
+def test_first_add_with_empty_cart_etag_creates_cart(run, sync_service):
+    cart_cache.invalidate(11)
+    snapshot = sync_service.get_cart_snapshot(11)
+    assert snapshot.id is None and snapshot.version == EMPTY_CART_VERSION
+
+    version = run(_add(11, tour_id=1, expected_version=snapshot.version))
+
+    assert version > EMPTY_CART_VERSION
+    assert [item.tour_id for item in sync_service.get_cart(11).items] == [1]
+
+
+def test_empty_cart_etag_conflicts_once_cart_exists(run, sync_service):
+    version = run(_add(12, tour_id=1))
+
+    with pytest.raises(CartConflictError):
+        run(_add(12, tour_id=2, expected_version=EMPTY_CART_VERSION))
+    item_id = sync_service.get_cart(12).items[0].id
+    with pytest.raises(CartConflictError):
+        sync_service.update_cart_item(12, item_id, 3, expected_version=EMPTY_CART_VERSION)
+
+    assert run(_add(12, tour_id=2, expected_version=version)) == version + 1
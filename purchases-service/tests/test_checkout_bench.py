@@ -0,0 +1,47 @@
+"""Benchmark mora da se pokreće bez dodatnog podešavanja (smoke sa malim opterećenjem)"""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(
+    importlib.util.find_spec("proto.tours_pb2") is None,
+    reason="Tours proto moduli nisu generisani (videti Dockerfile)"
+)
+
+
+def test_checkout_bench_runs(tmp_path):
+    # Bez ključa za potpisivanje i bez ALLOW_EPHEMERAL - benchmark ih podešava sam
+    env = {
+        name: value for name, value in os.environ.items()
+        if not name.startswith("PURCHASE_TOKEN_") and name != "DATABASE_URL"
+    }
+    report = tmp_path / "report.json"
+
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "bench.checkout_bench",
+            "--database-url", f"sqlite:///{tmp_path / 'bench.db'}",
+            "--users", "4", "--items", "2", "--concurrency", "2",
+            "--stakeholders-latency-ms", "0", "--followers-latency-ms", "0", "--tours-latency-ms", "0",
+            "--report", str(report),
+        ],
+        cwd=SERVICE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+
+    assert result.returncode == 0, result.stderr
+    operations = json.loads(report.read_text())["operations"]
+    assert operations["cart.add"]["count"] == 8
+    assert operations["checkout"]["count"] == 4
+    assert all(op["errors"] == 0 for op in operations.values()), operations
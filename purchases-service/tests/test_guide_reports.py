@@ -0,0 +1,74 @@
+"""Vodič vidi izveštaje prodaje samo za svoje ture"""
+
+from datetime import date
+
+import httpx
+
+import app.api.reports as reports_module
+from app.core.database import SessionLocal
+from app.models.purchase import TourSalesDaily, TourSalesRollup
+
+GUIDE_ID = 31
+TODAY = date(2026, 10, 19)
+
+
+def _seed_rollups():
+    db = SessionLocal()
+    try:
+        for tour_id, count in ((1, 3), (2, 5), (3, 1)):
+            db.add(TourSalesRollup(tour_id=tour_id, tour_name=f"Tour {tour_id}", purchase_count=count, revenue=10.0 * count))
+            db.add(TourSalesDaily(tour_id=tour_id, day=TODAY, purchase_count=count, revenue=10.0 * count))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _tours_service(monkeypatch, tour_ids, status_code=200):
+    calls = []
+
+    async def request(breaker, method, url, timeout, **kwargs):
+        calls.append((url, kwargs["headers"]["Authorization"]))
+        return httpx.Response(status_code, json={"tours": [{"id": tour_id} for tour_id in tour_ids]})
+
+    monkeypatch.setattr(reports_module, "guarded_request", request)
+    return calls
+
+
+def _get(run, api_client, path, headers, **params):
+    async def flow():
+        async with api_client() as client:
+            return await client.get(path, headers=headers, params=params)
+    return run(flow())
+
+
+def test_guide_sees_only_own_tours(monkeypatch, run, api_client, auth_headers):
+    _seed_rollups()
+    calls = _tours_service(monkeypatch, [1, 3])
+    headers = auth_headers(GUIDE_ID, role="VODIC")
+
+    tours = _get(run, api_client, "/reports/guide/sales/tours", headers, tour_id=[2, 3])
+    daily = _get(run, api_client, "/reports/guide/sales/daily", headers, date_from=TODAY, date_to=TODAY)
+
+    assert [row["tour_id"] for row in tours.json()] == [3]
+    assert sorted(row["tour_id"] for row in daily.json()) == [1, 3]
+    assert calls[0] == ("http://127.0.0.1:1/tours/my", headers["Authorization"])
+
+
+def test_guide_cannot_read_foreign_tour_or_admin_reports(monkeypatch, run, api_client, auth_headers):
+    _seed_rollups()
+    _tours_service(monkeypatch, [1])
+    headers = auth_headers(GUIDE_ID, role="VODIC")
+
+    foreign = _get(run, api_client, "/reports/guide/sales/daily", headers, date_from=TODAY, date_to=TODAY, tour_id=2)
+    admin = _get(run, api_client, "/reports/sales/tours", headers)
+    tourist = _get(run, api_client, "/reports/guide/sales/tours", auth_headers(32))
+
+    assert (foreign.status_code, admin.status_code, tourist.status_code) == (404, 403, 403)
+
+
+def test_guide_reports_fail_when_tours_service_errors(monkeypatch, run, api_client, auth_headers):
+    _tours_service(monkeypatch, [], status_code=500)
+
+    response = _get(run, api_client, "/reports/guide/sales/tours", auth_headers(GUIDE_ID, role="VODIC"))
+
+    assert response.status_code == 502
@@ -0,0 +1,66 @@
+"""Idempotency-Key na /checkout radi nad AsyncSession-om zahteva"""
+
+import app.saga.orchestrator as orchestrator_module
+from app.core.database import SessionLocal
+from app.models.purchase import IdempotencyKey, IdempotencyStatus, OutboxEvent
+from app.saga.orchestrator import SagaOrchestrator
+
+
+async def _ok(self, *args, **kwargs):
+    return True
+
+
+def _checkout_twice(run, api_client, auth_headers, user_id: int, cart_id: int):
+    async def flow():
+        async with api_client() as client:
+            headers = auth_headers(user_id, **{"Idempotency-Key": "checkout-1"})
+            first = await client.post("/checkout", json={"cart_id": cart_id}, headers=headers)
+            second = await client.post("/checkout", json={"cart_id": cart_id}, headers=headers)
+            return first, second
+    return run(flow())
+
+
+def _stored_key(user_id: int) -> IdempotencyKey:
+    db = SessionLocal()
+    try:
+        return db.query(IdempotencyKey).filter_by(user_id=user_id, key="checkout-1").one()
+    finally:
+        db.close()
+
+
+def test_repeated_checkout_replays_stored_response(monkeypatch, run, api_client, auth_headers, make_cart):
+    monkeypatch.setattr(SagaOrchestrator, "_validate_user", _ok)
+    monkeypatch.setattr(SagaOrchestrator, "_reserve_tours", _ok)
+    cart_id = make_cart(user_id=21)
+
+    first, second = _checkout_twice(run, api_client, auth_headers, 21, cart_id)
+
+    assert first.status_code == 200, first.text
+    assert second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert _stored_key(21).status == IdempotencyStatus.COMPLETED
+
+
+def test_failed_saga_response_is_stored_after_rollback(monkeypatch, run, api_client, auth_headers, make_cart):
+    monkeypatch.setattr(SagaOrchestrator, "_validate_user", _ok)
+    monkeypatch.setattr(SagaOrchestrator, "_reserve_tours", _ok)
+
+    async def release(self, cart):
+        pass
+
+    monkeypatch.setattr(SagaOrchestrator, "_compensate_reservations", release)
+    # Commit tokena pada - SAGA vraća sesiju (i zauzet ključ) u rollback
+    monkeypatch.setattr(
+        orchestrator_module,
+        "purchase_outbox_events",
+        lambda saga_id, user_id, count: [OutboxEvent(event_type=None, user_id=user_id, payload="{}")]
+    )
+    cart_id = make_cart(user_id=22)
+
+    first, second = _checkout_twice(run, api_client, auth_headers, 22, cart_id)
+
+    assert first.status_code == 400
+    assert (second.status_code, second.json()) == (400, first.json())
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert _stored_key(22).response_code == 400
@@ -0,0 +1,63 @@
+"""gRPC provera kupovine ne sme da vrati lažno "nije kupljeno" za token iz drugog procesa"""
+
+import importlib.util
+
+import pytest
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.purchase import OrderStatus, TourPurchaseToken
+from app.services.purchase_index import purchase_index
+
+pytestmark = pytest.mark.skipif(
+    importlib.util.find_spec("proto.purchases_pb2") is None,
+    reason="Purchases proto moduli nisu generisani (videti Dockerfile)"
+)
+
+
+@pytest.fixture
+def servicer():
+    from app.grpc.purchases_server import PurchasesServicer
+    return PurchasesServicer(AsyncSessionLocal, db_concurrency=2)
+
+
+@pytest.fixture
+def warm_index():
+    """Indeks učitan pre nego što je druga replika upisala token"""
+    db = SessionLocal()
+    try:
+        purchase_index.warm(db)
+    finally:
+        db.close()
+
+
+def _token_from_other_replica(user_id: int, tour_id: int, make_cart) -> int:
+    cart_id = make_cart(user_id, items=((tour_id, 10.0),))
+    db = SessionLocal()
+    try:
+        token = TourPurchaseToken(
+            token=f"T-{user_id}-{tour_id}", user_id=user_id, cart_id=cart_id, tour_id=tour_id,
+            tour_name=f"Tour {tour_id}", purchase_price=10.0, is_active=OrderStatus.COMPLETED
+        )
+        db.add(token)
+        db.commit()
+        return token.id
+    finally:
+        db.close()
+
+
+def test_index_miss_is_checked_in_database(run, servicer, warm_index, make_cart):
+    token_id = _token_from_other_replica(51, 7, make_cart)
+
+    entries = run(servicer._lookup_many(51, [7, 8]))
+
+    assert entries[7][0] == token_id
+    assert entries[8] is None
+    assert purchase_index.lookup(51, 7)[0] == token_id
+
+
+def test_index_only_lookup_when_fallback_disabled(monkeypatch, run, servicer, warm_index, make_cart):
+    monkeypatch.setattr(settings, "grpc_index_miss_db_fallback", False)
+    _token_from_other_replica(52, 7, make_cart)
+
+    assert run(servicer._lookup_many(52, [7])) == {7: None}
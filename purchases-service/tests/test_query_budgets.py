@@ -0,0 +1,124 @@
+"""
+Budžeti SQL naredbi (PURCHASE_QUERY_BUDGETS) za korpu i checkout
+
+Zahtevi prolaze kroz QueryBudgetMiddleware u strict modu - prekoračenje
+budžeta podiže QueryBudgetExceeded. Pored budžeta proverava se i tačan broj
+naredbi, da bi povećanje (npr. N+1) bilo vidljivo pre nego što dostigne budžet.
+"""
+
+import logging
+import re
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.purchase import PURCHASE_QUERY_BUDGETS, router
+from app.core.database import async_engine, engine
+from app.core.query_budget import QueryBudgetExceeded, QueryBudgetMiddleware, install_query_counter
+from app.grpc.tours_client import ToursGRPCClient
+from app.saga.orchestrator import SagaOrchestrator
+from app.services.cart_cache import cart_cache
+
+_BUDGET_LOG = re.compile(r"\[QUERY BUDGET\] (\w+ \S+): (\d+)/")
+
+
+async def _ok(self, *args, **kwargs):
+    return True
+
+
+@pytest.fixture
+def budget_client(monkeypatch):
+    monkeypatch.setattr(SagaOrchestrator, "_validate_user", _ok)
+    monkeypatch.setattr(SagaOrchestrator, "_reserve_tours", _ok)
+    monkeypatch.setattr(
+        ToursGRPCClient,
+        "verify_tour_exists",
+        lambda self, tour_id, timeout=None: (True, {"name": f"Tour {tour_id}", "price": 10.0, "is_published": True}, None)
+    )
+    install_query_counter(engine)
+    install_query_counter(async_engine.sync_engine)
+
+    app = FastAPI()
+    app.include_router(router)
+
+    def client(**overrides):
+        budgets = {f"{method} {path}": budget for (method, path), budget in PURCHASE_QUERY_BUDGETS.items()}
+        budgeted = QueryBudgetMiddleware(app, budgets={**budgets, **overrides}, strict=True)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=budgeted), base_url="http://test")
+    return client
+
+
+@pytest.fixture
+def statement_counts(caplog):
+    """Broj naredbi po zahtevu iz loga middleware-a: [("GET /cart", 2), ...]"""
+    caplog.set_level(logging.DEBUG, logger="app.core.query_budget")
+
+    def counts():
+        return [
+            (match.group(1), int(match.group(2)))
+            for record in caplog.records
+            if (match := _BUDGET_LOG.search(record.getMessage()))
+        ]
+    return counts
+
+
+def _shop(run, budget_client, auth_headers, user_id: int, tour_ids, checkout_headers=None):
+    headers = auth_headers(user_id)
+    cart_cache.invalidate(user_id)
+
+    async def flow():
+        async with budget_client() as client:
+            for tour_id in tour_ids:
+                response = await client.post("/cart/add", headers=headers, json={
+                    "tour_id": tour_id, "tour_name": f"Tour {tour_id}", "tour_price": 10.0
+                })
+                assert response.status_code == 201, response.text
+            cart = await client.get("/cart", headers=headers)
+            assert cart.status_code == 200, cart.text
+            response = await client.post(
+                "/checkout", headers={**headers, **(checkout_headers or {})}, json={"cart_id": cart.json()["id"]}
+            )
+            assert response.status_code == 200, response.text
+
+    run(flow())
+
+
+def test_cart_and_checkout_stay_within_budget(run, budget_client, auth_headers, statement_counts):
+    _shop(run, budget_client, auth_headers, user_id=41, tour_ids=(1, 2, 3))
+
+    assert statement_counts() == [
+        # Prvo dodavanje kreira korpu, sledeća je samo menjaju
+        ("POST /cart/add", 6),
+        ("POST /cart/add", 5),
+        ("POST /cart/add", 5),
+        ("GET /cart", 2),
+        ("POST /checkout", 25),
+    ]
+
+
+def test_checkout_statements_do_not_grow_per_request(run, budget_client, auth_headers, statement_counts):
+    _shop(run, budget_client, auth_headers, user_id=42, tour_ids=(1, 2, 3))
+    _shop(run, budget_client, auth_headers, user_id=43, tour_ids=(1, 2, 3))
+
+    checkouts = [count for endpoint, count in statement_counts() if endpoint == "POST /checkout"]
+    assert checkouts[0] == checkouts[1]
+
+
+def test_idempotent_checkout_within_budget(run, budget_client, auth_headers, statement_counts):
+    _shop(run, budget_client, auth_headers, user_id=44, tour_ids=(1, 2, 3), checkout_headers={"Idempotency-Key": "k-1"})
+
+    checkout = dict(statement_counts())["POST /checkout"]
+    assert checkout <= PURCHASE_QUERY_BUDGETS[("POST", "/checkout")]
+
+
+def test_exceeded_budget_fails_request_in_strict_mode(run, budget_client, auth_headers):
+    cart_cache.invalidate(45)
+
+    async def flow():
+        async with budget_client(**{"GET /cart": 0}) as client:
+            await client.get("/cart", headers=auth_headers(45))
+
+    with pytest.raises(QueryBudgetExceeded) as error:
+        run(flow())
+    assert (error.value.endpoint, error.value.budget) == ("GET /cart", 0)
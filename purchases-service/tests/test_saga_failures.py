@@ -0,0 +1,74 @@
+"""SAGA mora da završi u terminalnom stanju i kada korak padne na grešci baze"""
+
+import asyncio
+
+import app.saga.orchestrator as orchestrator_module
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.resilience import Deadline
+from app.models.purchase import (
+    OutboxEvent, OrderStatus, SagaEvent, SagaEventType, SagaTransaction, ShoppingCart, TourPurchaseToken
+)
+from app.saga.engine import SagaEngine, SagaStep
+from app.saga.orchestrator import SagaOrchestrator
+from app.services.async_purchase_service import AsyncPurchaseService
+
+
+async def _ok(self, *args, **kwargs):
+    return True
+
+
+def _checkout(user_id: int, cart_id: int):
+    async def checkout():
+        async with AsyncSessionLocal() as db:
+            return await AsyncPurchaseService(db).checkout(user_id, cart_id)
+    return checkout()
+
+
+def test_db_error_in_step_refunds_payment_and_fails_saga(monkeypatch, run, make_cart):
+    released = []
+
+    async def release(self, cart):
+        released.append(cart.id)
+
+    monkeypatch.setattr(SagaOrchestrator, "_validate_user", _ok)
+    monkeypatch.setattr(SagaOrchestrator, "_reserve_tours", _ok)
+    monkeypatch.setattr(SagaOrchestrator, "_compensate_reservations", release)
+    # Outbox red bez event_type - commit tokena pada na NOT NULL ograničenju
+    monkeypatch.setattr(
+        orchestrator_module,
+        "purchase_outbox_events",
+        lambda saga_id, user_id, count: [OutboxEvent(event_type=None, user_id=user_id, payload="{}")]
+    )
+    cart_id = make_cart(user_id=7)
+
+    success, tokens, transaction_id, error = run(_checkout(7, cart_id))
+
+    assert not success and tokens is None
+    assert released == [cart_id]
+    db = SessionLocal()
+    try:
+        saga = db.query(SagaTransaction).filter_by(transaction_id=transaction_id).one()
+        assert (saga.status, saga.current_step) == (OrderStatus.FAILED, "generate_tokens")
+        assert db.get(ShoppingCart, cart_id).status == OrderStatus.FAILED
+        assert db.query(TourPurchaseToken).count() == 0
+        compensated = {
+            event.step for event in db.query(SagaEvent).filter_by(saga_id=saga.id)
+            if event.event == SagaEventType.COMPENSATED
+        }
+        assert "process_payment" in compensated
+    finally:
+        db.close()
+
+
+def test_step_without_timeout_is_not_cancelled_by_deadline(run):
+    committed = []
+
+    async def write():
+        await asyncio.sleep(0.3)
+        committed.append(True)
+        return "written"
+
+    engine = SagaEngine([SagaStep("write", action=write)], deadline=Deadline(0.1))
+
+    assert run(engine.run()) == {"write": "written"}
+    assert committed == [True]
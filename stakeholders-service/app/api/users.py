@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_db, SessionLocal
 from app.services.user_service import UserService
 from app.schemas.user import (
     UserCreate, 
@@ -10,22 +11,22 @@ from app.schemas.user import (
     UserLoginResponse,
     UserProfileUpdate, 
     UserProfileUpdateResponse,
-    UserResponse
+    UserResponse,
+    UserRole as SchemaUserRole
 )
 from app.core.security import create_access_token, verify_token
-from app.models.user import User
-from datetime import timedelta
+from app.core.principal_cache import Principal, principal_cache
+from app.models.user import User, UserRole
+from datetime import datetime, timedelta
+from typing import List, Optional
+import json
 
 router = APIRouter()
 security = HTTPBearer()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency za dobijanje trenutno ulogovanog korisnika iz JWT tokena"""
-    token = credentials.credentials
+def _user_id_from_token(token: str) -> int:
+    """ID korisnika iz JWT tokena (401 ako token ne važi)"""
     payload = verify_token(token)
     
     if payload is None:
@@ -35,31 +36,54 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user_id: int = payload.get("sub")
-    if user_id is None:
+    try:
+        return int(payload.get("sub"))
+    except (TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Nevažeći token",
+            detail="Token ne sadrži user ID",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+def _load_principal(user_id: int, db: Session) -> Principal:
+    """Principal iz keša (ili baze); blokirani korisnici ne prolaze"""
+    principal = UserService(db).get_principal(user_id)
     
-    user_service = UserService(db)
-    user = user_service.get_user_by_id(user_id)
-    
-    if user is None:
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Korisnik nije pronađen",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    if principal.is_blocked:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Vaš nalog je blokiran"
+        )
+    
+    return principal
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Dependency za dobijanje trenutno ulogovanog korisnika iz JWT tokena
+    
+    Vraća principala (id, uloga, blokada) iz keša - bez upita u bazu na
+    vrućoj putanji. Ruta kojoj treba ceo profil ga učitava sama.
+    """
+    user_id = _user_id_from_token(credentials.credentials)
+    return _load_principal(user_id, db)
 
 
 def require_admin(
     authorization: str = Header(None),
     db: Session = Depends(get_db)
-) -> User:
+) -> Principal:
     """Proverava da li je korisnik admin preko Authorization headera"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -67,55 +91,41 @@ def require_admin(
             detail="Token nije prosleđen"
         )
     
-    token = authorization.replace("Bearer ", "")
-    payload = verify_token(token)
-    
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Nevažeći token"
-        )
+    user_id = _user_id_from_token(authorization.replace("Bearer ", ""))
+    principal = _load_principal(user_id, db)
     
-    user_id = payload.get("sub")
-    if not user_id:
+    if not principal.is_admin:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token ne sadrži user ID"
-        )
-    
-    user_service = UserService(db)
-    user = user_service.get_user_by_id(user_id)
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Korisnik nije pronađen"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Samo admin može izvršiti ovu akciju"
         )
     
-    if user.role.value != "admin":
+    return principal
+
+
+def _own_user_id(user_id: Optional[int], principal: Principal) -> int:
+    """user_id iz query parametra mora biti ulogovani korisnik (ili admin)"""
+    if user_id is None:
+        return principal.id
+    if user_id != principal.id and not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Samo admin može izvršiti ovu akciju"
+            detail="Nije dozvoljeno pristupiti tuđem profilu"
         )
-    
-    return user
+    return user_id
 
 
 @router.put("/block/{user_id}", response_model=UserResponse)
 async def block_user(
     user_id: int,
-    admin_user_id: int,
+    admin: Principal = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """
-    Blokira korisnički nalog (samo admin).
+    Blokira korisnički nalog (samo admin, iz JWT tokena).
     Ne može blokirati druge admine.
     """
-    # Proveri da li je admin_user_id stvarno admin
     user_service = UserService(db)
-    admin_user = user_service.get_user_by_id(admin_user_id)
-    if not admin_user or admin_user.role.value != "admin":
-        raise HTTPException(status_code=403, detail="Samo admin može blokirati korisnike")
     
     # Dobij korisnika za blokiranje
     user = user_service.get_user_by_id(user_id)
@@ -128,6 +138,7 @@ async def block_user(
     
     user.is_blocked = True
     db.commit()
+    principal_cache.invalidate(user.id)
     db.refresh(user)
     
     return UserResponse(
@@ -163,7 +174,7 @@ async def login(
     user_service = UserService(db)
     
     # Autentifikuj korisnika
-    user = user_service.authenticate_user(user_data.username_or_email, user_data.password)
+    user = await user_service.authenticate_user(user_data.username_or_email, user_data.password)
     
     if not user:
         raise HTTPException(
@@ -213,7 +224,7 @@ async def register_user(
     user_service = UserService(db)
     
     # Registruje korisnika
-    new_user = user_service.create_user(user_data)
+    new_user = await user_service.create_user(user_data)
     
     # Kreiraj JWT token sa role u payload-u - automatski login nakon registracije
     access_token = create_access_token(
@@ -241,15 +252,17 @@ async def register_user(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_profile(
-    user_id: int,
+    user_id: Optional[int] = None,
+    principal: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Dobijanje podataka o korisniku (BEZ autentifikacije)
+    Dobijanje podataka o ulogovanom korisniku (JWT)
     
-    Query parametar: user_id (id ulogovanog korisnika)
-    Primer: GET /api/users/me?user_id=1
+    Query parametar user_id je opcion i mora biti ID iz tokena (admin može bilo koji)
+    Primer: GET /api/users/me
     """
+    user_id = _own_user_id(user_id, principal)
     user_service = UserService(db)
     user = user_service.get_user_by_id(user_id)
     
@@ -276,36 +289,90 @@ async def get_current_user_profile(
     }
 
 
-@router.get("/all", response_model=list[UserResponse])
+DIRECTORY_FIELDS = (
+    "id", "username", "email", "role", "first_name", "last_name", "profile_image",
+    "biography", "motto", "is_blocked", "is_active", "created_at", "updated_at"
+)
+DIRECTORY_MAX_LIMIT = 500
+
+
+def _directory_fields(fields: Optional[str]) -> List[str]:
+    """Tražena polja (id je uvek uključen - on je kursor); bez parametra sva polja"""
+    if not fields:
+        return list(DIRECTORY_FIELDS)
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in DIRECTORY_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Nepoznata polja: {', '.join(unknown)}"
+        )
+    return ["id"] + [name for name in DIRECTORY_FIELDS if name in requested and name != "id"]
+
+
+def _directory_columns(fields: List[str]) -> List[str]:
+    """Kolone za SELECT - is_active se izvodi iz is_blocked"""
+    columns = [name for name in fields if name != "is_active"]
+    if "is_active" in fields and "is_blocked" not in columns:
+        columns.append("is_blocked")
+    return columns
+
+
+def _directory_entry(row, fields: List[str]) -> dict:
+    entry = {}
+    for name in fields:
+        if name == "is_active":
+            value = not row.is_blocked
+        else:
+            value = getattr(row, name)
+            if name == "role":
+                value = value.value
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+        entry[name] = value
+    return entry
+
+
+@router.get("/all")
 async def get_all_users(
+    after_id: Optional[int] = Query(None, ge=0, description="Kursor - id poslednjeg korisnika prethodne stranice"),
+    limit: int = Query(100, ge=1, le=DIRECTORY_MAX_LIMIT),
+    role: Optional[SchemaUserRole] = Query(None),
+    is_blocked: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None, description="Polja odvojena zarezom, npr. id,username,role"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     db: Session = Depends(get_db)
 ):
     """
-    Dobijanje liste svih korisnika
-    
-    Vraća sve korisnike iz sistema.
-    Koristi se za prikaz svih korisnika koje možete da zapratite.
+    Imenik korisnika (npr. za prikaz korisnika koje možete da zapratite)
+    
+    - Keyset paginacija po id-u: sledeća stranica je `after_id` iz
+      `X-Next-Cursor` headera (nema ga na poslednjoj stranici)
+    - Filteri `role` i `is_blocked`
+    - `fields` bira kolone, pa liste ne čitaju biografiju i moto
+    - `format=ndjson` strimuje sve korisnike od `after_id` (bez `limit`-a),
+      red po red - za interne potrošače
     """
-    users = db.query(User).all()
+    fields_list = _directory_fields(fields)
+    columns = _directory_columns(fields_list)
+    role_filter = UserRole(role.value) if role is not None else None
+    
+    if format == "ndjson":
+        def stream():
+            # Sopstvena sesija - strim traje duže od zahteva
+            stream_db = SessionLocal()
+            try:
+                rows = UserService(stream_db).iter_users(columns, after_id, role_filter, is_blocked)
+                for row in rows:
+                    yield json.dumps(_directory_entry(row, fields_list), ensure_ascii=False) + "\n"
+            finally:
+                stream_db.close()
+        
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
     
-    return [
-        {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "role": user.role.value if hasattr(user.role, 'value') else user.role,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "profile_image": user.profile_image,
-            "biography": user.biography,
-            "motto": user.motto,
-            "is_blocked": user.is_blocked,
-            "is_active": not user.is_blocked,
-            "created_at": user.created_at,
-            "updated_at": user.updated_at
-        }
-        for user in users
-    ]
+    rows = UserService(db).list_users(columns, limit, after_id, role_filter, is_blocked)
+    headers = {"X-Next-Cursor": str(rows[-1].id)} if len(rows) == limit else {}
+    return JSONResponse([_directory_entry(row, fields_list) for row in rows], headers=headers)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -351,14 +418,15 @@ async def get_user(
 
 @router.put("/profile", response_model=UserProfileUpdateResponse)
 async def update_user_profile(
-    user_id: int,
     profile_data: UserProfileUpdate,
+    user_id: Optional[int] = None,
+    principal: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Ažuriranje profila korisnika (BEZ autentifikacije)
+    Ažuriranje profila ulogovanog korisnika (JWT)
     
-    Query parametar: user_id (id korisnika čiji profil se ažurira)
+    Query parametar user_id je opcion i mora biti ID iz tokena (admin može bilo koji)
     
     Korisnik može da ažurira sledeća polja svog profila:
     - **first_name**: Ime
@@ -367,6 +435,7 @@ async def update_user_profile(
     - **biography**: Biografija (do 1000 karaktera)
     - **motto**: Moto/citat (do 255 karaktera)
     """
+    user_id = _own_user_id(user_id, principal)
     try:
         user_service = UserService(db)
         current_user = user_service.get_user_by_id(user_id)
@@ -384,6 +453,7 @@ async def update_user_profile(
             setattr(current_user, field, value)
         
         db.commit()
+        principal_cache.invalidate(current_user.id)
         db.refresh(current_user)
         
         return UserProfileUpdateResponse(
@@ -403,35 +473,3 @@ async def update_user_profile(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Greška pri ažuriranju profila: {str(e)}"
         )
-
-
-@router.get("/all", response_model=list[UserResponse])
-async def get_all_users(
-    db: Session = Depends(get_db)
-):
-    """
-    Dobijanje liste svih korisnika
-    
-    Vraća sve korisnike iz sistema.
-    Koristi se za prikaz svih korisnika koje možete da zapratite.
-    """
-    users = db.query(User).all()
-    
-    return [
-        {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "role": user.role.value if hasattr(user.role, 'value') else user.role,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "profile_image": user.profile_image,
-            "biography": user.biography,
-            "motto": user.motto,
-            "is_blocked": user.is_blocked,
-            "is_active": not user.is_blocked,
-            "created_at": user.created_at,
-            "updated_at": user.updated_at
-        }
-        for user in users
-    ]
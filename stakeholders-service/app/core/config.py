@@ -10,6 +10,14 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Keš uloge/blokade korisnika za autentifikaciju (app/core/principal_cache.py)
+    principal_cache_ttl_seconds: float = 30.0
+    principal_cache_max_entries: int = 10000
+    
+    # bcrypt u ograničenom pool-u thread-ova (app/core/password_hasher.py)
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+    
     # API
     api_title: str = "Tourism Platform - Stakeholders Service"
     api_version: str = "1.0.0"
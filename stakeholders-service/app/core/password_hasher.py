@@ -0,0 +1,78 @@
+"""
+Password Hasher - bcrypt van event loop-a, u ograničenom pool-u thread-ova
+
+bcrypt hash/verify traje ~100-300 ms CPU-a. Pozvan direktno iz async rute
+blokira event loop, pa tokom talasa prijava staju i svi ostali zahtevi.
+Ovde se izvršava u posebnom ThreadPoolExecutor-u (bcrypt oslobađa GIL, pa
+thread-ovi rade paralelno bez process pool-a).
+
+Broj poslova na čekanju + u izvršavanju je ograničen (password_hash_max_pending);
+kada je red pun, novi poziv odmah dobija PasswordHasherBusy (ruta vraća 503),
+umesto da čeka neograničeno. Dubina reda, trajanje i odbijeni pozivi se
+izvoze kao Prometheus metrike.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_password
+from app.observability import observability
+
+
+class PasswordHasherBusy(Exception):
+    """Red za hash-ovanje lozinki je pun"""
+
+
+class PasswordHasher:
+    """Async API nad ograničenim pool-om za bcrypt"""
+
+    def __init__(self, workers: int = 4, max_pending: int = 64):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", get_password_hash, password)
+
+    async def _submit(self, operation: str, func: Callable, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                observability.password_hash_rejected.labels(operation=operation).inc()
+                raise PasswordHasherBusy(f"Password hashing queue is full ({self.max_pending})")
+            self._pending += 1
+            observability.password_hash_queue_depth.set(self._pending)
+
+        future = self._executor.submit(self._timed, operation, func, *args)
+        # Mesto u redu se oslobađa tek kada posao završi, i ako je zahtev prekinut
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def _timed(operation: str, func: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            observability.password_hash_duration.labels(operation=operation).observe(time.perf_counter() - started)
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+            observability.password_hash_queue_depth.set(self._pending)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending
+)
@@ -0,0 +1,124 @@
+"""
+Principal Cache - Keš uloge i statusa blokade korisnika za autentifikaciju
+
+JWT dokazuje identitet, ali uloga i blokada se proveravaju u bazi. Ti podaci
+se retko menjaju, pa se čuvaju u procesu po user_id:
+- unutar ttl_seconds od učitavanja vraćaju se bez upita u bazu
+- block_user i izmena profila pozivaju invalidate(user_id) posle commit-a
+  (invalidacija važi samo za ovaj proces - ostali je vide po isteku TTL-a)
+
+Invalidacija ostavlja oznaku sa generacijom, pa učitavanje koje je počelo
+pre invalidacije ne može da upiše zastarele podatke.
+Veličina je ograničena (LRU); pogoci i promašaji se izvoze kao Prometheus brojač.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.observability import observability
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Ono što autentifikacija treba da zna o korisniku"""
+    id: int
+    role: str
+    is_blocked: bool
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+
+@dataclass
+class _PrincipalEntry:
+    generation: int
+    principal: Optional[Principal] = None
+    loaded_at: float = 0.0
+
+
+class PrincipalCache:
+    """Thread-safe LRU keš principala sa TTL-om"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, _PrincipalEntry]" = OrderedDict()
+        self._generations = itertools.count(1)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: int) -> Tuple[Optional[Principal], int]:
+        """
+        Returns:
+            (principal, read_token) - principal je None ako ga nema ili je istekao;
+            read_token se prosleđuje u store()
+        """
+        with self._lock:
+            token = self._generation
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.principal is not None \
+                    and time.monotonic() - entry.loaded_at < self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                result = "hit"
+                principal = entry.principal
+            else:
+                self.misses += 1
+                result = "miss"
+                principal = None
+        observability.principal_cache_lookups.labels(result=result).inc()
+        return principal, token
+
+    def store(self, principal: Principal, read_token: int):
+        """Upiši principala učitanog iz baze (ignoriše se ako je u međuvremenu invalidiran)"""
+        with self._lock:
+            current = self._entries.get(principal.id)
+            if current is not None and current.generation > read_token:
+                return
+            self._entries[principal.id] = _PrincipalEntry(
+                generation=read_token,
+                principal=principal,
+                loaded_at=time.monotonic()
+            )
+            self._entries.move_to_end(principal.id)
+            self._evict()
+
+    def invalidate(self, user_id: int):
+        """Poziva se posle commit-a izmene korisnika"""
+        with self._lock:
+            self._generation = next(self._generations)
+            self._entries[user_id] = _PrincipalEntry(generation=self._generation)
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+            }
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.principal_cache_max_entries,
+    ttl_seconds=settings.principal_cache_ttl_seconds
+)
@@ -4,6 +4,8 @@ from app.core.config import settings
 from app.core.database import engine
 from app.models.user import Base
 from app.api.users import router as users_router
+from app.core.password_hasher import password_hasher
+from app.core.principal_cache import principal_cache
 from app.observability import observability, get_logger
 
 # Setup observability pre kreiranja app-a
@@ -40,6 +42,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Uključivanje router-a
@@ -49,6 +52,10 @@ app.include_router(
     tags=["users"]
 )
 
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.shutdown()
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -85,6 +92,7 @@ async def health_check():
         "status": "healthy" if db_status == "connected" else "unhealthy",
         "service": "stakeholders",
         "database": db_status,
+        "principal_cache": principal_cache.stats(),
         "observability": {
             "tracing": "enabled",
             "metrics": "enabled", 
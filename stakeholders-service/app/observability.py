@@ -145,6 +145,32 @@ class ObservabilityManager:
             'Total failed login attempts'
         )
         
+        # Keš principala (autentifikacija bez upita u bazu)
+        self.principal_cache_lookups = Counter(
+            'principal_cache_lookups_total',
+            'Principal cache lookups by result',
+            ['result']
+        )
+        
+        # Hash-ovanje lozinki (bcrypt pool)
+        self.password_hash_queue_depth = Gauge(
+            'password_hash_queue_depth',
+            'Password hashing jobs queued or running'
+        )
+        
+        self.password_hash_duration = Histogram(
+            'password_hash_duration_seconds',
+            'Password hashing duration in seconds',
+            ['operation'],
+            buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+        )
+        
+        self.password_hash_rejected = Counter(
+            'password_hash_rejected_total',
+            'Password hashing calls rejected because the queue was full',
+            ['operation']
+        )
+        
     def instrument_fastapi(self, app: FastAPI):
         """Instrumentacija FastAPI aplikacije"""
         # OpenTelemetry instrumentacija
@@ -3,8 +3,18 @@ from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserProfileUpdate
-from app.core.security import get_password_hash, verify_password, create_access_token
-from typing import Optional
+from app.core.security import create_access_token
+from app.core.password_hasher import PasswordHasherBusy, password_hasher
+from app.core.principal_cache import Principal, principal_cache
+from typing import Iterator, List, Optional, Sequence
+
+
+def _hashing_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servis je trenutno preopterećen, pokušajte ponovo",
+        headers={"Retry-After": "1"}
+    )
 
 
 class UserService:
@@ -12,14 +22,21 @@ class UserService:
     def __init__(self, db: Session):
         self.db = db
     
-    def authenticate_user(self, username_or_email: str, password: str) -> Optional[User]:
-        """Autentifikuje korisnika i vraća korisnika ako su kredencijali ispravni"""
+    async def authenticate_user(self, username_or_email: str, password: str) -> Optional[User]:
+        """
+        Autentifikuje korisnika i vraća korisnika ako su kredencijali ispravni
+        bcrypt provera se izvršava van event loop-a (503 ako je red pun)
+        """
         user = self.get_user_by_username(username_or_email)
         if not user:
             user = self.get_user_by_email(username_or_email)
         if not user:
             return None
-        if not verify_password(password, user.password_hash):
+        try:
+            password_ok = await password_hasher.verify(password, user.password_hash)
+        except PasswordHasherBusy:
+            raise _hashing_unavailable()
+        if not password_ok:
             return None
         if user.is_blocked:
             raise HTTPException(
@@ -28,8 +45,8 @@ class UserService:
             )
         return user
     
-    def create_user(self, user_data: UserCreate) -> User:
-        """Registruje novog korisnika"""
+    async def create_user(self, user_data: UserCreate) -> User:
+        """Registruje novog korisnika (bcrypt hash van event loop-a, 503 ako je red pun)"""
         try:
             # Proverava da li korisničko ime već postoji
             existing_user = self.db.query(User).filter(
@@ -50,7 +67,10 @@ class UserService:
                     )
             
             # Kreira novog korisnika
-            hashed_password = get_password_hash(user_data.password)
+            try:
+                hashed_password = await password_hasher.hash(user_data.password)
+            except PasswordHasherBusy:
+                raise _hashing_unavailable()
             db_user = User(
                 username=user_data.username,
                 email=user_data.email,
@@ -69,6 +89,8 @@ class UserService:
             
             return db_user
             
+        except HTTPException:
+            raise
         except IntegrityError:
             self.db.rollback()
             raise HTTPException(
@@ -86,6 +108,59 @@ class UserService:
         """Dobija korisnika po ID-u"""
         return self.db.query(User).filter(User.id == user_id).first()
     
+    def get_principal(self, user_id: int) -> Optional[Principal]:
+        """Uloga i blokada korisnika - iz keša, a pri promašaju samo te kolone iz baze"""
+        principal, read_token = principal_cache.lookup(user_id)
+        if principal is not None:
+            return principal
+        
+        row = self.db.query(User.id, User.role, User.is_blocked).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        
+        principal = Principal(id=row.id, role=row.role.value, is_blocked=row.is_blocked)
+        principal_cache.store(principal, read_token)
+        return principal
+    
+    def _directory_query(
+        self,
+        fields: Sequence[str],
+        after_id: Optional[int] = None,
+        role: Optional[UserRole] = None,
+        is_blocked: Optional[bool] = None
+    ):
+        """SELECT samo traženih kolona, keyset po id-u"""
+        query = self.db.query(*(getattr(User, name) for name in fields))
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        if role is not None:
+            query = query.filter(User.role == role)
+        if is_blocked is not None:
+            query = query.filter(User.is_blocked == is_blocked)
+        return query.order_by(User.id)
+    
+    def list_users(
+        self,
+        fields: Sequence[str],
+        limit: int,
+        after_id: Optional[int] = None,
+        role: Optional[UserRole] = None,
+        is_blocked: Optional[bool] = None
+    ) -> List:
+        """Jedna stranica imenika korisnika (id > after_id)"""
+        return self._directory_query(fields, after_id, role, is_blocked).limit(limit).all()
+    
+    def iter_users(
+        self,
+        fields: Sequence[str],
+        after_id: Optional[int] = None,
+        role: Optional[UserRole] = None,
+        is_blocked: Optional[bool] = None,
+        batch_size: int = 1000
+    ) -> Iterator:
+        """Svi korisnici od after_id, čitani u serijama (server-side kursor na PostgreSQL-u)"""
+        return iter(self._directory_query(fields, after_id, role, is_blocked).yield_per(batch_size))
+    
     def get_user_by_username(self, username: str) -> Optional[User]:
         """Dobija korisnika po korisničkom imenu"""
         return self.db.query(User).filter(User.username == username).first()
@@ -125,6 +200,7 @@ class UserService:
                 setattr(user, field, value)
             
             self.db.commit()
+            principal_cache.invalidate(user.id)
             self.db.refresh(user)
             
             return user
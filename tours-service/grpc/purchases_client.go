@@ -117,6 +117,54 @@ func (c *PurchasesGRPCClient) VerifyPurchase(userID, tourID int) (bool, string,
 	return resp.HasPurchased, resp.TokenId, nil
 }
 
+// VerifyPurchases checks several tours for one user in a single round trip.
+// The returned map contains the purchase token ID for every purchased tour.
+func (c *PurchasesGRPCClient) VerifyPurchases(userID int, tourIDs []int) (map[int]string, error) {
+	if err := c.Connect(); err != nil {
+		log.Printf("[gRPC] Failed to connect to purchases service: %v", err)
+		return nil, err
+	}
+
+	c.mu.RLock()
+	client := c.client
+	c.mu.RUnlock()
+
+	if client == nil {
+		return nil, fmt.Errorf("gRPC client not available")
+	}
+
+	ctx, cancel := context.WithTimeout(context.Background(), 10*time.Second)
+	defer cancel()
+
+	req := &pb.VerifyPurchasesRequest{
+		UserId:  int32(userID),
+		TourIds: make([]int32, 0, len(tourIDs)),
+	}
+	for _, tourID := range tourIDs {
+		req.TourIds = append(req.TourIds, int32(tourID))
+	}
+
+	resp, err := client.VerifyPurchases(ctx, req)
+	if err != nil {
+		log.Printf("[gRPC] Error verifying purchases: %v", err)
+		c.resetConnection()
+		return nil, err
+	}
+
+	if resp.Error != "" {
+		return nil, fmt.Errorf("purchase verification failed: %s", resp.Error)
+	}
+
+	purchased := make(map[int]string, len(resp.Purchases))
+	for _, p := range resp.Purchases {
+		if p.HasPurchased {
+			purchased[int(p.TourId)] = p.TokenId
+		}
+	}
+
+	return purchased, nil
+}
+
 func (c *PurchasesGRPCClient) resetConnection() {
 	c.mu.Lock()
 	defer c.mu.Unlock()